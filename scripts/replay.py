@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import recording  # noqa: E402
+from spreads.engine import write_spreads  # noqa: E402
+from spreads.incremental import BandEvent  # noqa: E402
+from spreads.replay import Replay  # noqa: E402
+from tasks.market_scanner import MarketCandidate, write_candidates  # noqa: E402
+
+
+def _time(value: Optional[str]) -> Optional[float]:
+    # Unix seconds or an ISO time (UTC unless it carries an offset)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        dt = datetime.fromisoformat(value)
+        return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded market data (RECORD_DIR) through the spread pipeline")
+    parser.add_argument("paths", nargs="+", help="recording files or directories")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded pace, 10 = ten times faster, 0 = as fast as possible")
+    parser.add_argument("--start", help="skip records before this time (unix seconds or ISO)")
+    parser.add_argument("--end", help="stop at this time (unix seconds or ISO)")
+    parser.add_argument("--min-bps", type=float, default=None)
+    parser.add_argument("--max-bps", type=float, default=None)
+    parser.add_argument("--notional", type=float, default=1000.0, help="VWAP notional for book recordings")
+    parser.add_argument("--events", help="write band events as JSON lines here")
+    parser.add_argument("--out", help="write the final samples here, like SPREADS_OUT")
+    parser.add_argument("--candidates", help="write the last scan's candidates here")
+    parser.add_argument("--quiet", action="store_true", help="do not print band events")
+    args = parser.parse_args()
+
+    digest = hashlib.sha256()
+    events_file = open(args.events, "w") if args.events else None
+    last_scan: List[MarketCandidate] = []
+
+    def on_events(events: List[BandEvent]) -> None:
+        for e in events:
+            line = json.dumps({"ts": round(e.ts, 6), "kind": e.kind, "symbol": e.symbol, "bps": e.spread_bps})
+            digest.update(line.encode() + b"\n")
+            if events_file is not None:
+                events_file.write(line + "\n")
+            if not args.quiet:
+                print(f"[Replay] {e.symbol} {'entered' if e.kind == 'enter' else 'left'} range: {e.spread_bps} bps")
+
+    def on_scan(candidates: List[MarketCandidate]) -> None:
+        last_scan[:] = candidates
+
+    replay = Replay(args.min_bps, args.max_bps, args.notional, on_events=on_events, on_scan=on_scan)
+    files = recording.files(args.paths)
+    print(f"[Replay] {len(files)} files, speed={args.speed or 'max'}")
+    start = time.perf_counter()
+    try:
+        replay.run(recording.read(files, _time(args.start), _time(args.end)), args.speed)
+    except KeyboardInterrupt:
+        print("[Replay] Stopped")
+    finally:
+        if events_file is not None:
+            events_file.close()
+    elapsed = time.perf_counter() - start
+
+    total = sum(replay.records.values())
+    print(f"[Replay] {total} records in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f}/s), "
+          f"{replay.evaluations} evaluations ({replay.evaluations / max(elapsed, 1e-9):,.0f}/s), "
+          f"{replay.events} band events, {replay.scans} scans")
+    print(f"[Replay] Records by channel: {dict(sorted(replay.records.items()))}")
+    print(f"[Replay] Events digest: {digest.hexdigest()}")
+    if args.out and replay.tracker is not None:
+        samples = replay.tracker.samples()
+        write_spreads(args.out, samples)
+        print(f"[Replay] Saved {len(samples)} samples to {args.out}")
+    if args.candidates and replay.scans:
+        write_candidates(args.candidates, last_scan)
+        print(f"[Replay] Saved {len(last_scan)} candidates to {args.candidates}")
+
+
+if __name__ == "__main__":
+    main()
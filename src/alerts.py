@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from metrics import counter, gauge
+from spreads.incremental import BandEvent
+
+
+# Signal pipeline for band entry/exit events. The engine thread only does a `put_nowait` on a
+# bounded queue (`AlertDispatcher.publish`); a dispatcher thread applies per-symbol hysteresis and
+# cooldowns and coalesces what is left into one batch per `batch_window`, and every sink has its own
+# thread and small queue, so a slow or failing sink drops its own batches without delaying the
+# quote loop or the other sinks.
+
+ALERTS_PUBLISHED = counter("cryptolab_alerts_published_total", "Band events handed to the alert queue")
+ALERTS_DROPPED = counter("cryptolab_alerts_dropped_total",
+                         "Band events or batches dropped because a queue was full", ("stage",))
+ALERTS_SUPPRESSED = counter("cryptolab_alerts_suppressed_total",
+                            "Band events not alerted: cooldown, or a flap inside the hold time", ("reason",))
+ALERTS_SENT = counter("cryptolab_alerts_sent_total", "Alerts delivered per sink", ("sink",))
+ALERTS_FAILED = counter("cryptolab_alerts_failed_total", "Batches a sink failed to deliver", ("sink",))
+ALERTS_QUEUE = gauge("cryptolab_alerts_queue", "Event batches waiting for the dispatcher")
+
+
+def describe(e: BandEvent) -> str:
+    z = f" (z {e.z:+.1f})" if e.z is not None else ""
+    return f"{e.symbol} {'entered' if e.kind == 'enter' else 'left'} range: {e.spread_bps} bps{z}"
+
+
+def summarize(batch: List[BandEvent], max_lines: int) -> List[str]:
+    # At most `max_lines` lines, entries first, then a count of the rest
+    ordered = sorted(batch, key=lambda e: (e.kind != "enter", -abs(e.spread_bps or 0.0)))
+    lines = [describe(e) for e in ordered[:max_lines]]
+    rest = ordered[max_lines:]
+    if rest:
+        entered = sum(1 for e in rest if e.kind == "enter")
+        lines.append(f"+{len(rest)} more ({entered} entered, {len(rest) - entered} left)")
+    return lines
+
+
+class Sink:
+    """Delivers batches of alerts; `send` runs on the sink's own thread and may block or raise."""
+
+    name = ""
+
+    def send(self, batch: List[BandEvent]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ConsoleSink(Sink):
+    name = "console"
+
+    def __init__(self, bell: bool = True, max_lines: int = 20) -> None:
+        self.bell = bell
+        self.max_lines = max_lines
+
+    def send(self, batch: List[BandEvent]) -> None:
+        # One bell per batch with an entry, not one per symbol
+        bell = "\a" if self.bell and any(e.kind == "enter" for e in batch) else ""
+        sys.stdout.write(bell + "".join(f"[Signal] {line}\n" for line in summarize(batch, self.max_lines)))
+        sys.stdout.flush()
+
+
+class FileSink(Sink):
+    """Appends one JSON line per alert."""
+
+    name = "file"
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._f = open(path, "a", encoding="utf-8")
+
+    def send(self, batch: List[BandEvent]) -> None:
+        self._f.write("".join(json.dumps({"ts": e.ts, "kind": e.kind, "symbol": e.symbol, "base": e.base,
+                                          "bps": e.spread_bps, "z": e.z}) + "\n" for e in batch))
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class WebhookSink(Sink):
+    """Posts each batch as one Telegram `sendMessage`-style JSON body (`chat_id`, `text`).
+
+    A 429 is retried once after its `retry_after` (Telegram's body field or the Retry-After header);
+    anything else that is not 2xx fails the batch.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str, chat_id: str = "", timeout: float = 5.0, max_lines: int = 30) -> None:
+        self.url = url
+        self.chat_id = chat_id
+        self.max_lines = max_lines
+        self.client = httpx.Client(timeout=timeout)
+
+    def send(self, batch: List[BandEvent]) -> None:
+        payload: Dict[str, object] = {"text": "\n".join(summarize(batch, self.max_lines))}
+        if self.chat_id:
+            payload["chat_id"] = self.chat_id
+        for attempt in range(2):
+            r = self.client.post(self.url, json=payload)
+            if r.status_code == 429 and attempt == 0:
+                time.sleep(min(_retry_after(r), 30.0))
+                continue
+            r.raise_for_status()
+            return
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def _retry_after(r: httpx.Response) -> float:
+    try:
+        return float(r.json().get("parameters", {}).get("retry_after"))
+    except (ValueError, TypeError, AttributeError):
+        return float(r.headers.get("retry-after", "1") or 1)
+
+
+class _SinkWorker:
+    # Batches queued while the sink was busy are merged into one delivery
+    def __init__(self, sink: Sink, size: int) -> None:
+        self.sink = sink
+        self.queue: "queue.Queue[Optional[List[BandEvent]]]" = queue.Queue(size)
+        self.thread = threading.Thread(target=self._run, name=f"alerts-{sink.name}", daemon=True)
+
+    def submit(self, batch: List[BandEvent]) -> None:
+        try:
+            self.queue.put_nowait(batch)
+        except queue.Full:
+            ALERTS_DROPPED.inc(stage=self.sink.name)
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = list(item)
+            while True:
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    done = True
+                    break
+                batch.extend(more)
+            try:
+                self.sink.send(batch)
+                ALERTS_SENT.inc(len(batch), sink=self.sink.name)
+            except Exception as exc:  # noqa: BLE001 - one sink failing must not stop the others
+                ALERTS_FAILED.inc(sink=self.sink.name)
+                print(f"[Alerts] {self.sink.name} failed to deliver {len(batch)} alerts: {exc}")
+        self.sink.close()
+
+
+@dataclass
+class _State:
+    inside: bool = False          # an entry was alerted and its exit not yet
+    last_enter: float = float("-inf")
+    exit_at: Optional[float] = None
+    exit_event: Optional[BandEvent] = None
+
+
+class AlertDispatcher:
+    """Turns band events into batched alerts off the engine's thread.
+
+    Per symbol, an exit is only alerted once the symbol stayed out of the band for `hold` seconds;
+    re-entering within that time cancels the exit and raises nothing (hysteresis against symbols
+    hovering at a band edge). An entry less than `cooldown` seconds after the previous alerted one
+    is suppressed, along with its exit. Alerts are collected for `batch_window` seconds and handed
+    to every sink as one batch.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[Sink],
+        cooldown: float = 60.0,
+        hold: float = 5.0,
+        batch_window: float = 1.0,
+        queue_size: int = 10_000,
+        sink_queue_size: int = 100,
+    ) -> None:
+        self.cooldown = cooldown
+        self.hold = hold
+        self.batch_window = batch_window
+        self.queue: "queue.Queue[Optional[List[BandEvent]]]" = queue.Queue(queue_size)
+        self.workers = [_SinkWorker(s, sink_queue_size) for s in sinks]
+        self.states: Dict[str, _State] = {}
+        self._pending: List[BandEvent] = []
+        self._first = 0.0
+        self._thread = threading.Thread(target=self._run, name="alerts-dispatcher", daemon=True)
+
+    def start(self) -> "AlertDispatcher":
+        for w in self.workers:
+            w.thread.start()
+        self._thread.start()
+        return self
+
+    def publish(self, events: List[BandEvent]) -> None:
+        """Engine callback (`SpreadEngine.on_events`): never blocks, drops when the queue is full."""
+        if not events:
+            return
+        try:
+            self.queue.put_nowait(events)
+            ALERTS_PUBLISHED.inc(len(events))
+        except queue.Full:
+            ALERTS_DROPPED.inc(len(events), stage="queue")
+
+    def close(self, timeout: float = 5.0) -> None:
+        # Flushes what is pending (exits still inside their hold time are dropped) and stops the threads
+        self.queue.put(None)
+        self._thread.join(timeout)
+        for w in self.workers:
+            w.queue.put(None)
+        for w in self.workers:
+            w.thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self.queue.get(timeout=self._wait(time.time()))
+            except queue.Empty:
+                item = []
+            if item is None:
+                break
+            for e in item:
+                self._apply(e)
+            ALERTS_QUEUE.set(self.queue.qsize())
+            now = time.time()
+            self._confirm_exits(now)
+            if self._pending and now - self._first >= self.batch_window:
+                self._flush()
+        self._flush()
+
+    def _wait(self, now: float) -> float:
+        # Sleep until the open batch is due or the next held exit can be confirmed
+        deadlines = [self._first + self.batch_window] if self._pending else []
+        deadlines.extend(s.exit_at for s in self.states.values() if s.exit_at is not None)
+        return max(min(deadlines) - now, 0.0) if deadlines else 1.0
+
+    def _apply(self, e: BandEvent) -> None:
+        st = self.states.get(e.symbol)
+        if st is None:
+            st = self.states[e.symbol] = _State()
+        if e.kind == "enter":
+            if st.exit_at is not None:
+                # Back in before the hold expired: the earlier exit never happened
+                st.exit_at = st.exit_event = None
+                ALERTS_SUPPRESSED.inc(reason="flap")
+            elif st.inside:
+                return
+            elif e.ts - st.last_enter < self.cooldown:
+                ALERTS_SUPPRESSED.inc(reason="cooldown")
+            else:
+                st.inside = True
+                st.last_enter = e.ts
+                self._add(e)
+        elif st.inside and st.exit_at is None:
+            st.exit_at = time.time() + self.hold
+            st.exit_event = e
+
+    def _confirm_exits(self, now: float) -> None:
+        for st in self.states.values():
+            if st.exit_at is not None and st.exit_at <= now:
+                st.inside = False
+                if st.exit_event is not None:
+                    self._add(st.exit_event)
+                st.exit_at = st.exit_event = None
+
+    def _add(self, e: BandEvent) -> None:
+        if not self._pending:
+            self._first = time.time()
+        self._pending.append(e)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        for w in self.workers:
+            w.submit(batch)
+
+
+def build_sinks(names: Sequence[str], env: Optional[Dict[str, str]] = None) -> List[Sink]:
+    env = dict(os.environ if env is None else env)
+    max_lines = int(env.get("ALERTS_MAX_LINES", "20"))
+    sinks: List[Sink] = []
+    for name in names:
+        if name == "console":
+            sinks.append(ConsoleSink(bell=env.get("ALERTS_BELL", "1") == "1", max_lines=max_lines))
+        elif name == "file":
+            sinks.append(FileSink(env.get("ALERTS_FILE", "data/alerts.jsonl")))
+        elif name == "webhook":
+            url = env.get("ALERTS_WEBHOOK_URL", "")
+            if not url:
+                raise ValueError("ALERTS_WEBHOOK_URL is required for the webhook sink")
+            sinks.append(WebhookSink(url, env.get("ALERTS_WEBHOOK_CHAT_ID", ""),
+                                     float(env.get("ALERTS_WEBHOOK_TIMEOUT", "5")), max_lines))
+        else:
+            raise ValueError(f"unknown alert sink {name!r}, expected console, file or webhook")
+    return sinks
+
+
+def start_from_env(default_sinks: str = "") -> Optional[AlertDispatcher]:
+    """Dispatcher for ALERTS_SINKS (comma-separated, `default_sinks` when unset); None when empty."""
+    env = os.environ
+    names = [s.strip() for s in env.get("ALERTS_SINKS", default_sinks).split(",") if s.strip()]
+    if not names:
+        return None
+    dispatcher = AlertDispatcher(
+        build_sinks(names),
+        cooldown=float(env.get("ALERTS_COOLDOWN", "60")),
+        hold=float(env.get("ALERTS_HOLD", "5")),
+        batch_window=float(env.get("ALERTS_BATCH_WINDOW", "1")),
+        queue_size=int(env.get("ALERTS_QUEUE", "10000")),
+    )
+    print(f"[Alerts] Sinks: {', '.join(names)}; cooldown={dispatcher.cooldown}s, hold={dispatcher.hold}s, "
+          f"batch window={dispatcher.batch_window}s")
+    return dispatcher.start()
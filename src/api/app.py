@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import alerts
+import metrics
+import recording
+from api.hub import Hub, Subscriber
+from spreads.engine import EngineConfig, SpreadEngine
+
+
+# How a closed WebSocket surfaces: WebSocketDisconnect from a read (or a send on newer Starlette),
+# RuntimeError for a send after the close, OSError from the server on older Starlette
+CLOSED = (WebSocketDisconnect, RuntimeError, OSError)
+
+
+def _symbols(raw: Optional[str]) -> Optional[set]:
+    return {s for s in raw.split(",") if s} if raw else None
+
+
+def create_app(config: Optional[EngineConfig] = None) -> FastAPI:
+    """FastAPI app that runs a `SpreadEngine` in-process and serves its table from memory."""
+    engine = SpreadEngine(config or EngineConfig.from_env())
+    hub = Hub(engine, interval=float(os.environ.get("API_PUSH_INTERVAL", "0.1")))
+    min_interval = float(os.environ.get("API_MIN_PUSH_INTERVAL", "0"))
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        # METRICS_PORT is optional here, /metrics is also served on the API port
+        metrics.start_from_env()
+        recording.start_from_env("api")
+        dispatcher = alerts.start_from_env()
+        if dispatcher is not None:
+            engine.on_events.append(dispatcher.publish)
+        tasks = [asyncio.create_task(engine.run())]
+        if hub.interval > 0:
+            tasks.append(asyncio.create_task(hub.run()))
+        try:
+            yield
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if dispatcher is not None:
+                engine.on_events.remove(dispatcher.publish)
+                await asyncio.to_thread(dispatcher.close)
+
+    app = FastAPI(title="CryptoLab spreads", lifespan=lifespan)
+    app.state.engine = engine
+    app.state.hub = hub
+
+    @app.get("/status")
+    async def status() -> dict:
+        return {
+            **engine.status(),
+            "version": hub.version,
+            "published_at": hub.published_at,
+            "subscribers": hub.subscribers,
+            "messages_sent": hub.sent,
+            "versions_conflated": hub.conflated,
+        }
+
+    @app.get("/refresh")
+    async def refresh() -> dict:
+        # Target and achieved refresh rate per symbol and venue, only in `adaptive` mode
+        if engine.scheduler is None:
+            raise HTTPException(status_code=404, detail="refresh rates are only tracked in adaptive mode")
+        return engine.scheduler.rates()
+
+    @app.get("/metrics")
+    async def prometheus() -> PlainTextResponse:
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.get("/profile", response_class=PlainTextResponse)
+    async def profile(reset: bool = False) -> str:
+        # Folded stacks from the sampling profiler, enabled with METRICS_PROFILE_HZ
+        sampler = metrics.sampler()
+        if sampler is None:
+            raise HTTPException(status_code=404, detail="profiler is off, set METRICS_PROFILE_HZ")
+        return sampler.folded(reset)
+
+    @app.get("/spreads")
+    async def spreads(in_band: bool = False) -> list:
+        return hub.table(in_band=in_band)
+
+    # Declared before /spreads/{symbol} so "top" is not taken for a symbol
+    @app.get("/spreads/top")
+    async def top(
+        n: int = Query(5, ge=1, le=500),
+        min_bps: Optional[float] = None,
+        max_bps: Optional[float] = None,
+    ) -> list:
+        return hub.top(n, min_bps, max_bps)
+
+    @app.get("/spreads/{symbol}")
+    async def spread(symbol: str) -> dict:
+        row = hub.lookup(symbol)
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"unknown symbol {symbol}")
+        return row
+
+    @app.websocket("/ws/spreads")
+    async def ws_spreads(ws: WebSocket, symbols: Optional[str] = None, in_band: bool = False) -> None:
+        await ws.accept()
+        sub = Subscriber(hub, _symbols(symbols), in_band, min_interval)
+
+        async def send() -> None:
+            messages = sub.messages()
+            try:
+                async for msg in messages:
+                    await ws.send_text(msg)
+            finally:
+                await messages.aclose()
+
+        async def receive() -> None:
+            # Clients send nothing, but only a read sees a close while a filtered subscriber waits
+            # for rows that may not change for a long time
+            while (await ws.receive())["type"] != "websocket.disconnect":
+                pass
+
+        # Whichever ends first, a close seen by the reader or a failed send, ends the subscription
+        tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in tasks:
+                t.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception) and not isinstance(r, CLOSED):
+                raise r
+
+    @app.get("/sse/spreads")
+    async def sse_spreads(request: Request, symbols: Optional[str] = None, in_band: bool = False) -> StreamingResponse:
+        sub = Subscriber(hub, _symbols(symbols), in_band, min_interval)
+
+        async def events() -> AsyncIterator[str]:
+            async for msg in sub.messages():
+                if await request.is_disconnected():
+                    break
+                yield f"data: {msg}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    return app
+
+
+app = create_app()
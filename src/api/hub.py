@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import msgspec
+import numpy as np
+
+from spreads.engine import SpreadEngine
+from spreads.incremental import SpreadTracker
+from spreads.kernel import QuoteTable, compute, to_samples
+from spreads.models import ENCODER
+
+
+class Hub:
+    """Fans out changed rows from a `SpreadEngine` to any number of subscribers.
+
+    The engine side only stamps the changed rows with a new version, so its cost does not depend
+    on how many clients are connected or how fast they read. With `interval` > 0 subscribers are
+    woken by `run()` at most that often instead of on every quote update.
+    """
+
+    def __init__(self, engine: SpreadEngine, interval: float = 0.0) -> None:
+        self.engine = engine
+        self.interval = interval
+        self.version = 0
+        self.generation = 0
+        self.published_at = 0.0
+        self.row_version = np.zeros(0, dtype=np.int64)
+        self.subscribers = 0
+        self.sent = 0
+        self.conflated = 0
+        self._tracker: Optional[SpreadTracker] = None
+        self._table: Optional[QuoteTable] = None
+        self._rows: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        self._changed = asyncio.Event()
+        self._notified = 0
+        self._encoded: Dict[Tuple, str] = {}
+        engine.on_rows.append(self.mark)
+
+    @property
+    def tracker(self) -> Optional[SpreadTracker]:
+        tracker = self.engine.tracker
+        table = tracker.table if tracker is not None else None
+        if tracker is not self._tracker or table is not self._table:
+            # The candidate universe changed and rows were renumbered: every row counts as changed
+            self._tracker = tracker
+            self._table = table
+            self.generation += 1
+            self.version += 1
+            self.row_version = np.full(len(tracker.table) if tracker is not None else 0, self.version, dtype=np.int64)
+            self._rows = {}
+        return tracker
+
+    def mark(self, rows: np.ndarray) -> None:
+        if self.tracker is None:
+            return
+        self.version += 1
+        self.row_version[rows] = self.version
+        self.published_at = time.time()
+        if self.interval <= 0:
+            self.notify()
+
+    def notify(self) -> None:
+        # Swap the event so every waiter wakes once and later waits block on a fresh one
+        self._notified = self.version
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.version != self._notified:
+                self.notify()
+
+    async def wait(self, version: int) -> None:
+        while self._notified <= version:
+            await self._changed.wait()
+
+    def encoded(self, key: Tuple, build: Any) -> str:
+        # Subscribers with the same filter moving between the same versions share one JSON payload
+        text = self._encoded.get(key)
+        if text is None:
+            if len(self._encoded) > 256:
+                self._encoded.clear()
+            text = self._encoded[key] = ENCODER.encode(build()).decode()
+        return text
+
+    def changed_since(self, version: int) -> np.ndarray:
+        return np.flatnonzero(self.row_version > version)
+
+    def rows(self, idx: Any) -> List[Dict[str, Any]]:
+        # Each row version is turned into a dict once no matter how many subscribers send it
+        idx = np.asarray(list(idx) if not isinstance(idx, np.ndarray) else idx, dtype=np.int64)
+        stale = [int(r) for r in idx if self._rows.get(int(r), (-1,))[0] != self.row_version[r]]
+        if stale:
+            tracker = self._tracker
+            frame = compute(tracker.table, top_k=0, rows=np.array(stale, dtype=np.int64))
+            for i, sample in enumerate(to_samples(tracker.table, frame, range(len(stale)))):
+                row = stale[i]
+                out = msgspec.structs.asdict(sample)
+                out["in_band"] = bool(tracker.in_band[row])
+                if tracker.stats is not None:
+                    out["z"] = None if np.isnan(tracker.z[row]) else round(float(tracker.z[row]), 2)
+                executable = self.engine.executable(row)
+                if executable is not None:
+                    out["exec_bps_buy_binance"], out["exec_bps_buy_bybit"] = executable
+                out["version"] = int(self.row_version[row])
+                self._rows[row] = (out["version"], out)
+        return [self._rows[int(r)][1] for r in idx]
+
+    def table(self, in_band: bool = False) -> List[Dict[str, Any]]:
+        tracker = self.tracker
+        if tracker is None:
+            return []
+        idx = np.flatnonzero(tracker.in_band) if in_band else np.arange(len(tracker.table))
+        return self.rows(idx)
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        tracker = self.tracker
+        if tracker is None:
+            return None
+        base = symbol.upper().split("/")[0]
+        if base.endswith("USDT") and base not in tracker.table.rows:
+            base = base[: -len("USDT")]
+        row = tracker.table.rows.get(base)
+        if row is None:
+            return None
+        out = self.rows([row])[0]
+        if tracker.stats is not None:
+            # Rolling windows move with time, not with row versions, so they are never cached
+            out = dict(out, stats=tracker.stats.describe([row], tracker.bps[[row]])[0])
+        return out
+
+    def top(self, n: int, min_bps: Optional[float] = None, max_bps: Optional[float] = None) -> List[Dict[str, Any]]:
+        tracker = self.tracker
+        if tracker is None:
+            return []
+        if min_bps is None and max_bps is None:
+            return self.rows(row for row, _ in tracker.ranking.top(n))
+        # Ad-hoc bands are answered with one pass of the vectorized kernel over the whole table
+        frame = compute(tracker.table, min_bps, max_bps, top_k=n)
+        return self.rows(frame.rows[frame.top])
+
+
+class Subscriber:
+    """One client's view of the hub: a full snapshot, then only rows changed since its last send.
+
+    The next message is built only after the previous one was handed to the socket, so a slow
+    client skips intermediate versions and gets the latest values instead of a growing queue.
+    `min_interval` additionally caps the message rate.
+    """
+
+    def __init__(self, hub: Hub, symbols: Optional[Set[str]] = None, in_band: bool = False,
+                 min_interval: float = 0.0) -> None:
+        self.hub = hub
+        self.symbols = {s.upper().split("/")[0] for s in symbols} if symbols else None
+        self.in_band = in_band
+        self.min_interval = min_interval
+        self.version = 0
+        self._generation = -1
+        self._filter: Optional[np.ndarray] = None
+        self._shown = np.zeros(0, dtype=bool)
+        # What the rows of a message depend on besides the versions
+        self._key = (tuple(sorted(self.symbols)) if self.symbols else None, in_band)
+
+    def _reset(self, tracker: Optional[SpreadTracker]) -> np.ndarray:
+        # Called on every snapshot: resolves the symbol filter against the current table
+        n = len(tracker.table) if tracker is not None else 0
+        self._shown = np.zeros(n, dtype=bool)
+        if self.symbols is None or tracker is None:
+            self._filter = None
+            return np.arange(n)
+        self._filter = np.zeros(n, dtype=bool)
+        self._filter[[tracker.table.rows[s] for s in self.symbols if s in tracker.table.rows]] = True
+        return np.flatnonzero(self._filter)
+
+    def _select(self, idx: np.ndarray) -> np.ndarray:
+        tracker = self.hub.tracker
+        if self._filter is not None:
+            idx = idx[self._filter[idx]]
+        if self.in_band and tracker is not None:
+            # Rows that just left the band are sent once more so the client can drop them
+            now = tracker.in_band[idx]
+            idx_out = idx[now | self._shown[idx]]
+            self._shown[idx] = now
+            idx = idx_out
+        return idx
+
+    def _message(self, kind: str, since: int, idx: np.ndarray) -> str:
+        hub = self.hub
+        version, published_at = self.version, hub.published_at
+        return hub.encoded((kind, hub.generation, since, version, self._key), lambda: {
+            "type": kind,
+            "version": version,
+            "published_at": published_at,
+            "rows": hub.rows(idx),
+        })
+
+    async def messages(self) -> AsyncIterator[str]:
+        """JSON-encoded snapshot/update messages; the caller sends one before asking for the next."""
+        hub = self.hub
+        hub.subscribers += 1
+        try:
+            last = 0.0
+            while True:
+                if self._generation != hub.generation or hub.tracker is None:
+                    tracker = hub.tracker
+                    self._generation = hub.generation
+                    self.version = hub._notified
+                    idx = self._select(self._reset(tracker))
+                    yield self._message("snapshot", 0, idx)
+                    hub.sent += 1
+                    if tracker is None:
+                        await hub.wait(self.version)
+                        continue
+                else:
+                    await hub.wait(self.version)
+                    if self.min_interval > 0:
+                        await asyncio.sleep(max(0.0, last + self.min_interval - time.monotonic()))
+                    if self._generation != hub.generation:
+                        continue
+                    since, self.version = self.version, hub._notified
+                    hub.conflated += max(0, self.version - since - 1)
+                    idx = self._select(hub.changed_since(since))
+                    if len(idx):
+                        last = time.monotonic()
+                        yield self._message("update", since, idx)
+                        hub.sent += 1
+        finally:
+            hub.subscribers -= 1
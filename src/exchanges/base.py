@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+USDT = "USDT"
+
+# (url, query params): adapters describe requests, callers send them with a sync or async client
+Request = Tuple[str, Dict[str, Any]]
+Top = Dict[str, Optional[float]]
+
+
+@dataclass
+class VenueLimits:
+    """Request budget of one venue: `limit` units per `window` seconds and the cost of each request kind."""
+
+    limit: float
+    window: float
+    sweep_cost: float
+    symbol_cost: float
+
+
+def price(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def volume(value: Any) -> float:
+    return price(value) or 0.0
+
+
+def book_top(bids: Any, asks: Any) -> Top:
+    return {
+        "bid": float(bids[0][0]) if bids else None,
+        "ask": float(asks[0][0]) if asks else None,
+    }
+
+
+class ExchangeAdapter:
+    """One venue's USDT-margined perpetuals behind a common interface.
+
+    Adapters only build requests and parse responses, so the scanner (sync, threads) and the
+    spread loop (async) share them without caring how the HTTP call is made. Parsers take the raw
+    response body and decode it with the typed schemas in `exchanges.schemas`. Symbols are
+    normalised to base assets (`BTC`); `markets` parses the tradable bases with their raw venue
+    symbols, `volumes` the 24h quote volume per raw symbol, `tickers` every best bid/ask in one
+    request and `book` one symbol's order book top.
+    """
+
+    name = ""
+    limits = VenueLimits(limit=1.0, window=1.0, sweep_cost=1.0, symbol_cost=1.0)
+
+    def __init__(self, rest: str) -> None:
+        self.rest = rest.rstrip("/")
+
+    def raw_symbol(self, base: str) -> str:
+        return f"{base}{USDT}"
+
+    def markets_request(self) -> Request:
+        raise NotImplementedError
+
+    def parse_markets(self, body: bytes) -> Dict[str, str]:
+        # base -> raw symbol, tradable USDT perpetuals only
+        raise NotImplementedError
+
+    def volumes_request(self) -> Request:
+        raise NotImplementedError
+
+    def parse_volumes(self, body: bytes) -> Dict[str, float]:
+        # raw symbol -> 24h volume in USDT
+        raise NotImplementedError
+
+    def tickers_request(self) -> Request:
+        raise NotImplementedError
+
+    def parse_tickers(self, body: bytes) -> Dict[str, Top]:
+        # raw symbol -> {"bid", "ask"}
+        raise NotImplementedError
+
+    def book_request(self, symbol: str) -> Request:
+        raise NotImplementedError
+
+    def parse_book(self, body: bytes) -> Top:
+        raise NotImplementedError
+
+    def remaining(self, headers: Mapping[str, str]) -> Optional[float]:
+        # Budget units the venue says are left in the current window, None if it does not say
+        return None
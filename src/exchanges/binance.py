@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Dict, Mapping, Optional
+
+from exchanges import schemas
+from exchanges.base import USDT, ExchangeAdapter, Request, Top, VenueLimits, book_top
+from transport import BINANCE_FAPI
+
+
+EXCHANGE_INFO_PATH = "/fapi/v1/exchangeInfo"
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+
+class BinanceAdapter(ExchangeAdapter):
+    """Binance USD-M futures."""
+
+    name = "binance"
+    # 2400 request weight per minute per IP; bookTicker costs 5 for all symbols, depth?limit=5 costs 2
+    limits = VenueLimits(limit=2400.0, window=60.0, sweep_cost=5.0, symbol_cost=2.0)
+
+    def __init__(self, rest: str = BINANCE_FAPI) -> None:
+        super().__init__(rest)
+
+    def markets_request(self) -> Request:
+        return f"{self.rest}{EXCHANGE_INFO_PATH}", {}
+
+    def parse_markets(self, body: bytes) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for sym in schemas.binance_exchange_info.decode(body).symbols:
+            if sym.status != "TRADING":
+                continue
+            if sym.contractType != "PERPETUAL":
+                continue
+            if sym.quoteAsset != USDT:
+                continue
+            if sym.baseAsset:
+                out[sym.baseAsset] = sym.symbol or self.raw_symbol(sym.baseAsset)
+        return out
+
+    def volumes_request(self) -> Request:
+        return f"{self.rest}/fapi/v1/ticker/24hr", {}
+
+    def parse_volumes(self, body: bytes) -> Dict[str, float]:
+        return {t.symbol: t.quoteVolume for t in schemas.binance_volumes.decode(body)}
+
+    def tickers_request(self) -> Request:
+        return f"{self.rest}/fapi/v1/ticker/bookTicker", {}
+
+    def parse_tickers(self, body: bytes) -> Dict[str, Top]:
+        return {t.symbol: {"bid": t.bidPrice, "ask": t.askPrice} for t in schemas.binance_book_tickers.decode(body)}
+
+    def book_request(self, symbol: str) -> Request:
+        return f"{self.rest}/fapi/v1/depth", {"symbol": symbol, "limit": 5}
+
+    def parse_book(self, body: bytes) -> Top:
+        book = schemas.binance_depth.decode(body)
+        return book_top(book.bids, book.asks)
+
+    def remaining(self, headers: Mapping[str, str]) -> Optional[float]:
+        used = headers.get(USED_WEIGHT_HEADER)
+        return self.limits.limit - float(used) if used is not None else None
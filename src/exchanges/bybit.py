@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional
+
+from exchanges import schemas
+from exchanges.base import USDT, ExchangeAdapter, Request, Top, VenueLimits, book_top, price, volume
+from transport import BYBIT_API
+
+
+LIMIT_STATUS_HEADER = "x-bapi-limit-status"
+
+
+def _tickers(body: bytes) -> List[schemas.BybitTicker]:
+    result = schemas.bybit_tickers.decode(body).result
+    return result.list if result is not None else []
+
+
+class BybitAdapter(ExchangeAdapter):
+    """Bybit v5 linear (USDT) perpetuals."""
+
+    name = "bybit"
+    # Public market data: 600 requests per 5 s per IP, every request counts as 1
+    limits = VenueLimits(limit=600.0, window=5.0, sweep_cost=1.0, symbol_cost=1.0)
+
+    def __init__(self, rest: str = BYBIT_API) -> None:
+        super().__init__(rest)
+
+    def markets_request(self) -> Request:
+        # 1000 is the page maximum and covers every linear contract today
+        return f"{self.rest}/v5/market/instruments-info", {"category": "linear", "limit": 1000}
+
+    def parse_markets(self, body: bytes) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        result = schemas.bybit_instruments.decode(body).result
+        for inst in result.list if result is not None else []:
+            if inst.status != "Trading":
+                continue
+            if inst.contractType != "LinearPerpetual":
+                continue
+            if inst.quoteCoin != USDT:
+                continue
+            if inst.baseCoin:
+                out[inst.baseCoin] = inst.symbol or self.raw_symbol(inst.baseCoin)
+        return out
+
+    def volumes_request(self) -> Request:
+        return self.tickers_request()
+
+    def parse_volumes(self, body: bytes) -> Dict[str, float]:
+        # USD turnover 24h
+        return {t.symbol: volume(t.turnover24h) for t in _tickers(body)}
+
+    def tickers_request(self) -> Request:
+        return f"{self.rest}/v5/market/tickers", {"category": "linear"}
+
+    def parse_tickers(self, body: bytes) -> Dict[str, Top]:
+        return {t.symbol: {"bid": price(t.bid1Price), "ask": price(t.ask1Price)} for t in _tickers(body)}
+
+    def book_request(self, symbol: str) -> Request:
+        return f"{self.rest}/v5/market/orderbook", {"category": "linear", "symbol": symbol, "limit": 5}
+
+    def parse_book(self, body: bytes) -> Top:
+        result = schemas.bybit_book.decode(body).result
+        return book_top(result.b, result.a) if result is not None else book_top([], [])
+
+    def remaining(self, headers: Mapping[str, str]) -> Optional[float]:
+        left = headers.get(LIMIT_STATUS_HEADER)
+        return float(left) if left is not None else None
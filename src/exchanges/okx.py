@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Dict
+
+from exchanges import schemas
+from exchanges.base import USDT, ExchangeAdapter, Request, Top, VenueLimits, book_top, price, volume
+from transport import OKX_API
+
+
+SWAP_SUFFIX = f"-{USDT}-SWAP"
+
+
+class OkxAdapter(ExchangeAdapter):
+    """OKX USDT-margined perpetual swaps (`BTC-USDT-SWAP`)."""
+
+    name = "okx"
+    # Market data endpoints allow 20 requests per 2 s per IP
+    limits = VenueLimits(limit=20.0, window=2.0, sweep_cost=1.0, symbol_cost=1.0)
+
+    def __init__(self, rest: str = OKX_API) -> None:
+        super().__init__(rest)
+
+    def raw_symbol(self, base: str) -> str:
+        return f"{base}{SWAP_SUFFIX}"
+
+    def markets_request(self) -> Request:
+        return f"{self.rest}/api/v5/public/instruments", {"instType": "SWAP"}
+
+    def parse_markets(self, body: bytes) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for inst in schemas.okx_instruments.decode(body).data:
+            if inst.state != "live" or not inst.instId.endswith(SWAP_SUFFIX):
+                continue
+            out[inst.instId[: -len(SWAP_SUFFIX)]] = inst.instId
+        return out
+
+    def volumes_request(self) -> Request:
+        return self.tickers_request()
+
+    def parse_volumes(self, body: bytes) -> Dict[str, float]:
+        # volCcy24h is in the base currency for swaps
+        return {t.instId: volume(t.volCcy24h) * volume(t.last) for t in schemas.okx_tickers.decode(body).data}
+
+    def tickers_request(self) -> Request:
+        return f"{self.rest}/api/v5/market/tickers", {"instType": "SWAP"}
+
+    def parse_tickers(self, body: bytes) -> Dict[str, Top]:
+        return {t.instId: {"bid": price(t.bidPx), "ask": price(t.askPx)} for t in schemas.okx_tickers.decode(body).data}
+
+    def book_request(self, symbol: str) -> Request:
+        return f"{self.rest}/api/v5/market/books", {"instId": symbol, "sz": 5}
+
+    def parse_book(self, body: bytes) -> Top:
+        books = schemas.okx_books.decode(body).data
+        return book_top(books[0].bids, books[0].asks) if books else book_top([], [])
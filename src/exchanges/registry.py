@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from exchanges.base import ExchangeAdapter
+from exchanges.binance import BinanceAdapter
+from exchanges.bybit import BybitAdapter
+from exchanges.okx import OkxAdapter
+
+
+ADAPTERS: Dict[str, Callable[..., ExchangeAdapter]] = {
+    "binance": BinanceAdapter,
+    "bybit": BybitAdapter,
+    "okx": OkxAdapter,
+}
+DEFAULT_VENUES = ("binance", "bybit")
+
+
+def parse_venues(raw: Optional[str]) -> tuple:
+    # "binance,bybit,okx" -> ("binance", "bybit", "okx"); empty means the defaults
+    venues = tuple(v.strip().lower() for v in (raw or "").split(",") if v.strip())
+    return venues or DEFAULT_VENUES
+
+
+def rest_urls(env: Mapping[str, str]) -> Dict[str, str]:
+    # SPREADS_<VENUE>_REST base URL overrides (a local simulator), only for the venues that set one
+    return {v: env[f"SPREADS_{v.upper()}_REST"] for v in ADAPTERS if env.get(f"SPREADS_{v.upper()}_REST")}
+
+
+def get_adapters(venues: Iterable[str] = DEFAULT_VENUES, rest: Optional[Dict[str, str]] = None) -> List[ExchangeAdapter]:
+    """Adapters for `venues` in order; `rest` overrides base URLs per venue (local mocks)."""
+    out: List[ExchangeAdapter] = []
+    for venue in venues:
+        if venue not in ADAPTERS:
+            raise ValueError(f"unknown venue {venue!r}, expected one of {sorted(ADAPTERS)}")
+        url = (rest or {}).get(venue)
+        out.append(ADAPTERS[venue](url) if url else ADAPTERS[venue]())
+    return out
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+import msgspec
+
+
+# Typed views of the exchange payloads the adapters and streams read. Each struct declares only
+# the fields we use; msgspec skips every other key while parsing, without building dicts or strings
+# for it. Decoders run in lax mode so numeric strings decode straight to float. Prices that a venue
+# sends as "" for an empty book (Bybit, OKX) stay str and go through `base.price`.
+
+T = TypeVar("T")
+Level = Tuple[float, float]
+
+
+# Binance USD-M futures
+
+class BinanceFilter(msgspec.Struct, gc=False):
+    # LOT_SIZE carries stepSize / minQty, PRICE_FILTER tickSize
+    filterType: str = ""
+    stepSize: float = 0.0
+    minQty: float = 0.0
+    tickSize: float = 0.0
+
+
+class BinanceSymbol(msgspec.Struct, gc=False):
+    symbol: str = ""
+    baseAsset: str = ""
+    quoteAsset: str = ""
+    status: str = ""
+    contractType: str = ""
+    filters: List[BinanceFilter] = []
+
+
+class BinanceExchangeInfo(msgspec.Struct, gc=False):
+    symbols: List[BinanceSymbol] = []
+
+
+class BinanceVolume(msgspec.Struct, gc=False):
+    symbol: str = ""
+    quoteVolume: float = 0.0
+
+
+class BinanceBookTicker(msgspec.Struct, gc=False):
+    symbol: str = ""
+    bidPrice: Optional[float] = None
+    askPrice: Optional[float] = None
+
+
+class BinanceDepth(msgspec.Struct, gc=False):
+    bids: List[Level] = []
+    asks: List[Level] = []
+
+
+class BinanceServerTime(msgspec.Struct, gc=False):
+    serverTime: int = 0
+
+
+class BinanceOrderAck(msgspec.Struct, gc=False):
+    # New-order acks and order queries; errors come back as {"code", "msg"} with a 4xx status
+    orderId: Optional[int] = None
+    clientOrderId: str = ""
+    code: int = 0
+    msg: str = ""
+
+
+class BinanceBookTickerEvent(msgspec.Struct, gc=False):
+    # WebSocket `<symbol>@bookTicker`; subscription acks decode with e == ""
+    e: str = ""
+    s: str = ""
+    b: Optional[float] = None
+    a: Optional[float] = None
+    T: Optional[int] = None
+    E: Optional[int] = None
+
+
+# Bybit v5
+
+class BybitList(msgspec.Struct, Generic[T], gc=False):
+    list: List[T] = []
+
+
+class BybitResponse(msgspec.Struct, Generic[T], gc=False):
+    # Error responses carry an empty `result` and a non-zero `retCode`
+    retCode: int = 0
+    retMsg: str = ""
+    result: Optional[T] = None
+
+
+class BybitLotSize(msgspec.Struct, gc=False):
+    qtyStep: float = 0.0
+    minOrderQty: float = 0.0
+
+
+class BybitPriceFilter(msgspec.Struct, gc=False):
+    tickSize: float = 0.0
+
+
+class BybitInstrument(msgspec.Struct, gc=False):
+    symbol: str = ""
+    baseCoin: str = ""
+    quoteCoin: str = ""
+    status: str = ""
+    contractType: str = ""
+    lotSizeFilter: Optional[BybitLotSize] = None
+    priceFilter: Optional[BybitPriceFilter] = None
+
+
+class BybitTicker(msgspec.Struct, gc=False):
+    symbol: str = ""
+    bid1Price: str = ""
+    ask1Price: str = ""
+    turnover24h: str = ""
+
+
+class BybitServerTime(msgspec.Struct, gc=False):
+    # Milliseconds, stamped on every v5 response
+    time: int = 0
+
+
+class BybitOrderResult(msgspec.Struct, gc=False):
+    orderId: str = ""
+    orderLinkId: str = ""
+
+
+class BybitOrderAck(msgspec.Struct, gc=False):
+    # Rejections are HTTP 200 with a non-zero retCode
+    retCode: int = 0
+    retMsg: str = ""
+    result: Optional[BybitOrderResult] = None
+
+
+class BybitBook(msgspec.Struct, gc=False):
+    b: List[Level] = []
+    a: List[Level] = []
+
+
+class BybitBookEvent(msgspec.Struct, gc=False):
+    # WebSocket `orderbook.1.<symbol>`; sizes are needed to tell a removed level from a price
+    s: str = ""
+    b: List[Level] = []
+    a: List[Level] = []
+
+
+class BybitStreamMessage(msgspec.Struct, gc=False):
+    topic: str = ""
+    ts: Optional[int] = None
+    data: Optional[BybitBookEvent] = None
+
+
+# OKX v5
+
+class OkxResponse(msgspec.Struct, Generic[T], gc=False):
+    data: List[T] = []
+
+
+class OkxInstrument(msgspec.Struct, gc=False):
+    instId: str = ""
+    state: str = ""
+
+
+class OkxTicker(msgspec.Struct, gc=False):
+    instId: str = ""
+    bidPx: str = ""
+    askPx: str = ""
+    last: str = ""
+    volCcy24h: str = ""
+
+
+class OkxBook(msgspec.Struct, gc=False):
+    # Levels are [price, size, deprecated, order count]
+    bids: List[List[float]] = []
+    asks: List[List[float]] = []
+
+
+# Ethereum JSON-RPC over WebSocket (Uniswap pools through Multicall3)
+
+class RpcError(msgspec.Struct, gc=False):
+    code: int = 0
+    message: str = ""
+
+
+class BlockHeader(msgspec.Struct, gc=False):
+    number: str = "0x0"
+    timestamp: str = "0x0"
+
+
+class RpcSubscription(msgspec.Struct, gc=False):
+    subscription: str = ""
+    result: Optional[BlockHeader] = None
+
+
+class RpcMessage(msgspec.Struct, gc=False):
+    # A response has `id` and `result` or `error`; a subscription push has `method` and `params`
+    id: Optional[int] = None
+    result: Optional[str] = None
+    error: Optional[RpcError] = None
+    method: str = ""
+    params: Optional[RpcSubscription] = None
+
+
+def decoder(schema: object) -> msgspec.json.Decoder:
+    return msgspec.json.Decoder(schema, strict=False)
+
+
+binance_exchange_info = decoder(BinanceExchangeInfo)
+binance_volumes = decoder(List[BinanceVolume])
+binance_book_tickers = decoder(List[BinanceBookTicker])
+binance_depth = decoder(BinanceDepth)
+binance_book_ticker_event = decoder(BinanceBookTickerEvent)
+binance_server_time = decoder(BinanceServerTime)
+binance_order_ack = decoder(BinanceOrderAck)
+bybit_instruments = decoder(BybitResponse[BybitList[BybitInstrument]])
+bybit_tickers = decoder(BybitResponse[BybitList[BybitTicker]])
+bybit_book = decoder(BybitResponse[BybitBook])
+bybit_stream_message = decoder(BybitStreamMessage)
+bybit_server_time = decoder(BybitServerTime)
+bybit_order_ack = decoder(BybitOrderAck)
+bybit_orders = decoder(BybitResponse[BybitList[BybitOrderResult]])
+okx_instruments = decoder(OkxResponse[OkxInstrument])
+okx_tickers = decoder(OkxResponse[OkxTicker])
+okx_books = decoder(OkxResponse[OkxBook])
+rpc_message = decoder(RpcMessage)
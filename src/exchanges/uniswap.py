@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from typing import Dict, List, Sequence, Tuple
+
+import msgspec
+import numpy as np
+
+
+# Uniswap V3 pools read through Multicall3, deployed at the same address on mainnet, the L2s and
+# any anvil fork of them. One `aggregate3` call carries `slot0()` and `liquidity()` of every pool,
+# so a block costs one eth_call however many pools are tracked. The calldata is built once per
+# pool list; results are decoded from their fixed ABI layout and priced with NumPy, no per-pool
+# ABI decoding in Python.
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3 = "82ad56cb"  # aggregate3((address,bool,bytes)[])
+SLOT0 = "3850c7bd"  # slot0() -> (uint160 sqrtPriceX96, int24 tick, ...)
+LIQUIDITY = "1a686502"  # liquidity() -> uint128
+CALLS_PER_POOL = 2
+Q96 = 2.0 ** 96
+FEE_UNIT = 1_000_000.0
+
+
+class UniswapPool(msgspec.Struct, gc=False):
+    """A pool of `base` against a USD stablecoin; `fee` in hundredths of a bip (500 = 0.05%)."""
+
+    base: str
+    address: str
+    decimals0: int
+    decimals1: int
+    base_is_token0: bool = True
+    fee: int = 3000
+
+
+def load_pools(path: str) -> Dict[str, UniswapPool]:
+    # base -> pool from a JSON list; with several pools for one base the first one listed is used
+    with open(path, "rb") as f:
+        pools = msgspec.json.decode(f.read(), type=List[UniswapPool])
+    out: Dict[str, UniswapPool] = {}
+    for pool in pools:
+        base = pool.base.upper()
+        if base not in out:
+            out[base] = msgspec.structs.replace(pool, base=base, address=pool.address.lower())
+    return out
+
+
+def _word(value: int) -> str:
+    return f"{value:064x}"
+
+
+def aggregate3_calldata(addresses: Sequence[str], multicall: str = MULTICALL3) -> Dict[str, str]:
+    """eth_call transaction reading slot0() then liquidity() of every pool, in `addresses` order."""
+    n = len(addresses) * CALLS_PER_POOL
+    # Array length, then each Call3's offset from the start of the offsets; every Call3 is five
+    # words: target, allowFailure, offset of callData, its length and the selector padded to a word
+    head = [_word(0x20), _word(n)] + [_word(32 * n + 160 * i) for i in range(n)]
+    calls = [
+        _word(int(address, 16)) + _word(1) + _word(0x60) + _word(4) + selector.ljust(64, "0")
+        for address in addresses
+        for selector in (SLOT0, LIQUIDITY)
+    ]
+    return {"to": multicall, "data": "0x" + AGGREGATE3 + "".join(head) + "".join(calls)}
+
+
+def _low(u: np.ndarray, pos: np.ndarray) -> np.ndarray:
+    # Low 64 bits of the ABI words at byte offsets `pos`: lengths, offsets, bools
+    return u[pos // 8 + 3].astype(np.int64)
+
+
+def decode_aggregate3(result: str, pools: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(sqrtPriceX96, liquidity) per pool from `aggregate3` return data, NaN where a call failed.
+
+    The uint160/uint128 words are read as three 64-bit limbs into float64, which keeps 53 bits of
+    the value: ample for a price, and the only precision the rest of the pipeline has anyway.
+    """
+    data = bytes.fromhex(result[2:] if result.startswith("0x") else result)
+    u = np.frombuffer(data, dtype=">u8")
+    array = int(_low(u, np.array([0]))[0])
+    n = int(_low(u, np.array([array]))[0])
+    if n != pools * CALLS_PER_POOL:
+        raise ValueError(f"aggregate3 returned {n} results for {pools} pools")
+    start = array + 32
+    results = start + _low(u, start + 32 * np.arange(n))
+    ok = _low(u, results) != 0
+    data_at = results + _low(u, results + 32)
+    ok &= _low(u, data_at) >= 32
+    word = np.where(ok, data_at + 32, 0) // 8
+    value = u[word + 1].astype(float) * 2.0 ** 128 + u[word + 2].astype(float) * 2.0 ** 64 + u[word + 3].astype(float)
+    value = np.where(ok, value, np.nan)
+    return value[0::CALLS_PER_POOL], value[1::CALLS_PER_POOL]
+
+
+def pool_prices(
+    sqrt_price: np.ndarray,
+    liquidity: np.ndarray,
+    decimals0: np.ndarray,
+    decimals1: np.ndarray,
+    base_is_token0: np.ndarray,
+) -> np.ndarray:
+    """Stablecoin per base from sqrtPriceX96; NaN for pools without in-range liquidity.
+
+    (sqrtPriceX96 / 2**96)**2 is token1 per token0 in raw units; 10**(decimals0 - decimals1)
+    turns it into whole tokens, and pools holding the base as token1 take the inverse.
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        ratio = (sqrt_price / Q96) ** 2 * 10.0 ** (decimals0 - decimals1)
+        price = np.where(base_is_token0, ratio, 1.0 / ratio)
+    return np.where((liquidity > 0) & (price > 0) & np.isfinite(price), price, np.nan)
@@ -0,0 +1,598 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+import msgspec
+import numpy as np
+
+from exchanges import schemas
+from exchanges.base import ExchangeAdapter
+from metrics import counter, gauge, histogram
+from spreads.incremental import BandEvent
+from transport import Transport
+
+
+# Two-leg order entry for band signals without ccxt: no per-call object construction or market
+# loading. Each venue session loads lot and tick sizes once, keys its HMAC once, keeps its
+# connections open and re-estimates the server clock offset on a timer (the same requests keep
+# the pool warm). On a band entry both legs are built, stamped with the venue's clock and signed
+# before any I/O, then sent together. Client order ids derive from the signal; a leg whose request
+# failed after it may have reached the venue is looked up by that id and resent only when the
+# venue has no such order (Binance only rejects a repeated id while the first order is still open,
+# and an IOC order never is). Signal-to-ack latency is
+# measured from the moment the engine hands over the event to the last leg's acknowledgement.
+# A leg that fails while the other is acknowledged is reported, not unwound.
+
+RECV_WINDOW_MS = 5000
+CLOCK_SAMPLES = 5
+RECENT = 200
+
+ORDER_SECONDS = histogram("cryptolab_order_seconds", "Order request round-trip per venue, signing excluded",
+                          ("venue",))
+SIGNAL_TO_ACK = histogram("cryptolab_signal_to_ack_seconds", "Band signal to the acknowledgement of its last leg")
+ORDERS = counter("cryptolab_orders_total",
+                 "Orders sent per venue by outcome: ack, duplicate, recovered (found by lookup), rejected, error",
+                 ("venue", "outcome"))
+SIGNALS_SKIPPED = counter("cryptolab_exec_skipped_total",
+                          "Band entries not executed: not_ready, venue, edge, stale, cooldown, size", ("reason",))
+CLOCK_OFFSET = gauge("cryptolab_clock_offset_ms", "Exchange server clock minus the local clock", ("venue",))
+
+
+class Signer:
+    """HMAC-SHA256 keyed once; every signature continues from a copy of the keyed state."""
+
+    def __init__(self, secret: str) -> None:
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def sign(self, payload: bytes) -> str:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.hexdigest()
+
+
+class ClockSync:
+    """Server-minus-local clock offset from the fastest of a few time requests (NTP-style midpoint)."""
+
+    def __init__(self) -> None:
+        self.offset_ms = 0.0
+        self.rtt_ms: Optional[float] = None
+        self.synced_at = 0.0
+
+    def update(self, samples: List[Tuple[float, float, int]]) -> None:
+        # (local send time, local receive time, server time in ms); the shortest round trip bounds the error best
+        sent, received, server = min(samples, key=lambda s: s[1] - s[0])
+        self.rtt_ms = (received - sent) * 1000.0
+        self.offset_ms = server - (sent + received) / 2.0 * 1000.0
+        self.synced_at = time.monotonic()
+
+    def now_ms(self) -> int:
+        return int(time.time() * 1000.0 + self.offset_ms)
+
+
+@dataclass
+class Instrument:
+    step: float
+    min_qty: float
+    tick: float
+
+
+@dataclass
+class Leg:
+    venue: str
+    symbol: str
+    side: str  # "buy" | "sell"
+    qty: str
+    price: str
+    client_id: str
+
+
+@dataclass
+class Ack:
+    venue: str
+    client_id: str
+    ok: bool
+    status: int = 0
+    order_id: str = ""
+    error: str = ""
+    duplicate: bool = False
+    recovered: bool = False  # the request failed but a lookup found the order
+    attempts: int = 1
+    seconds: float = 0.0
+
+
+@dataclass
+class Execution:
+    signal_id: str
+    base: str
+    legs: List[Ack]
+    sign_seconds: float
+    signal_to_ack: float
+    ts: float = field(default_factory=time.time)
+
+    @property
+    def ok(self) -> bool:
+        return all(a.ok for a in self.legs)
+
+    @property
+    def one_legged(self) -> bool:
+        return any(a.ok for a in self.legs) and not self.ok
+
+
+def _decimals(step: float) -> int:
+    return max(0, -int(math.floor(math.log10(step) + 1e-9))) if step > 0 else 8
+
+
+def _fmt(value: float, step: float, up: bool = False) -> str:
+    # `value` on the `step` grid, rounded down (or up), printed without float noise
+    if step > 0:
+        value = (math.ceil(value / step - 1e-9) if up else math.floor(value / step + 1e-9)) * step
+    return f"{value:.{_decimals(step)}f}"
+
+
+class VenueSession:
+    """Authenticated order entry on one venue: signer, clock, instrument sizes and a pooled client."""
+
+    name = ""
+    time_path = ""
+
+    def __init__(self, adapter: ExchangeAdapter, key: str, secret: str, transport: Transport,
+                 recv_window: int = RECV_WINDOW_MS) -> None:
+        self.adapter = adapter
+        self.key = key
+        self.signer = Signer(secret)
+        self.transport = transport
+        self.recv_window = recv_window
+        self.clock = ClockSync()
+        self.instruments: Dict[str, Instrument] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.transport.async_client(self.adapter.rest)
+
+    async def sync_clock(self, samples: int = CLOCK_SAMPLES) -> None:
+        points: List[Tuple[float, float, int]] = []
+        for _ in range(samples):
+            sent = time.time()
+            r = await self.client.get(self.adapter.rest + self.time_path)
+            received = time.time()
+            r.raise_for_status()
+            points.append((sent, received, self.server_time(r.content)))
+        self.clock.update(points)
+        CLOCK_OFFSET.set(round(self.clock.offset_ms, 1), venue=self.name)
+
+    async def load_instruments(self) -> None:
+        url, params = self.adapter.markets_request()
+        r = await self.client.get(url, params=params)
+        r.raise_for_status()
+        self.instruments = self.parse_instruments(r.content)
+
+    def server_time(self, body: bytes) -> int:
+        raise NotImplementedError
+
+    def parse_instruments(self, body: bytes) -> Dict[str, Instrument]:
+        raise NotImplementedError
+
+    def sign(self, leg: Leg) -> Tuple[str, bytes, Dict[str, str]]:
+        # (url, body, headers) of the order, stamped with the venue clock and signed
+        raise NotImplementedError
+
+    def parse_ack(self, leg: Leg, status: int, body: bytes) -> Ack:
+        raise NotImplementedError
+
+    async def lookup(self, leg: Leg) -> Optional[Ack]:
+        """The venue's order with the leg's client id, None when it has none; raises when it cannot tell."""
+        raise NotImplementedError
+
+    async def send(self, leg: Leg, signed: Tuple[str, bytes, Dict[str, str]], retries: int = 1) -> Ack:
+        """Posts a signed order, resending it re-signed under the same client id after a transport failure.
+
+        A request that failed before anything was written (connect error, no pooled connection) is
+        resent straight away. Any other failure may have placed the order, so it is looked up
+        first: a found order is the leg's ack, and a failed lookup gives up on the leg rather
+        than risk a second order.
+        """
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            attempt += 1
+            url, body, headers = signed
+            try:
+                r = await self.client.post(url, content=body, headers=headers)
+            except httpx.HTTPError as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if not isinstance(exc, (httpx.ConnectError, httpx.PoolTimeout)):
+                    try:
+                        found = await self.lookup(leg)
+                    except (httpx.HTTPError, msgspec.DecodeError, ValueError) as lookup_exc:
+                        ORDERS.inc(venue=self.name, outcome="error")
+                        return Ack(self.name, leg.client_id, False, error=f"{error}; order state unknown, lookup "
+                                   f"failed: {type(lookup_exc).__name__}: {lookup_exc}", attempts=attempt,
+                                   seconds=time.perf_counter() - start)
+                    if found is not None:
+                        ORDERS.inc(venue=self.name, outcome="recovered")
+                        found.recovered = True
+                        found.attempts = attempt
+                        found.seconds = time.perf_counter() - start
+                        return found
+                if attempt <= retries:
+                    signed = self.sign(leg)
+                    continue
+                ORDERS.inc(venue=self.name, outcome="error")
+                return Ack(self.name, leg.client_id, False, error=error, attempts=attempt,
+                           seconds=time.perf_counter() - start)
+            seconds = time.perf_counter() - start
+            ORDER_SECONDS.observe(seconds, venue=self.name)
+            try:
+                ack = self.parse_ack(leg, r.status_code, r.content)
+            except (msgspec.DecodeError, ValueError) as exc:
+                ack = Ack(self.name, leg.client_id, False, r.status_code, error=f"bad response: {exc}")
+            ack.attempts = attempt
+            ack.seconds = seconds
+            ORDERS.inc(venue=self.name, outcome="duplicate" if ack.duplicate else "ack" if ack.ok else "rejected")
+            return ack
+
+
+class BinanceSession(VenueSession):
+    """USD-M futures orders: POST /fapi/v1/order, form body signed with HMAC-SHA256."""
+
+    name = "binance"
+    time_path = "/fapi/v1/time"
+    order_path = "/fapi/v1/order"
+    DUPLICATE = -4116  # ClientOrderId is duplicated; only checked against the account's open orders
+    NOT_FOUND = -2013  # Order does not exist
+
+    def __init__(self, adapter: ExchangeAdapter, key: str, secret: str, transport: Transport,
+                 recv_window: int = RECV_WINDOW_MS) -> None:
+        super().__init__(adapter, key, secret, transport, recv_window)
+        self._headers = {"X-MBX-APIKEY": key, "Content-Type": "application/x-www-form-urlencoded"}
+
+    def server_time(self, body: bytes) -> int:
+        return schemas.binance_server_time.decode(body).serverTime
+
+    def parse_instruments(self, body: bytes) -> Dict[str, Instrument]:
+        out: Dict[str, Instrument] = {}
+        for sym in schemas.binance_exchange_info.decode(body).symbols:
+            lot = next((f for f in sym.filters if f.filterType == "LOT_SIZE"), None)
+            price = next((f for f in sym.filters if f.filterType == "PRICE_FILTER"), None)
+            out[sym.symbol] = Instrument(step=lot.stepSize if lot else 0.0, min_qty=lot.minQty if lot else 0.0,
+                                         tick=price.tickSize if price else 0.0)
+        return out
+
+    def sign(self, leg: Leg) -> Tuple[str, bytes, Dict[str, str]]:
+        query = urlencode({
+            "symbol": leg.symbol,
+            "side": leg.side.upper(),
+            "type": "LIMIT",
+            "timeInForce": "IOC",
+            "quantity": leg.qty,
+            "price": leg.price,
+            "newClientOrderId": leg.client_id,
+            "newOrderRespType": "ACK",
+            "recvWindow": self.recv_window,
+            "timestamp": self.clock.now_ms(),
+        }).encode()
+        return self.adapter.rest + self.order_path, query + b"&signature=" + self.signer.sign(query).encode(), \
+            self._headers
+
+    def parse_ack(self, leg: Leg, status: int, body: bytes) -> Ack:
+        ack = schemas.binance_order_ack.decode(body)
+        if status == 200 and ack.orderId is not None:
+            return Ack(self.name, leg.client_id, True, status, str(ack.orderId))
+        duplicate = ack.code == self.DUPLICATE
+        return Ack(self.name, leg.client_id, duplicate, status, error=f"{ack.code} {ack.msg}", duplicate=duplicate)
+
+    async def lookup(self, leg: Leg) -> Optional[Ack]:
+        query = urlencode({"symbol": leg.symbol, "origClientOrderId": leg.client_id,
+                           "recvWindow": self.recv_window, "timestamp": self.clock.now_ms()})
+        signature = self.signer.sign(query.encode())
+        r = await self.client.get(f"{self.adapter.rest}{self.order_path}?{query}&signature={signature}",
+                                  headers=self._headers)
+        order = schemas.binance_order_ack.decode(r.content)
+        if r.status_code == 200 and order.orderId is not None:
+            return Ack(self.name, leg.client_id, True, r.status_code, str(order.orderId))
+        if order.code == self.NOT_FOUND:
+            return None
+        raise ValueError(f"order query answered {r.status_code}: {order.code} {order.msg}")
+
+
+class BybitSession(VenueSession):
+    """v5 linear orders: POST /v5/order/create, JSON body signed with timestamp + key + recv window."""
+
+    name = "bybit"
+    time_path = "/v5/market/time"
+    order_path = "/v5/order/create"
+    DUPLICATE = 110072  # OrderLinkedID is duplicate
+    lookup_path = "/v5/order/realtime"
+
+    def __init__(self, adapter: ExchangeAdapter, key: str, secret: str, transport: Transport,
+                 recv_window: int = RECV_WINDOW_MS) -> None:
+        super().__init__(adapter, key, secret, transport, recv_window)
+        self._key_window = f"{key}{recv_window}".encode()
+
+    def server_time(self, body: bytes) -> int:
+        return schemas.bybit_server_time.decode(body).time
+
+    def parse_instruments(self, body: bytes) -> Dict[str, Instrument]:
+        result = schemas.bybit_instruments.decode(body).result
+        return {
+            inst.symbol: Instrument(
+                step=inst.lotSizeFilter.qtyStep if inst.lotSizeFilter else 0.0,
+                min_qty=inst.lotSizeFilter.minOrderQty if inst.lotSizeFilter else 0.0,
+                tick=inst.priceFilter.tickSize if inst.priceFilter else 0.0,
+            )
+            for inst in (result.list if result is not None else [])
+        }
+
+    def sign(self, leg: Leg) -> Tuple[str, bytes, Dict[str, str]]:
+        body = msgspec.json.encode({
+            "category": "linear",
+            "symbol": leg.symbol,
+            "side": "Buy" if leg.side == "buy" else "Sell",
+            "orderType": "Limit",
+            "qty": leg.qty,
+            "price": leg.price,
+            "timeInForce": "IOC",
+            "orderLinkId": leg.client_id,
+        })
+        ts = str(self.clock.now_ms())
+        headers = {
+            "X-BAPI-API-KEY": self.key,
+            "X-BAPI-TIMESTAMP": ts,
+            "X-BAPI-RECV-WINDOW": str(self.recv_window),
+            "X-BAPI-SIGN": self.signer.sign(ts.encode() + self._key_window + body),
+            "Content-Type": "application/json",
+        }
+        return self.adapter.rest + self.order_path, body, headers
+
+    def parse_ack(self, leg: Leg, status: int, body: bytes) -> Ack:
+        ack = schemas.bybit_order_ack.decode(body)
+        if status == 200 and ack.retCode == 0 and ack.result is not None:
+            return Ack(self.name, leg.client_id, True, status, ack.result.orderId)
+        duplicate = ack.retCode == self.DUPLICATE
+        return Ack(self.name, leg.client_id, duplicate, status, error=f"{ack.retCode} {ack.retMsg}",
+                   duplicate=duplicate)
+
+    async def lookup(self, leg: Leg) -> Optional[Ack]:
+        query = urlencode({"category": "linear", "symbol": leg.symbol, "orderLinkId": leg.client_id})
+        ts = str(self.clock.now_ms())
+        headers = {
+            "X-BAPI-API-KEY": self.key,
+            "X-BAPI-TIMESTAMP": ts,
+            "X-BAPI-RECV-WINDOW": str(self.recv_window),
+            "X-BAPI-SIGN": self.signer.sign(ts.encode() + self._key_window + query.encode()),
+        }
+        r = await self.client.get(f"{self.adapter.rest}{self.lookup_path}?{query}", headers=headers)
+        orders = schemas.bybit_orders.decode(r.content)
+        if r.status_code != 200 or orders.retCode != 0 or orders.result is None:
+            raise ValueError(f"order query answered {r.status_code}: {orders.retCode} {orders.retMsg}")
+        found = next((o for o in orders.result.list if o.orderLinkId == leg.client_id), None)
+        return Ack(self.name, leg.client_id, True, r.status_code, found.orderId) if found is not None else None
+
+
+SESSIONS = {"binance": BinanceSession, "bybit": BybitSession}
+
+
+def signal_id(e: BandEvent) -> str:
+    # Same signal, same id: a resent leg reuses its client order id, which is what it is looked up by
+    raw = f"{e.base}:{e.buy_venue}:{e.sell_venue}:{int(e.ts * 1000)}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+class Executor:
+    """Sends both legs of each executable band entry at once through warm `VenueSession`s.
+
+    `submit` is an engine `on_events` listener: it only filters and schedules, so the quote loop
+    never waits on an order. A band entry is executed when both venues of its best pair have a
+    session, the pair's edge is at least `min_bps`, both legs' quotes are at most `max_age`
+    seconds old (a venue that stopped answering keeps its last quotes in the table for a while,
+    and a stale leg against a fresh one is a phantom spread), and the base has no execution in flight or
+    within `cooldown` seconds. Both legs are IOC limits `slippage_bps` through the signal's
+    prices for `notional` USDT of the base, on the coarser lot size of the two venues. `owned`,
+    if given, is a transport of the sessions' own that `run` closes on exit.
+    """
+
+    def __init__(
+        self,
+        sessions: Dict[str, VenueSession],
+        notional: float = 50.0,
+        slippage_bps: float = 5.0,
+        min_bps: float = 10.0,
+        cooldown: float = 60.0,
+        max_age: float = 1.5,
+        resync: float = 30.0,
+        owned: Optional[Transport] = None,
+    ) -> None:
+        self.sessions = sessions
+        self.owned = owned
+        self.notional = notional
+        self.slippage = slippage_bps / 10_000.0
+        self.min_bps = min_bps
+        self.cooldown = cooldown
+        self.max_age_ms = max_age * 1000.0
+        self.resync = resync
+        self.ready = False
+        self.recent: Deque[Execution] = deque(maxlen=RECENT)
+        self.executions = 0
+        self.one_legged = 0
+        self.failed = 0
+        self._inflight: "set[str]" = set()
+        self._last: Dict[str, float] = {}
+        self._background: "set[asyncio.Task[Any]]" = set()
+
+    async def start(self) -> None:
+        # Connections, instrument sizes and clock offsets before the first signal
+        for s in self.sessions.values():
+            await s.transport.awarm(s.adapter.rest, 2)
+            await s.load_instruments()
+            await s.sync_clock()
+            print(f"[Exec] {s.name}: {len(s.instruments)} instruments, clock offset {s.clock.offset_ms:+.1f} ms "
+                  f"(rtt {s.clock.rtt_ms:.1f} ms)")
+        self.ready = True
+
+    async def run(self) -> None:
+        try:
+            while not self.ready:
+                try:
+                    await self.start()
+                except Exception as exc:  # noqa: BLE001 - retried until the venues answer
+                    print(f"[Exec] start failed: {type(exc).__name__}: {exc}")
+                    await asyncio.sleep(5.0)
+            while True:
+                # Resyncing the clock is also what keeps the order connections from idling out
+                await asyncio.sleep(self.resync)
+                for s in self.sessions.values():
+                    try:
+                        await s.sync_clock()
+                    except Exception as exc:  # noqa: BLE001 - keep the last offset
+                        print(f"[Exec] {s.name} clock sync failed: {type(exc).__name__}: {exc}")
+        finally:
+            # Orders already out are waited for, not cancelled: their acks are the only record of them
+            if self._background:
+                await asyncio.wait(list(self._background), timeout=5.0)
+            if self.owned is not None:
+                await self.owned.aclose()
+
+    def submit(self, events: List[BandEvent]) -> None:
+        received = time.perf_counter()
+        for e in events:
+            if e.kind != "enter":
+                continue
+            reason = self._skip(e, received)
+            if reason:
+                SIGNALS_SKIPPED.inc(reason=reason)
+                continue
+            self._inflight.add(e.base)
+            self._last[e.base] = received
+            task = asyncio.create_task(self.execute(e, received))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    def _skip(self, e: BandEvent, now: float) -> str:
+        if not self.ready:
+            return "not_ready"
+        if e.buy_venue not in self.sessions or e.sell_venue not in self.sessions:
+            return "venue"
+        if e.best_bps is None or e.best_bps < self.min_bps:
+            return "edge"
+        oldest = min(e.buy_ts or 0, e.sell_ts or 0)
+        if time.time() * 1000.0 - oldest > self.max_age_ms:
+            return "stale"
+        if e.base in self._inflight or now - self._last.get(e.base, -math.inf) < self.cooldown:
+            return "cooldown"
+        return ""
+
+    def legs(self, e: BandEvent) -> Optional[Tuple[Leg, Leg]]:
+        buy, sell = self.sessions[e.buy_venue or ""], self.sessions[e.sell_venue or ""]
+        buy_symbol, sell_symbol = buy.adapter.raw_symbol(e.base), sell.adapter.raw_symbol(e.base)
+        bi, si = buy.instruments.get(buy_symbol), sell.instruments.get(sell_symbol)
+        if bi is None or si is None or not e.buy_price or not e.sell_price:
+            return None
+        step = max(bi.step, si.step)
+        qty = math.floor(self.notional / e.buy_price / step + 1e-9) * step if step > 0 else self.notional / e.buy_price
+        if qty <= 0 or qty < max(bi.min_qty, si.min_qty):
+            return None
+        sid = signal_id(e)
+        return (
+            Leg(buy.name, buy_symbol, "buy", _fmt(qty, step), _fmt(e.buy_price * (1.0 + self.slippage), bi.tick),
+                f"cl{sid}b"),
+            Leg(sell.name, sell_symbol, "sell", _fmt(qty, step),
+                _fmt(e.sell_price * (1.0 - self.slippage), si.tick, up=True), f"cl{sid}s"),
+        )
+
+    async def execute(self, e: BandEvent, received: Optional[float] = None) -> Optional[Execution]:
+        """Both legs of `e` signed up front and sent together; None when the signal has no valid size."""
+        received = time.perf_counter() if received is None else received
+        try:
+            legs = self.legs(e)
+            if legs is None:
+                SIGNALS_SKIPPED.inc(reason="size")
+                return None
+            sessions = [self.sessions[leg.venue] for leg in legs]
+            signed = [s.sign(leg) for s, leg in zip(sessions, legs)]
+            sign_seconds = time.perf_counter() - received
+            acks = await asyncio.gather(*(s.send(leg, req) for s, leg, req in zip(sessions, legs, signed)))
+            done = time.perf_counter()
+        finally:
+            self._inflight.discard(e.base)
+        SIGNAL_TO_ACK.observe(done - received)
+        ex = Execution(signal_id(e), e.base, list(acks), sign_seconds, done - received)
+        self.recent.append(ex)
+        self.executions += 1
+        if ex.one_legged:
+            self.one_legged += 1
+            print(f"[Exec] {e.symbol} ONE LEG ONLY: " + "; ".join(
+                f"{a.venue} {'ok ' + a.order_id if a.ok else a.error}" for a in acks))
+        elif not ex.ok:
+            self.failed += 1
+            print(f"[Exec] {e.symbol} rejected: " + "; ".join(f"{a.venue} {a.error}" for a in acks))
+        else:
+            print(f"[Exec] {e.symbol} buy {legs[0].venue} / sell {legs[1].venue} {legs[0].qty} at "
+                  f"{e.best_bps} bps, signal-to-ack {ex.signal_to_ack * 1000:.1f} ms")
+        return ex
+
+    def summary(self) -> Dict[str, Any]:
+        acks = np.array([ex.signal_to_ack for ex in self.recent]) * 1000.0
+        return {
+            "ready": self.ready,
+            "executions": self.executions,
+            "one_legged": self.one_legged,
+            "failed": self.failed,
+            "signal_to_ack_ms_p50": round(float(np.percentile(acks, 50)), 2) if len(acks) else None,
+            "signal_to_ack_ms_p99": round(float(np.percentile(acks, 99)), 2) if len(acks) else None,
+            "clock": {name: {"offset_ms": round(s.clock.offset_ms, 1),
+                             "rtt_ms": round(s.clock.rtt_ms, 2) if s.clock.rtt_ms is not None else None}
+                      for name, s in self.sessions.items()},
+        }
+
+
+def from_env(adapters: List[ExchangeAdapter], transport: Optional[Transport] = None) -> Optional[Executor]:
+    """Executor for SPREADS_EXECUTE=1 over the venues with <VENUE>_API_KEY / _API_SECRET set; None otherwise.
+
+    Orders get their own small `Transport` by default, so they never queue behind a quote sweep
+    for a pooled connection.
+    """
+    env = os.environ
+    if env.get("SPREADS_EXECUTE", "0") != "1":
+        return None
+    owned = None
+    if transport is None:
+        transport = owned = Transport(
+            timeout=float(env.get("SPREADS_EXEC_TIMEOUT", "2")),
+            max_connections=4,
+            keepalive_expiry=float(env.get("TRANSPORT_KEEPALIVE", "90")),
+            dns_ttl=float(env.get("TRANSPORT_DNS_TTL", "300")),
+        )
+    sessions: Dict[str, VenueSession] = {}
+    for adapter in adapters:
+        cls = SESSIONS.get(adapter.name)
+        key = env.get(f"{adapter.name.upper()}_API_KEY", "")
+        secret = env.get(f"{adapter.name.upper()}_API_SECRET", "")
+        if cls is not None and key and secret:
+            sessions[adapter.name] = cls(adapter, key, secret, transport,
+                                         int(env.get("SPREADS_EXEC_RECV_WINDOW", str(RECV_WINDOW_MS))))
+    if len(sessions) < 2:
+        print(f"[Exec] SPREADS_EXECUTE needs API keys for two of {', '.join(SESSIONS)}; "
+              f"have {', '.join(sessions) or 'none'}, not executing")
+        return None
+    executor = Executor(
+        sessions,
+        notional=float(env.get("SPREADS_EXEC_NOTIONAL", "50")),
+        slippage_bps=float(env.get("SPREADS_EXEC_SLIPPAGE_BPS", "5")),
+        min_bps=float(env.get("SPREADS_EXEC_MIN_BPS", "10")),
+        cooldown=float(env.get("SPREADS_EXEC_COOLDOWN", "60")),
+        max_age=float(env.get("SPREADS_EXEC_MAX_AGE", "1.5")),
+        owned=owned,
+    )
+    print(f"[Exec] Executing on {', '.join(sessions)}: {executor.notional:g} USDT per leg, "
+          f"min edge {executor.min_bps:g} bps, slippage {executor.slippage * 10_000.0:g} bps")
+    return executor
@@ -1,18 +1,9 @@
 def main() -> None:
-    from scheduler import start_scheduler
+    # Scanner and spread loop in one process; `python src/scheduler.py` still runs the scanner alone
+    from runtime import main as run
 
-    start_scheduler()
-    print("Scheduler started. Press Ctrl+C to stop.")
-    try:
-        import time
-
-        while True:
-            time.sleep(60)
-    except KeyboardInterrupt:
-        pass
+    run()
 
 
 if __name__ == "__main__":
     main()
-
-
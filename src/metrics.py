@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+# Request latencies from ~1 ms (local mock) to a 10 s deadline
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """One metric family with a fixed label set; samples are keyed by label values in that order."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+    def _label_str(self, key: Labels, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def set(self, value: float, **labels: str) -> None:
+        # For totals another component already counts (stream messages); Prometheus only sees the value
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def clear(self) -> None:
+        with self._lock:
+            self.values = {}
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        out: List[str] = []
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self.values.items())
+        for key, counts in items:
+            total = 0.0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                total += n
+                le = 'le="' + _fmt(bound) + '"'
+                out.append(f"{self.name}_bucket{self._label_str(key, le)} {_fmt(total)}")
+            out.append(f"{self.name}_sum{self._label_str(key)} {counts[-1]!r}")
+            out.append(f"{self.name}_count{self._label_str(key)} {_fmt(total)}")
+        return out
+
+
+class Registry:
+    """Metric families plus scrape callbacks that refresh gauges computed on demand (quote ages)."""
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        for collect in list(self.collectors):
+            try:
+                collect()
+            except Exception as exc:  # noqa: BLE001 - a broken collector must not break the scrape
+                print(f"[Metrics] Collector {getattr(collect, '__qualname__', collect)} failed: {exc}")
+        return "\n".join(m.render() for m in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))  # type: ignore[return-value]
+
+
+def gauge(name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels))  # type: ignore[return-value]
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))  # type: ignore[return-value]
+
+
+# Shared families; components import these rather than defining their own
+
+REQUEST_SECONDS = histogram("cryptolab_request_seconds", "Exchange REST request latency, parsing excluded",
+                            ("venue", "endpoint"))
+REQUEST_ERRORS = counter("cryptolab_request_errors_total",
+                         "Failed exchange requests by kind: timeout, http_<status>, parse or the exception name",
+                         ("venue", "endpoint", "error"))
+STAGE_SECONDS = histogram("cryptolab_stage_seconds", "Time spent per pipeline stage and venue", ("stage", "venue"))
+
+
+def error_kind(exc: BaseException) -> str:
+    # Duck-typed so this module does not need httpx: timeouts, HTTP status errors, anything else by name
+    name = type(exc).__name__
+    if "Timeout" in name:
+        return "timeout"
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return f"http_{response.status_code}"
+    return name
+
+
+@contextmanager
+def span(stage: str, venue: str = "") -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, venue=venue)
+
+
+# Sampling profiler
+
+class Sampler:
+    """Wall-clock sampling profiler: a daemon thread snapshots every thread's stack `hz` times a
+    second and counts them in folded form (`a;b;c count`, one line per distinct stack), ready for
+    flamegraph.pl or speedscope. Nothing is traced between samples, so the overhead is one
+    `sys._current_frames()` walk per tick."""
+
+    def __init__(self, hz: float = 100.0, max_depth: int = 64) -> None:
+        self.interval = 1.0 / hz
+        self.max_depth = max_depth
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack: List[str] = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(names.get(ident, "thread"))
+                    key = ";".join(reversed(stack))
+                    self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def folded(self, reset: bool = False) -> str:
+        with self._lock:
+            lines = [f"{stack} {n}" for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1])]
+            if reset:
+                self.stacks = {}
+        return "\n".join(lines) + "\n"
+
+
+# HTTP endpoint
+
+class _Handler(BaseHTTPRequestHandler):
+    sampler: Optional[Sampler] = None
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._send(200, REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+        elif url.path == "/profile" and self.sampler is not None:
+            reset = parse_qs(url.query).get("reset", ["0"])[0] == "1"
+            self._send(200, self.sampler.folded(reset), "text/plain; charset=utf-8")
+        else:
+            self._send(404, "not found\n", "text/plain")
+
+    def _send(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_sampler: Optional[Sampler] = None
+_start_lock = threading.Lock()
+
+
+def serve(port: int, host: str = "127.0.0.1", sampler: Optional[Sampler] = None) -> ThreadingHTTPServer:
+    """Serves `/metrics` (Prometheus text format) and, with a sampler, `/profile` from a daemon thread."""
+    handler = type("Handler", (_Handler,), {"sampler": sampler})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_from_env() -> Optional[ThreadingHTTPServer]:
+    """Starts the endpoint on METRICS_PORT (off when empty or 0) and the sampler when
+    METRICS_PROFILE_HZ > 0. Safe to call more than once per process."""
+    global _server, _sampler
+    env = os.environ
+    with _start_lock:
+        hz = float(env.get("METRICS_PROFILE_HZ", "0") or 0)
+        if hz > 0 and _sampler is None:
+            _sampler = Sampler(hz)
+            _sampler.start()
+        port = int(env.get("METRICS_PORT", "0") or 0)
+        if port and _server is None:
+            host = env.get("METRICS_HOST", "127.0.0.1")
+            _server = serve(port, host, _sampler)
+            print(f"[Metrics] Serving http://{host}:{port}/metrics" + (f" and /profile ({hz:g} Hz)" if _sampler else ""))
+        return _server
+
+
+def sampler() -> Optional[Sampler]:
+    return _sampler
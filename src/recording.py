@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import atexit
+import glob
+import gzip
+import heapq
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Union
+
+import msgspec
+
+
+# Append-only capture of the raw market data a process received, for offline replay
+# (`scripts/replay.py`). One gzip file per UTC hour, process tag and process start
+# (`20240501-13-loop-1714568400-4242.rec.gz`: start time and pid); each record is a little-endian
+# u32 length followed by a msgpack `Record`. A restart opens a new file rather than appending a
+# gzip member after a tail the previous process may have left truncated. The file is flushed
+# every `flush_interval` seconds, so a crash loses at most that much and readers stop cleanly at
+# a truncated or corrupt tail.
+
+FRAME = struct.Struct("<I")
+SUFFIX = ".rec.gz"
+
+# channel values
+REST = "rest"      # a response body: venue, endpoint (tickers, book, snapshot, markets, volumes, pools), key (symbol or block)
+WS = "ws"          # a WebSocket message as received
+VALUE = "value"    # an already-parsed value served from a cache (scanner market lists), msgspec JSON
+TABLE = "table"    # the spread loop's universe: {"mode", "venues", "legs", "reshape"} as JSON
+CYCLE = "cycle"    # end of one polling cycle; replays evaluate REST quotes at these marks
+SCAN = "scan"      # end of one scanner run: {"venues", "min_volume_usd"} as JSON
+
+
+class Record(msgspec.Struct, array_like=True, gc=False):
+    ts: float
+    channel: str
+    venue: str = ""
+    endpoint: str = ""
+    key: str = ""
+    payload: bytes = b""
+
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(Record)
+
+
+class Recorder:
+    """Writes `Record`s for one process into `directory`; safe to call from threads."""
+
+    def __init__(self, directory: str, tag: str, compresslevel: int = 3, flush_interval: float = 1.0) -> None:
+        self.directory = directory
+        self.tag = tag
+        self.compresslevel = compresslevel
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.run = f"{int(time.time())}-{os.getpid()}"
+        self._hour = -1
+        self._file: Optional[gzip.GzipFile] = None
+        self._flushed = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self, ts: float) -> None:
+        hour = int(ts // 3600)
+        if hour == self._hour and self._file is not None:
+            return
+        if self._file is not None:
+            self._file.close()
+        self._hour = hour
+        name = f"{time.strftime('%Y%m%d-%H', time.gmtime(ts))}-{self.tag}-{self.run}{SUFFIX}"
+        self._file = gzip.open(os.path.join(self.directory, name), "ab", compresslevel=self.compresslevel)
+
+    def write(self, channel: str, venue: str = "", endpoint: str = "", key: str = "",
+              payload: Union[bytes, str] = b"") -> None:
+        ts = time.time()
+        data = payload.encode() if isinstance(payload, str) else bytes(payload)
+        frame = _encoder.encode(Record(ts, channel, venue, endpoint, key, data))
+        with self._lock:
+            self._rotate(ts)
+            assert self._file is not None
+            self._file.write(FRAME.pack(len(frame)))
+            self._file.write(frame)
+            self.records += 1
+            if ts - self._flushed >= self.flush_interval:
+                self._file.flush()
+                self._flushed = ts
+
+    def rest(self, venue: str, endpoint: str, key: str, body: bytes) -> None:
+        self.write(REST, venue, endpoint, key, body)
+
+    def ws(self, venue: str, raw: Union[bytes, str]) -> None:
+        self.write(WS, venue, payload=raw)
+
+    def value(self, venue: str, endpoint: str, value: Any) -> None:
+        self.write(VALUE, venue, endpoint, payload=msgspec.json.encode(value))
+
+    def mark(self, channel: str, payload: Any = None) -> None:
+        self.write(channel, payload=msgspec.json.encode(payload) if payload is not None else b"")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_active: Optional[Recorder] = None
+_start_lock = threading.Lock()
+
+
+def start_from_env(tag: str) -> Optional[Recorder]:
+    """Starts recording to RECORD_DIR (off when empty) under `tag`; later calls return the same recorder."""
+    global _active
+    directory = os.environ.get("RECORD_DIR", "")
+    with _start_lock:
+        if directory and _active is None:
+            _active = Recorder(directory, tag, compresslevel=int(os.environ.get("RECORD_COMPRESSLEVEL", "3")))
+            atexit.register(_active.close)
+            print(f"[Recorder] Recording raw market data to {directory} as {tag}")
+        return _active
+
+
+def active() -> Optional[Recorder]:
+    return _active
+
+
+def _read_file(path: str) -> Iterator[Record]:
+    with gzip.open(path, "rb") as f:
+        try:
+            while True:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return
+                (size,) = FRAME.unpack(head)
+                frame = f.read(size)
+                if len(frame) < size:
+                    return
+                yield _decoder.decode(frame)
+        except (EOFError, OSError, zlib.error, msgspec.DecodeError):
+            # Truncated tail of a file whose writer did not close it, or a member appended after
+            # one (files written before each process start got its own file)
+            return
+
+
+def files(paths: Union[str, Sequence[str]]) -> List[str]:
+    # Directories expand to their recordings; hour-prefixed names sort chronologically
+    out: List[str] = []
+    for p in [paths] if isinstance(paths, str) else paths:
+        out.extend(sorted(glob.glob(os.path.join(p, f"*{SUFFIX}"))) if os.path.isdir(p) else [p])
+    return out
+
+
+def read(paths: Union[str, Sequence[str]], start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Record]:
+    """Records from every file under `paths` merged by timestamp (several processes record side by side)."""
+    streams: Iterable[Iterator[Record]] = [_read_file(p) for p in files(paths)]
+    for rec in heapq.merge(*streams, key=lambda r: r.ts):
+        if start is not None and rec.ts < start:
+            continue
+        if end is not None and rec.ts >= end:
+            return
+        yield rec
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from metrics import counter, gauge
+
+
+# Tail-latency and failure handling for exchange REST requests. A request still unanswered when
+# it passes an adaptive percentile of its endpoint's recent latencies gets one duplicate ("hedge")
+# and whichever answers first wins; the other is cancelled. Hedges are paid for out of a budget
+# that grows by `hedge_ratio` per request, so they stay a bounded share of the load even when a
+# venue slows down as a whole. A circuit breaker per venue stops sending after a run of failures,
+# timeouts or a 429/418 and lets one probe through after a cooldown that doubles while probes
+# keep failing; callers treat an open breaker as "no new quotes" and keep the old ones.
+
+LATENCY_SAMPLES = 256
+# Below this many samples an endpoint is not hedged: its percentile means nothing yet
+MIN_SAMPLES = 20
+# The percentile is recomputed every this many samples, not on every request
+RECOMPUTE_EVERY = 16
+HEDGE_BURST = 10.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUE = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+HEDGES = counter("cryptolab_hedged_requests_total", "Duplicate requests sent after the first passed the hedge delay",
+                 ("venue", "endpoint"))
+HEDGE_WINS = counter("cryptolab_hedge_wins_total", "Hedged requests that the duplicate answered first",
+                     ("venue", "endpoint"))
+BREAKER_STATE = gauge("cryptolab_circuit_state", "Circuit breaker per venue: 0 closed, 1 open, 2 half-open",
+                      ("venue",))
+BREAKER_TRIPS = counter("cryptolab_circuit_trips_total", "Times a venue's circuit breaker opened", ("venue",))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request to a venue whose breaker is open."""
+
+    def __init__(self, venue: str) -> None:
+        super().__init__(f"circuit open for {venue}")
+        self.venue = venue
+
+
+def failed(r: httpx.Response) -> bool:
+    # Server-side trouble or throttling; other 4xx are our mistake and say nothing about the venue
+    return r.status_code >= 500 or r.status_code in (418, 429)
+
+
+def retry_after(r: httpx.Response) -> Optional[float]:
+    if r.status_code not in (418, 429):
+        return None
+    try:
+        return float(r.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    """The last `size` latencies of one (venue, endpoint) in a ring, with a cached percentile."""
+
+    def __init__(self, size: int = LATENCY_SAMPLES) -> None:
+        self.samples = np.zeros(size)
+        self.n = 0
+        self._cached: Dict[float, float] = {}
+
+    def add(self, seconds: float) -> None:
+        self.samples[self.n % len(self.samples)] = seconds
+        self.n += 1
+        if self.n % RECOMPUTE_EVERY == 0:
+            self._cached = {}
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n < MIN_SAMPLES:
+            return None
+        value = self._cached.get(q)
+        if value is None:
+            value = self._cached[q] = float(np.quantile(self.samples[:min(self.n, len(self.samples))], q))
+        return value
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one venue.
+
+    `failures` failures in a row (or one 429/418) open it for `cooldown` seconds, or for the
+    venue's Retry-After if that is longer. Then one probe request is let through: success closes
+    the breaker, failure re-opens it for twice as long, up to `max_cooldown`. Outcomes of requests
+    that were already out while the breaker was open are ignored, and a request the caller gave up
+    on only counts when nothing else from the venue succeeded while it was out: a cycle deadline
+    cancelling a batch of depth requests says more about the batch than about the venue.
+    """
+
+    def __init__(self, venue: str, failures: int = 5, cooldown: float = 5.0, max_cooldown: float = 60.0) -> None:
+        self.venue = venue
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.until = 0.0
+        self.last_ok = 0.0
+        self._open_for = 0.0
+        self._probing = False
+        BREAKER_STATE.set(0, venue=venue)
+
+    @property
+    def blocked(self) -> bool:
+        # Open and not yet due for a probe: callers can skip the venue without asking per request
+        return self.state == OPEN and time.monotonic() < self.until
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self.until:
+            self._set(HALF_OPEN)
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool, retry_after: Optional[float] = None) -> None:
+        if ok:
+            self.last_ok = time.monotonic()
+        if self.state == OPEN:
+            return
+        if ok:
+            if self.state == HALF_OPEN:
+                print(f"[Breaker] {self.venue} closed after a successful probe")
+            self._set(CLOSED)
+            self.failures = 0
+            self._open_for = 0.0
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold or retry_after is not None:
+            self._open(retry_after)
+
+    def abandon(self, sent: float) -> None:
+        # A request sent at `sent` (monotonic) and cancelled before it was answered
+        if self.last_ok < sent or self.state == HALF_OPEN:
+            self.record(False)
+
+    def _open(self, retry_after: Optional[float]) -> None:
+        self._open_for = min(self._open_for * 2.0, self.max_cooldown) if self._open_for else self.cooldown
+        wait = max(self._open_for, retry_after or 0.0)
+        self.until = time.monotonic() + wait
+        self.trips += 1
+        BREAKER_TRIPS.inc(venue=self.venue)
+        print(f"[Breaker] {self.venue} open for {wait:.1f}s after {self.failures} failure(s)")
+        self._set(OPEN)
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUE[state], venue=self.venue)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_in": round(max(self.until - time.monotonic(), 0.0), 1) if self.state == OPEN else 0.0,
+        }
+
+
+def _consume(task: "asyncio.Future[Any]") -> None:
+    # Losing attempts are cancelled or fail on their own; fetch the outcome so asyncio does not log it
+    if not task.cancelled():
+        task.exception()
+
+
+class RequestPolicy:
+    """Hedging and circuit breaking for the async GETs of the spread loop, one state per venue.
+
+    `hedge_quantile` of an endpoint's recent latencies (at least `hedge_min_ms`) is how long a
+    request may run before its duplicate goes out. `stale_ttl` is how long callers keep the last
+    quotes of a venue that stopped answering before dropping them.
+    """
+
+    def __init__(
+        self,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_ms: float = 10.0,
+        hedge_ratio: float = 0.1,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 5.0,
+        breaker_max_cooldown: float = 60.0,
+        stale_ttl: float = 60.0,
+    ) -> None:
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min = hedge_min_ms / 1000.0
+        self.hedge_ratio = hedge_ratio
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.breaker_max_cooldown = breaker_max_cooldown
+        self.stale_ttl = stale_ttl
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self.requests: Dict[str, int] = {}
+        self.hedged: Dict[str, int] = {}
+        self.hedge_wins: Dict[str, int] = {}
+        self._budget: Dict[str, float] = {}
+
+    def breaker(self, venue: str) -> CircuitBreaker:
+        b = self.breakers.get(venue)
+        if b is None:
+            b = self.breakers[venue] = CircuitBreaker(
+                venue, self.breaker_failures, self.breaker_cooldown, self.breaker_max_cooldown)
+        return b
+
+    def hedge_delay(self, venue: str, endpoint: str) -> Optional[float]:
+        # Seconds before a hedge goes out, None while the endpoint has too few samples
+        tracker = self.latency.get((venue, endpoint))
+        q = tracker.quantile(self.hedge_quantile) if tracker is not None else None
+        return None if q is None else max(q, self.hedge_min)
+
+    def _spend_hedge(self, venue: str) -> bool:
+        budget = self._budget.get(venue, 0.0)
+        if budget < 1.0:
+            return False
+        self._budget[venue] = budget - 1.0
+        return True
+
+    async def get(self, c: httpx.AsyncClient, url: str, params: Dict[str, Any], venue: str,
+                  endpoint: str) -> httpx.Response:
+        """GET through the venue's breaker, hedged once past the endpoint's latency percentile.
+
+        Raises `CircuitOpen` without sending anything while the breaker is open. Failed and
+        throttled responses are returned like any other; the caller decides what they mean.
+        """
+        breaker = self.breaker(venue)
+        if not breaker.allow():
+            raise CircuitOpen(venue)
+        self.requests[venue] = self.requests.get(venue, 0) + 1
+        self._budget[venue] = min(self._budget.get(venue, 0.0) + self.hedge_ratio, HEDGE_BURST)
+        delay = self.hedge_delay(venue, endpoint) if self.hedge and breaker.state == CLOSED else None
+        sent = time.monotonic()
+        start = time.perf_counter()
+        first = asyncio.ensure_future(c.get(url, params=params))
+        attempts: List["asyncio.Future[httpx.Response]"] = [first]
+        try:
+            if delay is not None:
+                await asyncio.wait(attempts, timeout=delay)
+                if not first.done() and self._spend_hedge(venue):
+                    self.hedged[venue] = self.hedged.get(venue, 0) + 1
+                    HEDGES.inc(venue=venue, endpoint=endpoint)
+                    attempts.append(asyncio.ensure_future(c.get(url, params=params)))
+            winner = await _first_answer(attempts)
+            r = winner.result()
+        except asyncio.CancelledError:
+            # Cut off by the caller's deadline
+            breaker.abandon(sent)
+            raise
+        except Exception:
+            breaker.record(False)
+            raise
+        finally:
+            for a in attempts:
+                if not a.done():
+                    a.cancel()
+                a.add_done_callback(_consume)
+        self.latency.setdefault((venue, endpoint), LatencyTracker()).add(time.perf_counter() - start)
+        if winner is not first:
+            self.hedge_wins[venue] = self.hedge_wins.get(venue, 0) + 1
+            HEDGE_WINS.inc(venue=venue, endpoint=endpoint)
+        breaker.record(not failed(r), retry_after(r))
+        return r
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for venue, b in self.breakers.items():
+            delays = {endpoint: self.hedge_delay(v, endpoint) for v, endpoint in self.latency if v == venue}
+            out[venue] = {
+                **b.summary(),
+                "requests": self.requests.get(venue, 0),
+                "hedged": self.hedged.get(venue, 0),
+                "hedge_wins": self.hedge_wins.get(venue, 0),
+                "hedge_delay_ms": {k: round(d * 1000.0, 1) for k, d in delays.items() if d is not None},
+            }
+        return out
+
+
+async def _first_answer(attempts: List["asyncio.Future[httpx.Response]"]) -> "asyncio.Future[httpx.Response]":
+    # The first attempt with a usable response; a failed one only wins when every attempt failed
+    pending = set(attempts)
+    fallback: Optional["asyncio.Future[httpx.Response]"] = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for a in sorted(done, key=attempts.index):
+            if a.exception() is None and not failed(a.result()):
+                return a
+            if fallback is None:
+                fallback = a
+    return fallback or attempts[0]
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+import msgspec
+
+import alerts
+import execution
+import metrics
+import recording
+from exchanges.registry import get_adapters, rest_urls
+from spreads.engine import EngineConfig, SpreadEngine
+from tasks.market_scanner import CandidateDelta, MarketCandidate, MetadataCache, read_candidates, scan_universe
+from transport import Transport, get_transport
+
+
+# One process for the scanner and the spread loop. The engine is a long-lived task on the event
+# loop; the scanner's blocking downloads run on a one-thread executor every SCANNER_INTERVAL_MINUTES
+# and their result is handed to `SpreadEngine.set_universe` on the loop, so only the symbols that
+# changed are (un)subscribed and the engine never re-reads candidates.json (still written for the
+# API and other readers). SIGTERM and SIGINT stop the engine, flush the exports and the alert
+# queue, and exit.
+
+
+class Runtime:
+    """Supervises the spread engine and the periodic scanner in one event loop."""
+
+    def __init__(
+        self,
+        config: EngineConfig,
+        scan_interval: float = 300.0,
+        min_volume_usd: float = 300_000.0,
+        cache: Optional[MetadataCache] = None,
+    ) -> None:
+        self.config = config
+        self.scan_interval = scan_interval
+        self.min_volume_usd = min_volume_usd
+        self.cache = cache or MetadataCache()
+        self.engine = SpreadEngine(config, watch=False)
+        self.scans = 0
+        self.scan_failures = 0
+        # The scanner keeps its own blocking clients, apart from the engine's async ones
+        self._transport = Transport(http2=get_transport().http2)
+        self._adapters = get_adapters(config.venues, rest_urls(os.environ))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scanner")
+        self._stop: Optional[asyncio.Event] = None
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+        dispatcher = alerts.start_from_env(default_sinks="console")
+        if dispatcher is not None:
+            self.engine.on_events.append(dispatcher.publish)
+        executor = execution.from_env(self.engine.adapters)
+        if executor is not None:
+            self.engine.execute_with(executor)
+        tasks: List["asyncio.Task[Any]"] = []
+        try:
+            # Start from the last scan on disk; without one, the engine waits for the first scan
+            candidates = read_candidates(self.config.candidates_path)
+            if candidates:
+                self.engine.set_universe(msgspec.to_builtins(candidates))
+            else:
+                while not self._stop.is_set() and not await self.scan():
+                    await self._sleep(min(self.scan_interval, 30.0))
+                if self._stop.is_set():
+                    return
+            print(f"[Runtime] {len(self.engine.tracker.table) if self.engine.tracker else 0} symbols, "
+                  f"scanning every {self.scan_interval:.0f}s")
+            engine = asyncio.create_task(self.engine.run(), name="engine")
+            scanner = asyncio.create_task(self._scan_loop(skip_first=not candidates), name="scanner")
+            stopped = asyncio.create_task(self._stop.wait(), name="stop")
+            tasks = [engine, scanner, stopped]
+            done, _ = await asyncio.wait([engine, stopped], return_when=asyncio.FIRST_COMPLETED)
+            if engine in done and not engine.cancelled() and engine.exception() is not None:
+                print(f"[Runtime] Engine failed: {engine.exception()!r}")
+        finally:
+            print("[Runtime] Shutting down")
+            for t in tasks:
+                t.cancel()
+            # The engine's own cleanup (sockets, shard workers, exports) runs inside its cancellation
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            # A scan still downloading finishes in its thread; its result is not applied
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if dispatcher is not None:
+                self.engine.on_events.remove(dispatcher.publish)
+                await asyncio.to_thread(dispatcher.close)
+            print("[Runtime] Stopped")
+
+    async def scan(self) -> bool:
+        """Runs one scan off the loop and applies its candidates; False when it failed."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            candidates, delta = await loop.run_in_executor(self._executor, self._scan_blocking)
+        except Exception as exc:  # noqa: BLE001 - the next scan retries
+            self.scan_failures += 1
+            print(f"[Runtime] Scan failed: {type(exc).__name__}: {exc}")
+            return False
+        self.scans += 1
+        changed = self.engine.set_universe(msgspec.to_builtins(candidates))
+        print(f"[Runtime] Scan {self.scans} in {time.perf_counter() - start:.1f}s: +{len(delta.added)} "
+              f"-{len(delta.removed)} ~{len(delta.updated)} candidates, "
+              f"{'universe updated' if changed else 'universe unchanged'}")
+        return True
+
+    def _scan_blocking(self) -> Tuple[List[MarketCandidate], CandidateDelta]:
+        return scan_universe(self.config.candidates_path, self.min_volume_usd, self.cache, self._transport,
+                             self.config.venues, self._adapters)
+
+    async def _scan_loop(self, skip_first: bool) -> None:
+        if skip_first:
+            await asyncio.sleep(self.scan_interval)
+        while True:
+            await self.scan()
+            await asyncio.sleep(self.scan_interval)
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def main() -> None:
+    config = EngineConfig.from_env()
+    env = os.environ
+    metrics.start_from_env()
+    recording.start_from_env("runtime")
+    runtime = Runtime(
+        config,
+        scan_interval=float(env.get("SCANNER_INTERVAL_MINUTES", "5")) * 60.0,
+        cache=MetadataCache(env.get("SCANNER_CACHE", "data/cache/scanner.json"),
+                            ttl=float(env.get("SCANNER_METADATA_TTL", "3600"))),
+    )
+    print(f"[Runtime] Starting. mode={config.mode}, venues={','.join(config.venues)}, workers={config.workers}, "
+          f"interval={config.interval}s, candidates={config.candidates_path}")
+    asyncio.run(runtime.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,44 @@
 from __future__ import annotations
 
 import logging
+import os
 from datetime import datetime
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from tasks.market_scanner import find_common_high_volume_futures, write_candidates
+import metrics
+import recording
+from exchanges.registry import get_adapters, parse_venues, rest_urls
+from tasks.market_scanner import MetadataCache, scan
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
+# exchangeInfo is re-validated once per TTL; between that, a scan is just the two ticker downloads
+CACHE = MetadataCache(
+    os.environ.get("SCANNER_CACHE", "data/cache/scanner.json"),
+    ttl=float(os.environ.get("SCANNER_METADATA_TTL", "3600")),
+)
+
 
 def job_scan() -> None:
-    logging.info("Starting market scan for common USDT futures >= $300k volume on both exchanges")
+    logging.info("Starting market scan for USDT futures >= $300k volume on at least two exchanges")
     try:
-        candidates = find_common_high_volume_futures()
-        write_candidates("data/candidates.json", candidates)
-        logging.info("Scan complete: %d candidates saved", len(candidates))
+        venues = parse_venues(os.environ.get("SPREADS_VENUES"))
+        adapters = get_adapters(venues, rest_urls(os.environ))
+        delta = scan("data/candidates.json", cache=CACHE, venues=venues, adapters=adapters)
+        logging.info("Scan complete: +%d -%d ~%d candidates", len(delta.added), len(delta.removed), len(delta.updated))
     except Exception as exc:  # noqa: BLE001
         logging.exception("Scan failed: %s", exc)
 
 
 def start_scheduler() -> BackgroundScheduler:
+    metrics.start_from_env()
+    recording.start_from_env("scanner")
     scheduler = BackgroundScheduler()
-    # Every 10 hours
-    scheduler.add_job(job_scan, "interval", hours=10, next_run_time=datetime.now())
+    minutes = float(os.environ.get("SCANNER_INTERVAL_MINUTES", "5"))
+    # One run at a time: a slow scan is skipped over rather than stacked
+    scheduler.add_job(job_scan, "interval", minutes=minutes, next_run_time=datetime.now(), max_instances=1, coalesce=True)
     scheduler.start()
     return scheduler
 
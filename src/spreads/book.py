@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+BID, ASK = 0, 1
+
+
+class OrderBook:
+    """L2 book for one symbol on one venue: per side, a sorted `array('d')` of keys and one of sizes.
+
+    Both sides are kept ascending by key, with bids keyed by -price, so index 0 is always the best
+    level and the same code serves both sides. Deltas touch a few levels each, so they are applied
+    level by level with `bisect` plus an in-place insert/delete, which beats rebuilding NumPy arrays
+    at these sizes. A zero size removes the level; levels beyond `depth` are dropped.
+
+    `update_id` is the venue sequence number of the last applied update and `synced` is False
+    until a snapshot has been loaded (and again after a detected gap).
+    """
+
+    def __init__(self, depth: int = 1000) -> None:
+        self.depth = depth
+        self.keys: List[array] = [array("d"), array("d")]
+        self.sizes: List[array] = [array("d"), array("d")]
+        # Last (notional, vwap) per side, valid until that side changes
+        self._vwap: List[Optional[Tuple[float, Optional[float]]]] = [None, None]
+        self.update_id = 0
+        self.synced = False
+        # Binance only: the first event after a snapshot is matched differently from later ones
+        self.bridged = False
+
+    def clear(self) -> None:
+        self.keys = [array("d"), array("d")]
+        self.sizes = [array("d"), array("d")]
+        self._vwap = [None, None]
+        self.update_id = 0
+        self.synced = False
+        self.bridged = False
+
+    def load(self, bids: Sequence[Sequence[Any]], asks: Sequence[Sequence[Any]], update_id: int) -> None:
+        for side, levels, sign in ((BID, bids, -1.0), (ASK, asks, 1.0)):
+            book = sorted((sign * float(p), float(s)) for p, s, *_ in levels if float(s) > 0)[: self.depth]
+            self.keys[side] = array("d", (k for k, _ in book))
+            self.sizes[side] = array("d", (s for _, s in book))
+        self._vwap = [None, None]
+        self.update_id = update_id
+        self.synced = True
+        self.bridged = False
+
+    def apply(self, bids: Sequence[Sequence[Any]], asks: Sequence[Sequence[Any]], update_id: int) -> None:
+        if bids:
+            self._merge(BID, -1.0, bids)
+        if asks:
+            self._merge(ASK, 1.0, asks)
+        self.update_id = update_id
+
+    def _merge(self, side: int, sign: float, levels: Sequence[Sequence[Any]]) -> None:
+        keys, sizes = self.keys[side], self.sizes[side]
+        self._vwap[side] = None
+        for level in levels:
+            key, size = sign * float(level[0]), float(level[1])
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                if size > 0:
+                    sizes[i] = size
+                else:
+                    del keys[i]
+                    del sizes[i]
+            elif size > 0 and i < self.depth:
+                keys.insert(i, key)
+                sizes.insert(i, size)
+        if len(keys) > self.depth:
+            del keys[self.depth:]
+            del sizes[self.depth:]
+
+    def best(self, side: int) -> Optional[float]:
+        keys = self.keys[side]
+        if not keys:
+            return None
+        return -keys[0] if side == BID else keys[0]
+
+    def top(self) -> Tuple[Optional[float], Optional[float]]:
+        return self.best(BID), self.best(ASK)
+
+    def levels(self, side: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(prices, sizes) best first, copied: a live buffer export would stop the arrays from resizing."""
+        keys = np.frombuffer(self.keys[side], dtype=np.float64)
+        return (-keys if side == BID else keys.copy()), np.frombuffer(self.sizes[side], dtype=np.float64).copy()
+
+    def vwap(self, side: int, notional: float) -> Optional[float]:
+        """Average price of filling `notional` (quote currency) against `side`, None if the book is too thin.
+
+        Buying walks the asks, selling walks the bids; only the levels the fill reaches are visited.
+        """
+        cached = self._vwap[side]
+        if cached is not None and cached[0] == notional:
+            return cached[1]
+        keys, sizes = self.keys[side], self.sizes[side]
+        left = notional
+        qty = 0.0
+        result = None
+        for i in range(len(keys)):
+            price = abs(keys[i])
+            value = price * sizes[i]
+            if value >= left:
+                result = notional / (qty + left / price)
+                break
+            left -= value
+            qty += sizes[i]
+        self._vwap[side] = (notional, result)
+        return result
+
+
+def executable_bps(buy: OrderBook, sell: OrderBook, notional: float) -> Optional[float]:
+    """Spread in bps from buying `notional` on `buy` and selling it on `sell` at VWAP prices.
+
+    Positive means the round trip earns money before fees; None when either book is too thin.
+    """
+    if not (buy.synced and sell.synced):
+        return None
+    paid = buy.vwap(ASK, notional)
+    got = sell.vwap(BID, notional)
+    if paid is None or got is None:
+        return None
+    return (got - paid) / ((got + paid) / 2.0) * 10_000.0
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import recording
+from spreads.book import OrderBook, executable_bps
+from spreads.kernel import BINANCE, BYBIT, VENUES, QuoteTable, remap
+from spreads.stream import BINANCE_WS_URL, BYBIT_WS_URL, StreamEngine
+from transport import BINANCE_FAPI, Transport, get_transport
+
+
+# Binance diff depth stream plus a REST snapshot; Bybit sends its own snapshot on subscribe
+BINANCE_DEPTH_STREAM = "{}@depth@100ms"
+BYBIT_DEPTH_TOPIC = "orderbook.50.{}"
+BINANCE_SNAPSHOT_LIMIT = 100
+SNAPSHOT_CONCURRENCY = 5
+
+# Columns of DepthStream.executable
+BUY_BINANCE, BUY_BYBIT = 0, 1
+
+
+class DepthStream(StreamEngine):
+    """L2 books for both legs of every row, kept current from WebSocket deltas.
+
+    Binance: `<symbol>@depth@100ms` events are buffered until a REST snapshot arrives, then
+    applied from the event whose [U, u] range contains the snapshot's `lastUpdateId` (the USD-M
+    futures rule); afterwards every event's `pu` must equal the previous `u`. Bybit: `orderbook.50` starts with
+    a snapshot, and each delta's `u` must follow the previous one. A gap on either venue drops
+    that book and resyncs it (new REST snapshot, or unsubscribe/subscribe for Bybit).
+
+    Every applied update writes the new top of book into `table` and refreshes `executable`:
+    the VWAP spread in bps for `notional` USDT, column BUY_BINANCE buying on Binance and selling
+    on Bybit, column BUY_BYBIT the reverse. NaN while a book is syncing or too thin.
+    """
+
+    def __init__(
+        self,
+        table: QuoteTable,
+        on_update: Optional[Callable[[int], None]] = None,
+        notional: float = 1000.0,
+        binance_url: str = BINANCE_WS_URL,
+        bybit_url: str = BYBIT_WS_URL,
+        binance_rest: str = BINANCE_FAPI,
+        transport: Optional[Transport] = None,
+        depth: int = 1000,
+        **limits: Any,
+    ) -> None:
+        super().__init__(table, on_update, binance_url, bybit_url, **limits)
+        self.notional = notional
+        self.binance_rest = binance_rest.rstrip("/")
+        self.transport = transport or get_transport()
+        self.depth = depth
+        self.books: List[List[OrderBook]] = [[OrderBook(depth) for _ in range(len(table))] for _ in VENUES]
+        self.executable = np.full((len(table), 2), np.nan)
+        self.resyncs: Dict[str, int] = {v: 0 for v in VENUES}
+        self._row_symbols = self._symbols_by_row(table)
+        # Binance events that arrived while the symbol's snapshot was loading
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._bybit_sockets: Dict[str, Any] = {}
+        self._snapshots: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _symbols_by_row(table: QuoteTable) -> List[List[str]]:
+        out = [[""] * len(table) for _ in VENUES]
+        for col, venue in enumerate(VENUES):
+            for s, row in table.symbol_rows[venue].items():
+                out[col][row] = s
+        return out
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> None:
+        # Books of the legs that stay move to their new rows, the others start empty
+        names = self._symbols_by_row(table)
+        books: List[List[OrderBook]] = []
+        fresh = np.zeros(len(table), dtype=bool)
+        for col in range(len(VENUES)):
+            column = []
+            for row, old in enumerate(src):
+                if old >= 0 and self._row_symbols[col][old] == names[col][row]:
+                    column.append(self.books[col][old])
+                else:
+                    column.append(OrderBook(self.depth))
+                    fresh[row] |= bool(names[col][row])
+            books.append(column)
+        self.books = books
+        self.executable = remap(self.executable, src)
+        self.executable[fresh] = np.nan
+        self._row_symbols = names
+        super().retarget(table, src)
+
+    def _topics(self, venue: str, symbols: List[str]) -> List[str]:
+        if venue == "binance":
+            return [BINANCE_DEPTH_STREAM.format(s.lower()) for s in symbols]
+        return [BYBIT_DEPTH_TOPIC.format(s) for s in symbols]
+
+    def _prepare(self, venue: str, symbols: List[str]) -> None:
+        col = VENUES.index(venue)
+        for s in symbols:
+            self.books[col][self.table.symbol_rows[venue][s]].clear()
+            if venue == "binance":
+                self._pending[s] = []
+
+    def _forget(self, venue: str, symbols: List[str]) -> None:
+        for s in symbols:
+            self._pending.pop(s, None)
+            self._bybit_sockets.pop(s, None)
+
+    async def _subscribe(self, venue: str, ws: Any, symbols: List[str]) -> None:
+        self._prepare(venue, symbols)
+        if venue == "bybit":
+            for s in symbols:
+                self._bybit_sockets[s] = ws
+        await super()._subscribe(venue, ws, symbols)
+        if venue == "binance":
+            # Snapshots are requested after subscribing so no event between the two is missed
+            for s in symbols:
+                self._spawn(self._binance_snapshot(s))
+
+    async def _binance_snapshot(self, symbol: str) -> None:
+        if self._snapshots is None:
+            self._snapshots = asyncio.Semaphore(SNAPSHOT_CONCURRENCY)
+        c = self.transport.async_client(self.binance_rest)
+        delay = 1.0
+        while True:
+            async with self._snapshots:
+                try:
+                    r = await c.get(f"{self.binance_rest}/fapi/v1/depth",
+                                    params={"symbol": symbol, "limit": BINANCE_SNAPSHOT_LIMIT})
+                    r.raise_for_status()
+                    snap = r.json()
+                    rec = recording.active()
+                    if rec is not None:
+                        rec.rest("binance", "snapshot", symbol, r.content)
+                    break
+                except Exception as exc:  # noqa: BLE001
+                    print(f"[Depth] binance {symbol} snapshot failed: {type(exc).__name__}: {exc}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2.0, 30.0)
+        self.load_snapshot(symbol, snap)
+
+    def load_snapshot(self, symbol: str, snap: Dict[str, Any]) -> None:
+        # Seeds the Binance book from a REST snapshot and replays the events buffered while it loaded
+        row = self.table.symbol_rows["binance"].get(symbol)
+        if row is None:
+            return  # left the universe while the snapshot was loading
+        self.books[BINANCE][row].load(snap.get("bids", []), snap.get("asks", []), int(snap["lastUpdateId"]))
+        for event in self._pending.pop(symbol, []):
+            if not self._apply_binance(symbol, row, event):
+                return
+        self._updated("binance", row, None)
+
+    def _resync(self, venue: str, symbol: str, row: int) -> None:
+        self.resyncs[venue] += 1
+        book = self.books[VENUES.index(venue)][row]
+        book.clear()
+        self.executable[row] = np.nan
+        # The old top of book is invalid from here until the new snapshot is applied
+        self.table.drop(venue, row)
+        if self.on_update is not None:
+            self.on_update(row)
+        if venue == "binance":
+            self._pending[symbol] = []
+            self._spawn(self._binance_snapshot(symbol))
+        else:
+            ws = self._bybit_sockets.get(symbol)
+            if ws is not None:
+                topic = BYBIT_DEPTH_TOPIC.format(symbol)
+                self._spawn(_send_all(ws, [{"op": "unsubscribe", "args": [topic]}, {"op": "subscribe", "args": [topic]}]))
+
+    def _apply_binance(self, symbol: str, row: int, event: Dict[str, Any]) -> bool:
+        # Returns False when the event revealed a gap and a resync was started
+        book = self.books[BINANCE][row]
+        first, last = int(event["U"]), int(event["u"])
+        if last < book.update_id:
+            return True  # already covered by the snapshot
+        if book.bridged:
+            ok = int(event.get("pu", -1)) == book.update_id
+        else:
+            # USD-M futures rule: the first event spans the snapshot, U <= lastUpdateId <= u
+            ok = first <= book.update_id
+        if not ok:
+            self._resync("binance", symbol, row)
+            return False
+        book.apply(event.get("b", []), event.get("a", []), last)
+        book.bridged = True
+        return True
+
+    def _on_message(self, venue: str, raw: Any) -> None:
+        msg = json.loads(raw)
+        if not isinstance(msg, dict):
+            return
+        if venue == "binance":
+            if msg.get("e") != "depthUpdate":
+                return
+            symbol = msg["s"]
+            row = self.table.symbol_rows["binance"].get(symbol)
+            if row is None:
+                return
+            self.messages[venue] += 1
+            pending = self._pending.get(symbol)
+            if pending is not None:
+                pending.append(msg)
+                return
+            if self._apply_binance(symbol, row, msg):
+                self._updated(venue, row, msg.get("T") or msg.get("E"))
+            return
+
+        if not str(msg.get("topic", "")).startswith("orderbook."):
+            return
+        data = msg.get("data", {})
+        symbol = data.get("s", "")
+        row = self.table.symbol_rows["bybit"].get(symbol)
+        if row is None:
+            return
+        self.messages[venue] += 1
+        book = self.books[BYBIT][row]
+        update_id = int(data.get("u", 0))
+        # u == 1 is a snapshot sent after a Bybit service restart
+        if msg.get("type") == "snapshot" or update_id == 1:
+            book.load(data.get("b", []), data.get("a", []), update_id)
+        elif not book.synced:
+            return  # waiting for the snapshot that follows a resubscribe
+        elif update_id != book.update_id + 1:
+            self._resync("bybit", symbol, row)
+            return
+        else:
+            book.apply(data.get("b", []), data.get("a", []), update_id)
+        self._updated(venue, row, msg.get("ts"))
+
+    def _updated(self, venue: str, row: int, ts: Optional[int]) -> None:
+        col = VENUES.index(venue)
+        bid, ask = self.books[col][row].top()
+        # An emptied side clears the leg instead of leaving the last price in the table
+        self.table.set(venue, self._row_symbols[col][row], np.nan if bid is None else bid,
+                       np.nan if ask is None else ask, ts)
+        binance, bybit = self.books[BINANCE][row], self.books[BYBIT][row]
+        for c, (buy, sell) in ((BUY_BINANCE, (binance, bybit)), (BUY_BYBIT, (bybit, binance))):
+            bps = executable_bps(buy, sell, self.notional)
+            bps = np.nan if bps is None else bps
+            if not (bps == self.executable[row, c] or (np.isnan(bps) and np.isnan(self.executable[row, c]))):
+                self.executable[row, c] = bps
+                # Depth moved without the top changing: the row still needs re-publishing
+                self.table.dirty[row] = True
+        if self.on_update is not None:
+            self.on_update(row)
+
+
+async def _send_all(ws: Any, messages: List[Dict[str, Any]]) -> None:
+    try:
+        for m in messages:
+            await ws.send(json.dumps(m))
+    except Exception as exc:  # noqa: BLE001 - the connection loop reconnects and resubscribes
+        print(f"[Depth] resubscribe failed: {type(exc).__name__}: {exc}")
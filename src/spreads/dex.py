@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import msgspec
+import numpy as np
+import websockets
+
+import recording
+from exchanges import schemas
+from exchanges.uniswap import (
+    FEE_UNIT,
+    MULTICALL3,
+    UniswapPool,
+    aggregate3_calldata,
+    decode_aggregate3,
+    pool_prices,
+)
+from metrics import REQUEST_ERRORS, REQUEST_SECONDS, span
+from spreads.kernel import QuoteTable
+from spreads.stream import CLOSE_TIMEOUT
+
+
+# Table column of the on-chain legs; its symbols are pool addresses
+DEX_VENUE = "uniswap"
+
+
+def attach_pools(candidates: Iterable[Dict[str, Any]], pools: Dict[str, UniswapPool]) -> Iterator[Dict[str, Any]]:
+    # Candidates with the pool address as their `uniswap` leg, for every base that has a pool
+    for cand in candidates:
+        pool = pools.get(str(cand.get("symbol", "")).split("/")[0].upper())
+        if pool is None:
+            yield cand
+        else:
+            yield dict(cand, legs={**(cand.get("legs") or {}), DEX_VENUE: pool.address})
+
+
+class DexSource:
+    """Keeps the `uniswap` column of `table` current from one JSON-RPC WebSocket session.
+
+    On connect it subscribes to `newHeads` and reads slot0() and liquidity() of every pool in the
+    table with a single Multicall3 `aggregate3` eth_call, then one more per new block. At most one
+    call is in flight: blocks that arrive meanwhile collapse into one call at the latest head, so
+    a block costs at most one round-trip however many pools there are. Bid and ask are the pool
+    price less and plus its fee. `on_update` runs after each block's quotes are in the table;
+    `retarget` switches the pool list with the universe and re-reads at once.
+    """
+
+    def __init__(
+        self,
+        table: QuoteTable,
+        pools: Dict[str, UniswapPool],
+        url: str,
+        multicall: str = MULTICALL3,
+        on_update: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.url = url
+        self.multicall = multicall
+        self.on_update = on_update
+        self.pools = {pool.address: pool for pool in pools.values()}
+        self.head: Optional[int] = None  # latest block announced
+        self.block: Optional[int] = None  # block the table's pool quotes are from
+        self.blocks = 0
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+        self._head_ts = 0
+        self._ws: Any = None
+        self._ids = itertools.count(1)
+        # (request id, pool list epoch, block, block time in ms, send time) of the eth_call out
+        self._inflight: Optional[Tuple[int, int, Optional[int], int, float]] = None
+        self._epoch = 0
+        self._background: "set[asyncio.Task[None]]" = set()
+        self._target(table)
+
+    def _target(self, table: QuoteTable) -> None:
+        self.table = table
+        rows = table.symbol_rows[DEX_VENUE]
+        self._addresses: List[str] = [a for a in rows if a in self.pools]
+        pools = [self.pools[a] for a in self._addresses]
+        self._rows = np.array([rows[a] for a in self._addresses], dtype=np.int64)
+        self._decimals0 = np.array([p.decimals0 for p in pools], dtype=float)
+        self._decimals1 = np.array([p.decimals1 for p in pools], dtype=float)
+        self._base_is_token0 = np.array([p.base_is_token0 for p in pools], dtype=bool)
+        self._fee = np.array([p.fee for p in pools], dtype=float) / FEE_UNIT
+        self._tx = aggregate3_calldata(self._addresses, self.multicall)
+        self._epoch += 1
+
+    async def run(self) -> None:
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    async with websockets.connect(self.url, max_size=2 ** 24, close_timeout=CLOSE_TIMEOUT) as ws:
+                        self._ws = ws
+                        try:
+                            await ws.send(self._request(next(self._ids), "eth_subscribe", ["newHeads"]))
+                            await self._call()
+                            delay = 1.0
+                            async for raw in ws:
+                                await self._on_message(raw)
+                        finally:
+                            self._ws = None
+                            self._inflight = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:  # noqa: BLE001 - any failure means reconnect
+                    print(f"[Dex] connection error: {type(exc).__name__}: {exc}")
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2.0, 30.0)
+        finally:
+            for t in list(self._background):
+                t.cancel()
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> None:
+        """Switches to `table`; pools that stay keep their quotes, the new list is read right away."""
+        self._target(table)
+        if self._ws is not None and self._inflight is None:
+            task = asyncio.create_task(self._call())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "pools": len(self._rows),
+            "head": self.head,
+            "block": self.block,
+            "blocks": self.blocks,
+            "calls": self.calls,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+        }
+
+    @staticmethod
+    def _request(request_id: int, method: str, params: List[Any]) -> bytes:
+        return msgspec.json.encode({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+
+    async def _call(self) -> None:
+        # One eth_call at the latest announced head for every pool in the table
+        ws = self._ws
+        if ws is None or self._inflight is not None or not len(self._rows):
+            return
+        request_id = next(self._ids)
+        block = self.head
+        ts = self._head_ts if block is not None else int(time.time() * 1000)
+        self._inflight = (request_id, self._epoch, block, ts, time.perf_counter())
+        self.calls += 1
+        tag = hex(block) if block is not None else "latest"
+        await ws.send(self._request(request_id, "eth_call", [self._tx, tag]))
+
+    async def _on_message(self, raw: Any) -> None:
+        msg = schemas.rpc_message.decode(raw)
+        if msg.method == "eth_subscription":
+            header = msg.params.result if msg.params is not None else None
+            if header is not None:
+                self.head = int(header.number, 16)
+                self._head_ts = int(header.timestamp, 16) * 1000
+                self.blocks += 1
+                await self._call()
+            return
+        inflight = self._inflight
+        if inflight is None or msg.id != inflight[0]:
+            if msg.error is not None:
+                # The subscription itself was refused (a node without eth_subscribe): reconnect and retry
+                raise RuntimeError(f"RPC error {msg.error.code}: {msg.error.message}")
+            return
+        self._inflight = None
+        _, epoch, block, ts, sent = inflight
+        if msg.error is not None or msg.result is None:
+            self.errors += 1
+            REQUEST_ERRORS.inc(venue=DEX_VENUE, endpoint="multicall", error="rpc")
+            print(f"[Dex] eth_call failed: {msg.error.message if msg.error is not None else 'no result'}")
+        else:
+            REQUEST_SECONDS.observe(time.perf_counter() - sent, venue=DEX_VENUE, endpoint="multicall")
+            if epoch == self._epoch:
+                self._apply(msg.result, block, ts)
+        if self.head != block or epoch != self._epoch:
+            # Blocks came in, or the pool list changed, while the call was out
+            await self._call()
+
+    def _apply(self, result: str, block: Optional[int], ts: int) -> None:
+        try:
+            with span("parse", DEX_VENUE):
+                sqrt_price, liquidity = decode_aggregate3(result, len(self._rows))
+                price = pool_prices(sqrt_price, liquidity, self._decimals0, self._decimals1, self._base_is_token0)
+        except ValueError as exc:
+            self.errors += 1
+            REQUEST_ERRORS.inc(venue=DEX_VENUE, endpoint="multicall", error="parse")
+            print(f"[Dex] bad multicall result: {exc}")
+            return
+        bid, ask = price * (1.0 - self._fee), price * (1.0 + self._fee)
+        with span("load", DEX_VENUE):
+            self.table.put(DEX_VENUE, self._rows, bid, ask, ts)
+        self.block = block
+        rec = recording.active()
+        if rec is not None:
+            # Already priced, so a replay needs neither the node nor the pool list
+            tops = {a: {"bid": b, "ask": s} for a, b, s in zip(self._addresses, bid.tolist(), ask.tolist())}
+            rec.rest(DEX_VENUE, "pools", str(block if block is not None else ""), msgspec.json.encode(tops))
+        if self.on_update is not None:
+            self.on_update()
@@ -0,0 +1,578 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import msgspec
+import numpy as np
+
+import recording
+from execution import Executor
+from exchanges.base import ExchangeAdapter
+from exchanges.uniswap import MULTICALL3, UniswapPool, load_pools
+from exchanges.registry import DEFAULT_VENUES, get_adapters, parse_venues
+from metrics import LATENCY_BUCKETS, REGISTRY, counter, gauge, histogram, span
+from spreads.depth import DepthStream
+from spreads.dex import DEX_VENUE, DexSource, attach_pools
+from spreads.history import HistoryWriter
+from spreads.incremental import BandEvent, SpreadTracker
+from spreads.kernel import VENUES, QuoteTable
+from spreads.models import ENCODER, SpreadSample, candidate_legs
+from spreads.rest import fetch_quotes, fetch_quotes_bulk
+from spreads.schedule import AdaptiveScheduler
+from spreads.shard import ShardPool
+from spreads.snapshot import SnapshotWriter
+from spreads.stats import DEFAULT_WINDOWS, RollingStats, parse_windows
+from spreads.stream import BINANCE_WS_URL, BYBIT_WS_URL, StreamEngine
+from transport import BINANCE_FAPI, BYBIT_API, OKX_API, Transport, get_transport
+
+
+CYCLE_SECONDS = histogram("cryptolab_cycle_seconds", "Poll cycle duration from the first request to the JSON export",
+                          buckets=LATENCY_BUCKETS + (30.0, 60.0))
+CYCLE_INTERVAL = gauge("cryptolab_cycle_interval_seconds", "Configured SPREADS_INTERVAL")
+CYCLE_OVERRUNS = counter("cryptolab_cycle_overruns_total", "Poll cycles that took longer than SPREADS_INTERVAL")
+CYCLES = counter("cryptolab_cycles_total", "Completed poll cycles or JSON exports in live modes")
+SYMBOLS = gauge("cryptolab_symbols", "Symbols in the quote table")
+IN_BAND = gauge("cryptolab_symbols_in_band", "Symbols whose spread is inside the bps band")
+QUOTE_AGE = gauge("cryptolab_quote_age_seconds", "Age of the latest quote per symbol and venue", ("symbol", "venue"))
+QUOTE_AGE_MAX = gauge("cryptolab_quote_age_max_seconds", "Oldest quote per venue", ("venue",))
+STALE_QUOTES = gauge("cryptolab_stale_quotes", "Legs with no quote newer than METRICS_STALE_AFTER seconds", ("venue",))
+STREAM_MESSAGES = counter("cryptolab_stream_messages_total", "WebSocket messages received", ("venue",))
+STREAM_RECONNECTS = counter("cryptolab_stream_reconnects_total", "WebSocket reconnects", ("venue",))
+
+
+def _opt_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+def _opt(x: float) -> Optional[float]:
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+def _top(tracker: SpreadTracker) -> List[Dict[str, Any]]:
+    if tracker.stats is None:
+        return [{"symbol": t.symbol, "bps": t.spread_bps} for t in tracker.top(5)]
+    return [{"symbol": t.symbol, "bps": t.spread_bps, "z": t.z} for t in tracker.top(5)]
+
+
+@dataclass
+class EngineConfig:
+    candidates_path: str = "data/candidates.json"
+    mode: str = "bulk"
+    venues: Tuple[str, ...] = DEFAULT_VENUES
+    interval: float = 30.0
+    min_bps: Optional[float] = None
+    max_bps: Optional[float] = None
+    concurrency: int = 50
+    deadline: Optional[float] = 10.0
+    out_path: str = "data/spreads.json"
+    json_interval: float = 0.0
+    shm_path: str = "data/spreads.shm"
+    shm_interval: float = 0.2
+    history_dir: str = ""
+    history_days: Optional[int] = 7
+    history_interval: float = 1.0
+    binance_ws: str = BINANCE_WS_URL
+    bybit_ws: str = BYBIT_WS_URL
+    binance_rest: str = BINANCE_FAPI
+    bybit_rest: str = BYBIT_API
+    okx_rest: str = OKX_API
+    notional: float = 1000.0
+    rate_budget: float = 0.5
+    fast_interval: float = 0.5
+    workers: int = 1
+    stats_windows: str = DEFAULT_WINDOWS
+    stats_interval: float = 1.0
+    z_window: Optional[str] = None
+    min_z: Optional[float] = None
+    rank_by: str = "bps"
+    dex_rpc: str = ""
+    dex_pools: str = "data/dex_pools.json"
+    dex_multicall: str = MULTICALL3
+
+    @classmethod
+    def from_env(cls) -> "EngineConfig":
+        env = os.environ
+        days = env.get("SPREADS_HISTORY_DAYS", "7")
+        return cls(
+            candidates_path=env.get("SPREADS_CANDIDATES", "data/candidates.json"),
+            mode=env.get("SPREADS_MODE", "bulk"),
+            venues=parse_venues(env.get("SPREADS_VENUES")),
+            interval=float(env.get("SPREADS_INTERVAL", "30")),
+            min_bps=_opt_float(env.get("SPREADS_MIN_BPS")),
+            max_bps=_opt_float(env.get("SPREADS_MAX_BPS")),
+            concurrency=int(env.get("SPREADS_CONCURRENCY", "50")),
+            deadline=_opt_float(env.get("SPREADS_DEADLINE", "10")),
+            out_path=env.get("SPREADS_OUT", "data/spreads.json"),
+            json_interval=float(env.get("SPREADS_JSON_INTERVAL", "0")),
+            shm_path=env.get("SPREADS_SHM_PATH", "data/spreads.shm"),
+            shm_interval=float(env.get("SPREADS_SHM_INTERVAL", "0.2")),
+            history_dir=env.get("SPREADS_HISTORY_DIR", ""),
+            history_days=int(days) if days else None,
+            history_interval=float(env.get("SPREADS_HISTORY_INTERVAL", "1")),
+            binance_ws=env.get("SPREADS_BINANCE_WS", BINANCE_WS_URL),
+            bybit_ws=env.get("SPREADS_BYBIT_WS", BYBIT_WS_URL),
+            binance_rest=env.get("SPREADS_BINANCE_REST", BINANCE_FAPI),
+            bybit_rest=env.get("SPREADS_BYBIT_REST", BYBIT_API),
+            okx_rest=env.get("SPREADS_OKX_REST", OKX_API),
+            notional=float(env.get("SPREADS_NOTIONAL", "1000")),
+            rate_budget=float(env.get("SPREADS_RATE_BUDGET", "0.5")),
+            fast_interval=float(env.get("SPREADS_FAST_INTERVAL", "0.5")),
+            workers=int(env.get("SPREADS_WORKERS", "1")),
+            stats_windows=env.get("SPREADS_STATS_WINDOWS", DEFAULT_WINDOWS),
+            stats_interval=float(env.get("SPREADS_STATS_INTERVAL", "1")),
+            z_window=env.get("SPREADS_Z_WINDOW") or None,
+            min_z=_opt_float(env.get("SPREADS_MIN_Z")),
+            rank_by=env.get("SPREADS_RANK_BY", "bps"),
+            dex_rpc=env.get("SPREADS_DEX_RPC", ""),
+            dex_pools=env.get("SPREADS_DEX_POOLS", "data/dex_pools.json"),
+            dex_multicall=env.get("SPREADS_DEX_MULTICALL", MULTICALL3),
+        )
+
+    def rest_urls(self) -> Dict[str, str]:
+        return {"binance": self.binance_rest, "bybit": self.bybit_rest, "okx": self.okx_rest}
+
+
+def load_table(candidates_path: str = "data/candidates.json", venues: Sequence[str] = VENUES) -> Optional[QuoteTable]:
+    if not os.path.exists(candidates_path):
+        return None
+    with open(candidates_path, "r") as f:
+        candidates = json.load(f)
+    return QuoteTable(candidate_legs(candidates, venues), venues)
+
+
+async def poll(
+    table: QuoteTable,
+    mode: str = "bulk",
+    concurrency: int = 50,
+    deadline: Optional[float] = None,
+    transport: Optional[Transport] = None,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> None:
+    if mode == "depth":
+        # Per-symbol order book requests, kept as a fallback for when bulk tickers misbehave
+        await fetch_quotes(table, concurrency=concurrency, deadline=deadline, transport=transport, adapters=adapters)
+    else:
+        await fetch_quotes_bulk(table, deadline=deadline, transport=transport, adapters=adapters)
+
+
+def write_spreads(path: str, samples: Iterable[SpreadSample]) -> None:
+    # Write to a temp file and rename so readers never see a half-written file. The temp name is
+    # unique: the runtime loop and the API can export to the same path at the same time.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = msgspec.json.format(ENCODER.encode(list(samples)), indent=2)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class Exports:
+    """Shared-memory snapshot on every publish, JSON export at most every `json_interval` seconds,
+    history append on `record`."""
+
+    def __init__(self, config: EngineConfig, json_interval: float) -> None:
+        self.out_path = config.out_path
+        self.json_interval = json_interval
+        self._last_json = 0.0
+        self.snapshot = SnapshotWriter(config.shm_path) if config.shm_path else None
+        self.history = (
+            HistoryWriter(config.history_dir, retention_days=config.history_days) if config.history_dir else None
+        )
+
+    def publish(self, tracker: SpreadTracker) -> None:
+        if self.snapshot is not None:
+            self.snapshot.publish(tracker.table, tracker.bps, tracker.in_band)
+
+    def record(self, tracker: SpreadTracker) -> None:
+        if self.history is not None:
+            # The history layout holds the Binance and Bybit legs
+            bid, ask = tracker.table.quotes(VENUES)
+            self.history.append(time.time(), tracker.table.bases, bid, ask, tracker.bps)
+
+    def export(self, tracker: SpreadTracker) -> int:
+        # Returns the number of samples written to JSON, -1 when skipped
+        if not self.out_path or time.monotonic() - self._last_json < self.json_interval:
+            return -1
+        samples = tracker.samples()
+        write_spreads(self.out_path, samples)
+        self._last_json = time.monotonic()
+        return len(samples)
+
+    def close(self) -> None:
+        if self.snapshot is not None:
+            self.snapshot.close()
+        if self.history is not None:
+            self.history.close()
+
+
+class SpreadEngine:
+    """Runs the configured quote source and keeps a `SpreadTracker` current.
+
+    `on_events` listeners get band entry/exit events, `on_rows` listeners get the table rows
+    recomputed by each evaluation; both run inline on the event loop and must not block.
+
+    With `stats_windows` set, every row's spread is sampled into `stats` once per poll cycle or,
+    in live modes, every `stats_interval` seconds, so the rolling windows weigh time evenly
+    however often a symbol ticks.
+
+    With `dex_rpc` set, the Uniswap V3 pools in `dex_pools` are an extra `uniswap` venue: their
+    addresses join the candidates of the same base and a `DexSource` fills that column once per
+    block next to whichever exchange source runs.
+
+    `execute_with` hands band entries to an `Executor` that trades both legs; it warms up and
+    keeps its sessions in sync for as long as `run` runs.
+
+    The candidate universe comes from `candidates_path`, re-read when its mtime changes, or with
+    `watch=False` only from `set_universe`. Either way a change is applied in place: quotes and
+    band state of the symbols that stay are kept, and the running source only (un)subscribes or
+    starts polling the symbols that changed.
+    """
+
+    def __init__(self, config: EngineConfig, transport: Optional[Transport] = None, watch: bool = True) -> None:
+        self.config = config
+        self.watch = watch
+        self.transport = transport or get_transport()
+        self.tracker: Optional[SpreadTracker] = None
+        self.stats: Optional[RollingStats] = None
+        self.stream: Optional[StreamEngine] = None
+        self.scheduler: Optional[AdaptiveScheduler] = None
+        self.pool: Optional[ShardPool] = None
+        self.dex: Optional[DexSource] = None
+        self.executor: Optional[Executor] = None
+        self.on_events: List[Callable[[List[BandEvent]], None]] = []
+        self.on_rows: List[Callable[[np.ndarray], None]] = []
+        self.cycles = 0
+        self._mtime: Optional[float] = None
+        if config.mode in ("stream", "book") and tuple(config.venues) != VENUES:
+            # The WebSocket sources only speak Binance and Bybit
+            print(f"[SpreadLoop] {config.mode} mode streams {','.join(VENUES)} only, ignoring SPREADS_VENUES")
+            self.venues: Tuple[str, ...] = VENUES
+        else:
+            self.venues = tuple(config.venues)
+        self.adapters: List[ExchangeAdapter] = get_adapters(self.venues, config.rest_urls())
+        self.dex_pools: Dict[str, UniswapPool] = {}
+        if config.dex_rpc:
+            self.dex_pools = load_pools(config.dex_pools)
+            self.venues += (DEX_VENUE,)
+
+    def execute_with(self, executor: Executor) -> None:
+        self.executor = executor
+        self.on_events.append(executor.submit)
+
+    def evaluate(self) -> None:
+        if self.tracker is None:
+            return
+        with span("evaluate"):
+            events = self.tracker.evaluate()
+        rows = self.tracker.changed
+        if len(rows):
+            for cb in self.on_rows:
+                cb(rows)
+        if events:
+            for cb in self.on_events:
+                cb(events)
+
+    def executable(self, row: int) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        # VWAP spreads (buy Binance, buy Bybit) for the configured notional, only in `book` mode
+        if self.pool is not None and self.config.mode == "book":
+            buy_binance, buy_bybit = self.pool.executable[row]
+        elif isinstance(self.stream, DepthStream):
+            buy_binance, buy_bybit = self.stream.executable[row]
+        else:
+            return None
+        return _opt(buy_binance), _opt(buy_bybit)
+
+    def status(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "mode": self.config.mode,
+            "venues": list(self.venues),
+            "symbols": len(self.tracker.table) if self.tracker is not None else 0,
+            "in_band": int(self.tracker.in_band.sum()) if self.tracker is not None else 0,
+            "cycles": self.cycles,
+        }
+        if self.pool is not None:
+            out["shards"] = self.pool.summary()
+        elif self.stream is not None:
+            out["messages"] = dict(self.stream.messages)
+            out["reconnects"] = dict(self.stream.reconnects)
+            if isinstance(self.stream, DepthStream):
+                out["resyncs"] = dict(self.stream.resyncs)
+        elif self.scheduler is not None:
+            out["refresh"] = self.scheduler.summary()
+        else:
+            out["pool"] = self.transport.stats()
+        if self.pool is None and self.stream is None:
+            out["breakers"] = self.transport.policy.summary()
+        if self.dex is not None:
+            out["dex"] = self.dex.summary()
+        if self.executor is not None:
+            out["execution"] = self.executor.summary()
+        return out
+
+    def collect(self) -> None:
+        # Scrape-time gauges: quote age per leg and the quote source's own counters
+        CYCLES.set(self.cycles)
+        CYCLE_INTERVAL.set(self.config.interval)
+        QUOTE_AGE.clear()
+        tracker = self.tracker
+        if tracker is None:
+            return
+        table = tracker.table
+        SYMBOLS.set(len(table))
+        IN_BAND.set(int(tracker.in_band.sum()))
+        now = time.time()
+        stale_after = float(os.environ.get("METRICS_STALE_AFTER", "60"))
+        for col, venue in enumerate(table.venues):
+            rows = np.fromiter(table.symbol_rows[venue].values(), dtype=np.int64)
+            ts = table.ts[rows, col]
+            # Legs that never got a quote count as infinitely old
+            age = np.where(ts > 0, now - ts / 1000.0, np.inf)
+            STALE_QUOTES.set(int((age > stale_after).sum()), venue=venue)
+            QUOTE_AGE_MAX.set(float(age.max()) if len(age) else 0.0, venue=venue)
+            for row, a in zip(rows, age):
+                if np.isfinite(a):
+                    QUOTE_AGE.set(round(float(a), 3), symbol=table.bases[row], venue=venue)
+        if self.stream is not None:
+            for venue, n in dict(self.stream.messages).items():
+                STREAM_MESSAGES.set(n, venue=venue)
+            for venue, n in dict(self.stream.reconnects).items():
+                STREAM_RECONNECTS.set(n, venue=venue)
+        elif self.pool is not None:
+            # Workers count per shard, not per venue
+            STREAM_MESSAGES.set(sum(s.get("messages", 0) for s in self.pool.stats), venue="all")
+            STREAM_RECONNECTS.set(sum(s.get("reconnects", 0) for s in self.pool.stats), venue="all")
+
+    async def run(self) -> None:
+        REGISTRY.collectors.append(self.collect)
+        executor = asyncio.create_task(self.executor.run()) if self.executor is not None else None
+        try:
+            if self.config.mode in ("stream", "book", "adaptive") or self.config.workers > 1:
+                await self._run_live()
+            else:
+                await self._run_poll()
+        finally:
+            if executor is not None:
+                executor.cancel()
+                await asyncio.gather(executor, return_exceptions=True)
+            REGISTRY.collectors.remove(self.collect)
+
+    def set_universe(self, candidates: Iterable[Dict[str, Any]]) -> bool:
+        """Applies a new candidate list (dicts as in candidates.json); returns False if nothing changed.
+
+        Runs synchronously on the event loop, so no quote update or evaluation sees half of it.
+        """
+        if self.dex_pools:
+            candidates = attach_pools(candidates, self.dex_pools)
+        legs = list(candidate_legs(candidates, self.venues))
+        tracker = self.tracker
+        if tracker is None:
+            cfg = self.config
+            table = QuoteTable(legs, self.venues)
+            windows = parse_windows(cfg.stats_windows)
+            self.stats = RollingStats(len(table), windows, cfg.z_window) if windows else None
+            self.tracker = SpreadTracker(table, cfg.min_bps, cfg.max_bps, self.stats, cfg.min_z, cfg.rank_by)
+            self._mark_table(table)
+            return True
+        old = tracker.table
+        if legs == old.legs:
+            return False
+        table, src = old.reshape(legs)
+        if table.legs == old.legs:
+            return False  # same symbols in another order
+        events = tracker.retarget(table, src)
+        for source in (self.pool or self.stream or self.scheduler, self.dex):
+            if source is not None:
+                source.retarget(table, src)
+        self._mark_table(table, reshape=True)
+        print(f"[SpreadLoop] Universe: {len(table)} symbols, +{int((src < 0).sum())} "
+              f"-{len(old) - int((src >= 0).sum())}")
+        if events:
+            for cb in self.on_events:
+                cb(events)
+        return True
+
+    def sample_stats(self) -> None:
+        # One vectorized add of every row's current spread; rows without one are skipped
+        if self.stats is not None and self.tracker is not None:
+            with span("stats"):
+                self.stats.sample(self.tracker.bps, time.time())
+
+    def _mark_table(self, table: QuoteTable, reshape: bool = False) -> None:
+        rec = recording.active()
+        if rec is not None:
+            rec.mark(recording.TABLE, {"mode": self.config.mode, "venues": table.venues, "legs": table.legs,
+                                       "reshape": reshape})
+
+    def _reload(self) -> bool:
+        # Applies data/candidates.json when its mtime changed; returns True if the universe did
+        if not self.watch:
+            return False
+        path = self.config.candidates_path
+        current = os.path.getmtime(path) if os.path.exists(path) else None
+        if current == self._mtime:
+            return False
+        self._mtime = current
+        if current is None:
+            return False
+        with open(path, "r") as f:
+            return self.set_universe(json.load(f))
+
+    def _progress(self) -> str:
+        dex = f", dex={self.dex.summary()}" if self.dex is not None else ""
+        if self.pool is not None:
+            return f"shards={[(s['symbols'], s['updates']) for s in self.pool.summary()]}{dex}"
+        if self.stream is not None:
+            return f"messages={self.stream.messages}, reconnects={self.stream.reconnects}{dex}"
+        if self.scheduler is not None:
+            return f"refresh={self.scheduler.summary()}{dex}"
+        return dex[2:]
+
+    def _start_dex(self) -> Optional["asyncio.Task[None]"]:
+        # The on-chain legs run beside the exchange source, in this process, whatever the mode
+        if not self.dex_pools or self.tracker is None:
+            return None
+        cfg = self.config
+        self.dex = DexSource(self.tracker.table, self.dex_pools, cfg.dex_rpc, cfg.dex_multicall,
+                             on_update=self.evaluate)
+        return asyncio.create_task(self.dex.run())
+
+    async def _run_live(self) -> None:
+        # Spreads are re-evaluated on every quote update; the JSON file is only refreshed every `interval`
+        cfg = self.config
+        self._reload()
+        if self.tracker is None:
+            print(f"[SpreadLoop] {cfg.candidates_path} not found")
+            return
+        tracker = self.tracker
+        if cfg.workers > 1:
+            # Workers own the connections and quote sources; this process merges, filters and ranks
+            self.pool = ShardPool(tracker.table, cfg, cfg.workers, on_update=self.evaluate)
+        elif cfg.mode == "book":
+            self.stream = DepthStream(
+                tracker.table,
+                on_update=lambda _row: self.evaluate(),
+                notional=cfg.notional,
+                binance_url=cfg.binance_ws,
+                bybit_url=cfg.bybit_ws,
+                binance_rest=cfg.binance_rest,
+                transport=self.transport,
+            )
+        elif cfg.mode == "adaptive":
+            # REST only: `interval` is the slowest refresh any symbol gets
+            self.scheduler = AdaptiveScheduler(
+                tracker,
+                on_update=self.evaluate,
+                transport=self.transport,
+                adapters=self.adapters,
+                budget=cfg.rate_budget,
+                slow_interval=cfg.interval,
+                fast_interval=cfg.fast_interval,
+                concurrency=cfg.concurrency,
+            )
+        else:
+            self.stream = StreamEngine(
+                tracker.table,
+                on_update=lambda _row: self.evaluate(),
+                binance_url=cfg.binance_ws,
+                bybit_url=cfg.bybit_ws,
+            )
+        source = self.pool or self.scheduler or self.stream
+        task = asyncio.create_task(source.run())
+        exports = Exports(cfg, cfg.interval)
+
+        async def stats_loop() -> None:
+            while True:
+                await asyncio.sleep(cfg.stats_interval)
+                self.sample_stats()
+
+        async def publish_loop() -> None:
+            # Live readers get the shared-memory table at a fixed cadence, history at its own rate
+            last_record = 0.0
+            while True:
+                await asyncio.sleep(cfg.shm_interval)
+                with span("publish"):
+                    exports.publish(tracker)
+                if time.monotonic() - last_record >= cfg.history_interval:
+                    with span("record"):
+                        exports.record(tracker)
+                    last_record = time.monotonic()
+
+        background = [asyncio.create_task(publish_loop())]
+        if self.stats is not None:
+            background.append(asyncio.create_task(stats_loop()))
+        dex = self._start_dex()
+        if dex is not None:
+            background.append(dex)
+        try:
+            while True:
+                await asyncio.sleep(cfg.interval)
+                self._reload()
+                self.cycles += 1
+                with span("export"):
+                    saved = exports.export(tracker)
+                print(f"[SpreadLoop] Saved {saved} samples, {self._progress()}. Top (bps):",
+                      _top(tracker))
+        finally:
+            for t in (task, *background):
+                t.cancel()
+            await asyncio.gather(task, *background, return_exceptions=True)
+            exports.close()
+
+    async def _run_poll(self) -> None:
+        # One event loop for the whole run so pooled connections stay open between cycles
+        cfg = self.config
+        transport = self.transport
+        warm = cfg.concurrency if cfg.mode == "depth" else 1
+        await asyncio.gather(*(transport.awarm(a.rest, warm) for a in self.adapters))
+        exports = Exports(cfg, cfg.json_interval)
+        dex: Optional["asyncio.Task[None]"] = None
+        try:
+            while True:
+                print(f"[SpreadLoop] Run at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                # Quotes persist across cycles so only symbols whose quotes moved are re-evaluated
+                self._reload()
+                tracker = self.tracker
+                if dex is None:
+                    dex = self._start_dex()
+                if tracker is not None:
+                    start = time.perf_counter()
+                    with span("poll"):
+                        await poll(tracker.table, cfg.mode, cfg.concurrency, cfg.deadline, transport, self.adapters)
+                    rec = recording.active()
+                    if rec is not None:
+                        rec.mark(recording.CYCLE)
+                    self.evaluate()
+                    self.sample_stats()
+                    self.cycles += 1
+                    with span("publish"):
+                        exports.publish(tracker)
+                    with span("record"):
+                        exports.record(tracker)
+                    with span("export"):
+                        saved = exports.export(tracker)
+                    elapsed = time.perf_counter() - start
+                    CYCLE_SECONDS.observe(elapsed)
+                    if elapsed > cfg.interval:
+                        CYCLE_OVERRUNS.inc()
+                    print(f"[SpreadLoop] Saved {saved} samples in {elapsed:.2f}s. Top (bps):",
+                          _top(tracker))
+                    print(f"[SpreadLoop] Pool: {transport.stats()}")
+                await asyncio.sleep(cfg.interval)
+        finally:
+            if dex is not None:
+                dex.cancel()
+                await asyncio.gather(dex, return_exceptions=True)
+            await transport.aclose()
+            exports.close()
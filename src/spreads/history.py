@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# One chunk directory per UTC day, one raw little-endian file per column, stored uncompressed.
+# Row size is 26 bytes, so a day at 1 Hz over 480 symbols is 480 * 86400 * 26 B ~= 1.08 GB,
+# about 7.5 GB on disk with the default 7-day retention.
+COLUMNS: Dict[str, np.dtype] = {
+    "ts": np.dtype("<u4"),  # milliseconds since chunk start
+    "sym": np.dtype("<u2"),  # interned symbol id
+    "binance_bid": np.dtype("<f4"),
+    "binance_ask": np.dtype("<f4"),
+    "bybit_bid": np.dtype("<f4"),
+    "bybit_ask": np.dtype("<f4"),
+    "bps": np.dtype("<f4"),
+}
+ROW_BYTES = sum(dt.itemsize for dt in COLUMNS.values())
+SYMBOLS_FILE = "symbols.txt"
+SEALED_FILE = "sealed"
+PERM_FILE = "sym_perm.u4"
+OFFSETS_FILE = "sym_offsets.u8"
+
+
+def _chunk_name(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _chunk_start(name: str) -> float:
+    return datetime.strptime(name, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def _load_symbols(root: str) -> List[str]:
+    path = os.path.join(root, SYMBOLS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def _column_paths(chunk_dir: str) -> Dict[str, str]:
+    return {col: os.path.join(chunk_dir, f"{col}.{dt.kind}{dt.itemsize}") for col, dt in COLUMNS.items()}
+
+
+def _trim_chunk(chunk_dir: str) -> None:
+    # Cut ragged tails left by a crash so every column ends at the same row
+    paths = _column_paths(chunk_dir)
+    rows = min((os.path.getsize(p) if os.path.exists(p) else 0) // COLUMNS[col].itemsize for col, p in paths.items())
+    for col, p in paths.items():
+        if os.path.exists(p):
+            os.truncate(p, rows * COLUMNS[col].itemsize)
+
+
+def seal_chunk(chunk_dir: str) -> None:
+    """Writes the per-symbol row index of a finished chunk (CSR: row permutation + offsets per id)."""
+    sym_path = os.path.join(chunk_dir, "sym.u2")
+    if not os.path.exists(sym_path) or os.path.getsize(sym_path) == 0:
+        return
+    sym = np.memmap(sym_path, dtype=COLUMNS["sym"], mode="r")
+    perm = np.argsort(sym, kind="stable").astype("<u4")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(sym)))).astype("<u8")
+    perm.tofile(os.path.join(chunk_dir, PERM_FILE))
+    offsets.tofile(os.path.join(chunk_dir, OFFSETS_FILE))
+    with open(os.path.join(chunk_dir, SEALED_FILE), "w") as f:
+        f.write(str(len(sym)))
+
+
+class HistoryWriter:
+    """Append-only columnar store of every sample, fsynced every `fsync_interval` seconds.
+
+    Chunks older than `retention_days` are deleted when a new chunk is opened.
+    """
+
+    def __init__(self, root: str, fsync_interval: float = 5.0, retention_days: Optional[int] = None) -> None:
+        self.root = root
+        self.fsync_interval = fsync_interval
+        self.retention_days = retention_days
+        os.makedirs(root, exist_ok=True)
+        self.symbols = _load_symbols(root)
+        self.ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self._symbols_file = open(os.path.join(root, SYMBOLS_FILE), "a")
+        self._chunk: Optional[str] = None
+        self._chunk_start = 0.0
+        self._files: Dict[str, BinaryIO] = {}
+        self._last_sync = time.monotonic()
+
+    def intern(self, bases: Sequence[str]) -> np.ndarray:
+        out = np.empty(len(bases), dtype=COLUMNS["sym"])
+        for i, base in enumerate(bases):
+            sid = self.ids.get(base)
+            if sid is None:
+                sid = len(self.symbols)
+                self.symbols.append(base)
+                self.ids[base] = sid
+                self._symbols_file.write(base + "\n")
+            out[i] = sid
+        self._symbols_file.flush()
+        return out
+
+    def append(self, ts: float, bases: Sequence[str], bid: np.ndarray, ask: np.ndarray, bps: np.ndarray) -> None:
+        # bid/ask are (n, 2) arrays with Binance in column 0 and Bybit in column 1, like QuoteTable
+        name = _chunk_name(ts)
+        if name != self._chunk:
+            self._open_chunk(name)
+        n = len(bases)
+        columns = {
+            "ts": np.full(n, int((ts - self._chunk_start) * 1000.0), dtype=COLUMNS["ts"]),
+            "sym": self.intern(bases),
+            "binance_bid": bid[:, 0],
+            "binance_ask": ask[:, 0],
+            "bybit_bid": bid[:, 1],
+            "bybit_ask": ask[:, 1],
+            "bps": bps,
+        }
+        for col, values in columns.items():
+            self._files[col].write(np.ascontiguousarray(values, dtype=COLUMNS[col]).tobytes())
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        self._close_chunk()
+        self._symbols_file.close()
+
+    def _open_chunk(self, name: str) -> None:
+        self._close_chunk()
+        self._expire(name)
+        # The chunk just finished, and any earlier one a crashed run left open, gets its index
+        self._seal_before(name)
+        chunk_dir = os.path.join(self.root, name)
+        os.makedirs(chunk_dir, exist_ok=True)
+        # Appending again invalidates a previously written symbol index
+        if os.path.exists(os.path.join(chunk_dir, SEALED_FILE)):
+            os.remove(os.path.join(chunk_dir, SEALED_FILE))
+        _trim_chunk(chunk_dir)
+        paths = _column_paths(chunk_dir)
+        self._chunk = name
+        self._chunk_start = _chunk_start(name)
+        self._files = {col: open(p, "ab") for col, p in paths.items()}
+
+    def _seal_before(self, current: str) -> None:
+        previous = self._chunk
+        for name in sorted(os.listdir(self.root)):
+            chunk_dir = os.path.join(self.root, name)
+            if name >= current or not os.path.isdir(chunk_dir) or os.path.exists(os.path.join(chunk_dir, SEALED_FILE)):
+                continue
+            _trim_chunk(chunk_dir)
+            seal_chunk(chunk_dir)
+            # seal_chunk skips chunks without rows
+            if name != previous and os.path.exists(os.path.join(chunk_dir, SEALED_FILE)):
+                print(f"[History] Sealed chunk {name} left open by an earlier run")
+
+    def _close_chunk(self) -> None:
+        if self._files:
+            self.sync()
+            for f in self._files.values():
+                f.close()
+        self._files = {}
+
+    def _expire(self, current: str) -> None:
+        if self.retention_days is None:
+            return
+        cutoff = (datetime.strptime(current, "%Y-%m-%d") - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for name in os.listdir(self.root):
+            if os.path.isdir(os.path.join(self.root, name)) and name < cutoff:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class HistoryReader:
+    """Memory-mapped time-range queries over the store.
+
+    Sealed chunks are looked up through their symbol index; the open chunk is narrowed by
+    binary search on the (monotonic) time column and then filtered by symbol id.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def chunks(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(n for n in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, n)))
+
+    def _columns(self, chunk_dir: str) -> Dict[str, np.ndarray]:
+        cols: Dict[str, np.ndarray] = {}
+        for col, path in _column_paths(chunk_dir).items():
+            dt = COLUMNS[col]
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            cols[col] = np.memmap(path, dtype=dt, mode="r") if size >= dt.itemsize else np.empty(0, dtype=dt)
+        # A crash between column writes can leave ragged tails; only whole rows count
+        n = min(len(c) for c in cols.values())
+        return {col: c[:n] for col, c in cols.items()}
+
+    def query(self, symbol: str, start: float, end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Rows for `symbol` with start <= ts < end (epoch seconds); `ts` is returned in epoch seconds."""
+        end = time.time() if end is None else end
+        symbols = _load_symbols(self.root)
+        parts: List[Dict[str, np.ndarray]] = []
+        if symbol in symbols:
+            sid = symbols.index(symbol)
+            for name in self.chunks():
+                base = _chunk_start(name)
+                if base + 86400.0 <= start or base >= end:
+                    continue
+                part = self._query_chunk(os.path.join(self.root, name), sid, base, start, end)
+                if part is not None:
+                    parts.append(part)
+        out: Dict[str, np.ndarray] = {}
+        for col in COLUMNS:
+            if col == "sym":
+                continue
+            dt = np.dtype("f8") if col == "ts" else COLUMNS[col]
+            out[col] = np.concatenate([p[col] for p in parts]) if parts else np.empty(0, dtype=dt)
+        return out
+
+    def _query_chunk(self, chunk_dir: str, sid: int, base: float, start: float, end: float) -> Optional[Dict[str, np.ndarray]]:
+        cols = self._columns(chunk_dir)
+        ts = cols["ts"]
+        lo_ms = max(0.0, (start - base) * 1000.0)
+        hi_ms = max(0.0, (end - base) * 1000.0)
+        if os.path.exists(os.path.join(chunk_dir, SEALED_FILE)):
+            offsets = np.fromfile(os.path.join(chunk_dir, OFFSETS_FILE), dtype="<u8")
+            if sid + 1 >= len(offsets):
+                return None
+            perm = np.memmap(os.path.join(chunk_dir, PERM_FILE), dtype="<u4", mode="r")
+            rows = np.asarray(perm[offsets[sid]:offsets[sid + 1]])
+            rows = rows[rows < len(ts)]
+            lo, hi = np.searchsorted(ts[rows], [lo_ms, hi_ms], side="left")
+            rows = rows[lo:hi]
+        else:
+            lo, hi = np.searchsorted(ts, [lo_ms, hi_ms], side="left")
+            rows = lo + np.flatnonzero(cols["sym"][lo:hi] == sid)
+        if not len(rows):
+            return None
+        part = {col: np.asarray(c[rows]) for col, c in cols.items() if col != "sym"}
+        part["ts"] = base + part["ts"].astype("f8") / 1000.0
+        return part
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from spreads.kernel import QuoteTable, compute, remap, to_samples
+from spreads.models import SpreadSample
+from spreads.stats import RollingStats
+
+
+@dataclass
+class BandEvent:
+    kind: str  # "enter" | "exit"
+    base: str
+    symbol: str
+    spread_bps: Optional[float]
+    ts: float
+    z: Optional[float] = None  # z-score in the tracker's stats window, when it keeps stats
+    # Best buy-at-ask / sell-at-bid pair at the time of the event, as in `SpreadFrame`
+    buy_venue: Optional[str] = None
+    sell_venue: Optional[str] = None
+    buy_price: Optional[float] = None
+    sell_price: Optional[float] = None
+    best_bps: Optional[float] = None
+    # Quote times of the two legs in ms, as stamped in the table (0 = never quoted)
+    buy_ts: Optional[int] = None
+    sell_ts: Optional[int] = None
+
+
+class RankHeap:
+    """Max-heap of row scores with lazy deletion.
+
+    Updates and removals are O(log n); superseded entries are skipped when read and
+    compacted away once they outnumber live ones.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int]] = []
+        self._score: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._score)
+
+    def __contains__(self, row: int) -> bool:
+        return row in self._score
+
+    def get(self, row: int) -> Optional[float]:
+        return self._score.get(row)
+
+    def update(self, row: int, score: float) -> None:
+        if self._score.get(row) == score:
+            return
+        self._score[row] = score
+        heapq.heappush(self._heap, (-score, row))
+        self._maybe_compact()
+
+    def remove(self, row: int) -> None:
+        if self._score.pop(row, None) is not None:
+            self._maybe_compact()
+
+    def top(self, n: int) -> List[Tuple[int, float]]:
+        out: List[Tuple[int, float]] = []
+        kept: List[Tuple[float, int]] = []
+        while self._heap and len(out) < n:
+            entry = heapq.heappop(self._heap)
+            neg, row = entry
+            if self._score.get(row) != -neg or any(r == row for r, _ in out):
+                continue
+            out.append((row, -neg))
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self._heap, entry)
+        return out
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) > 2 * len(self._score) + 64:
+            self._heap = [(-score, row) for row, score in self._score.items()]
+            heapq.heapify(self._heap)
+
+
+class SpreadTracker:
+    """Recomputes spreads only for rows flagged dirty in `table` and keeps a live ranking.
+
+    `evaluate` returns band entry/exit events for the rows whose band membership changed;
+    `changed` holds the rows it recomputed.
+
+    With `stats` (a `RollingStats` over the same rows, sampled by the caller) each recomputed row
+    also gets the z-score of its spread against its own recent history in `z`: `min_z` then
+    additionally requires |z| >= min_z to be in the band, and `rank_by="z"` ranks by |z| instead
+    of |bps|. A row's z-score is refreshed when its quotes change.
+    """
+
+    def __init__(
+        self,
+        table: QuoteTable,
+        min_bps: Optional[float] = None,
+        max_bps: Optional[float] = None,
+        stats: Optional[RollingStats] = None,
+        min_z: Optional[float] = None,
+        rank_by: str = "bps",
+    ) -> None:
+        if rank_by not in ("bps", "z"):
+            raise ValueError(f"rank_by must be 'bps' or 'z', got {rank_by!r}")
+        if (min_z is not None or rank_by == "z") and stats is None:
+            raise ValueError("z-score bands and ranking need rolling stats")
+        self.table = table
+        self.min_bps = min_bps
+        self.max_bps = max_bps
+        self.stats = stats
+        self.min_z = min_z
+        self.rank_by = rank_by
+        self.bps = np.full(len(table), np.nan)
+        self.z = np.full(len(table), np.nan)
+        self.in_band = np.zeros(len(table), dtype=bool)
+        self.ranking = RankHeap()
+        self.evaluated = 0
+        self.changed = np.empty(0, dtype=np.int64)
+        table.dirty[:] = True
+
+    @property
+    def banded(self) -> bool:
+        return self.min_bps is not None or self.max_bps is not None or self.min_z is not None
+
+    def evaluate(self) -> List[BandEvent]:
+        rows = np.flatnonzero(self.table.dirty)
+        self.changed = rows
+        if not len(rows):
+            return []
+        self.table.dirty[rows] = False
+        self.evaluated += len(rows)
+
+        frame = compute(self.table, self.min_bps, self.max_bps, top_k=0, rows=rows)
+        was = self.in_band[rows]
+        now = frame.mask
+        z = self.stats.zscore(frame.spread_bps, rows) if self.stats is not None else None
+        if z is not None:
+            self.z[rows] = z
+            if self.min_z is not None:
+                now = now & (np.abs(z) >= self.min_z)
+        self.bps[rows] = frame.spread_bps
+        self.in_band[rows] = now
+
+        score = np.abs(z) if z is not None and self.rank_by == "z" else np.abs(frame.spread_bps)
+        ranked = now & ~np.isnan(score)
+        for i in np.flatnonzero(ranked):
+            self.ranking.update(int(rows[i]), float(score[i]))
+        for i in np.flatnonzero(~ranked):
+            self.ranking.remove(int(rows[i]))
+
+        if not self.banded:
+            return []
+        ts = time.time()
+        events: List[BandEvent] = []
+        venues = self.table.venues
+        for i in np.flatnonzero(now != was):
+            row = rows[i]
+            base = self.table.bases[row]
+            bps = frame.spread_bps[i]
+            buy, sell = int(frame.buy[i]), int(frame.sell[i])
+            paired = buy >= 0
+            events.append(BandEvent(
+                kind="enter" if now[i] else "exit",
+                base=base,
+                symbol=f"{base}/USDT",
+                spread_bps=None if np.isnan(bps) else float(bps),
+                ts=ts,
+                z=None if z is None or np.isnan(z[i]) else round(float(z[i]), 2),
+                buy_venue=venues[buy] if paired else None,
+                sell_venue=venues[sell] if paired else None,
+                buy_price=float(self.table.ask[row, buy]) if paired else None,
+                sell_price=float(self.table.bid[row, sell]) if paired else None,
+                best_bps=float(frame.best_bps[i]) if paired else None,
+                buy_ts=int(self.table.ts[row, buy]) if paired else None,
+                sell_ts=int(self.table.ts[row, sell]) if paired else None,
+            ))
+        return events
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> List[BandEvent]:
+        """Moves the tracker onto `table` from `QuoteTable.reshape`, keeping every surviving row's state.
+
+        Rows that were in the band and are gone from the universe get an exit event, so listeners
+        do not keep them open; added rows are evaluated on the next `evaluate`.
+        """
+        gone = np.setdiff1d(np.flatnonzero(self.in_band), src[src >= 0])
+        ts = time.time()
+        events = [
+            BandEvent(kind="exit", base=self.table.bases[row], symbol=f"{self.table.bases[row]}/USDT",
+                      spread_bps=None, ts=ts)
+            for row in gone
+        ] if self.banded else []
+        ranking = RankHeap()
+        for row, old in enumerate(src):
+            score = self.ranking.get(int(old)) if old >= 0 else None
+            if score is not None:
+                ranking.update(row, score)
+        self.table = table
+        self.bps = remap(self.bps, src)
+        self.z = remap(self.z, src)
+        if self.stats is not None:
+            self.stats.retarget(src)
+        self.in_band = remap(self.in_band, src, False)
+        self.ranking = ranking
+        self.changed = np.empty(0, dtype=np.int64)
+        return events
+
+    def samples(self) -> List[SpreadSample]:
+        # Objects are only built for rows currently inside the band
+        rows = np.flatnonzero(self.in_band)
+        return self._samples(rows)
+
+    def top(self, n: int = 5) -> List[SpreadSample]:
+        rows = np.array([row for row, _ in self.ranking.top(n)], dtype=np.int64)
+        return self._samples(rows)
+
+    def _samples(self, rows: np.ndarray) -> List[SpreadSample]:
+        out = to_samples(self.table, compute(self.table, rows=rows), range(len(rows)))
+        if self.stats is not None:
+            for sample, z in zip(out, self.z[rows]):
+                sample.z = None if np.isnan(z) else round(float(z), 2)
+        return out
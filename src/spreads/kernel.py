@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spreads.models import SpreadSample, make_sample
+
+
+# Default venues; QuoteTable takes any list. Stream and depth modes index Binance/Bybit books by these.
+VENUES = ("binance", "bybit")
+BINANCE, BYBIT = 0, 1
+
+
+def _opt(x: float) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+
+def _same(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def _same_value(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+
+def remap(values: np.ndarray, src: np.ndarray, fill: float = np.nan) -> np.ndarray:
+    """Per-row state moved onto a reshaped table: row i gets `values[src[i]]`, `fill` where src is -1."""
+    out = np.full((len(src),) + values.shape[1:], fill, dtype=values.dtype)
+    kept = src >= 0
+    out[kept] = values[src[kept]]
+    return out
+
+
+class QuoteTable:
+    """Struct-of-arrays quote table: one row per base asset, one column per venue, NaN where missing.
+
+    `legs` are (base, symbol on venues[0], symbol on venues[1], ...) with "" where the asset is not
+    listed. `dirty` flags rows whose quotes changed since the last incremental evaluation.
+    """
+
+    def __init__(self, legs: Iterable[Tuple[str, ...]], venues: Sequence[str] = VENUES) -> None:
+        legs = list(legs)
+        self.venues: Tuple[str, ...] = tuple(venues)
+        self.legs: List[Tuple[str, ...]] = [tuple(leg) for leg in legs]
+        self.bases: List[str] = [leg[0] for leg in legs]
+        self.rows: Dict[str, int] = {base: i for i, base in enumerate(self.bases)}
+        self.symbol_rows: Dict[str, Dict[str, int]] = {
+            venue: {leg[1 + col]: i for i, leg in enumerate(legs) if leg[1 + col]}
+            for col, venue in enumerate(self.venues)
+        }
+        n = len(legs)
+        self.bid = np.full((n, len(self.venues)), np.nan)
+        self.ask = np.full((n, len(self.venues)), np.nan)
+        self.ts = np.zeros((n, len(self.venues)), dtype=np.int64)
+        self.dirty = np.ones(n, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.bases)
+
+    def symbols(self, venue: str) -> List[str]:
+        return list(self.symbol_rows[venue])
+
+    def reshape(self, legs: Iterable[Tuple[str, ...]]) -> Tuple["QuoteTable", np.ndarray]:
+        """A table for a new candidate universe that keeps this one's quotes for the legs in both.
+
+        Bases already here keep their relative order and new ones are appended, so an unchanged
+        universe maps every row onto itself. Returns the table and `src`, this table's row for each
+        new row or -1 for an added base; a leg whose symbol changed starts without a quote.
+        """
+        by_base = {leg[0]: tuple(leg) for leg in legs}
+        order = [base for base in self.bases if base in by_base]
+        order += [base for base in by_base if base not in self.rows]
+        table = QuoteTable([by_base[base] for base in order], self.venues)
+        src = np.array([self.rows.get(base, -1) for base in order], dtype=np.int64)
+        kept = np.flatnonzero(src >= 0)
+        table.bid[kept] = self.bid[src[kept]]
+        table.ask[kept] = self.ask[src[kept]]
+        table.ts[kept] = self.ts[src[kept]]
+        table.dirty[kept] = self.dirty[src[kept]]
+        for row in kept:
+            old = self.legs[src[row]]
+            if old != table.legs[row]:
+                moved = [col for col in range(len(self.venues)) if old[1 + col] != table.legs[row][1 + col]]
+                table.bid[row, moved] = np.nan
+                table.ask[row, moved] = np.nan
+                table.ts[row, moved] = 0
+                table.dirty[row] = True
+        return table, src
+
+    def quotes(self, venues: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # (bid, ask) columns for `venues` in that order, NaN for venues the table does not have
+        bid = np.full((len(self), len(venues)), np.nan)
+        ask = np.full((len(self), len(venues)), np.nan)
+        for i, venue in enumerate(venues):
+            if venue in self.venues:
+                col = self.venues.index(venue)
+                bid[:, i] = self.bid[:, col]
+                ask[:, i] = self.ask[:, col]
+        return bid, ask
+
+    def load(self, venue: str, tops: Dict[str, Dict[str, Optional[float]]], ts: Optional[int] = None,
+             partial: bool = False) -> None:
+        # Joins a symbol -> {"bid", "ask"} map from a bulk quote source onto the table rows;
+        # rows that got a quote are stamped with `ts` (ms, now by default) for staleness tracking.
+        # Symbols missing from `tops` lose their quote, or keep it (and its age) with `partial`
+        col = self.venues.index(venue)
+        bids = self.bid[:, col].copy() if partial else np.full(len(self), np.nan)
+        asks = self.ask[:, col].copy() if partial else np.full(len(self), np.nan)
+        quoted: List[int] = []
+        for symbol, row in self.symbol_rows[venue].items():
+            top = tops.get(symbol)
+            if top is None:
+                continue
+            bids[row] = asks[row] = np.nan
+            if not top:
+                continue
+            bid, ask = top.get("bid"), top.get("ask")
+            if bid is not None:
+                bids[row] = bid
+            if ask is not None:
+                asks[row] = ask
+            if bid is not None or ask is not None:
+                quoted.append(row)
+        self.dirty |= ~(_same(self.bid[:, col], bids) & _same(self.ask[:, col], asks))
+        self.bid[:, col] = bids
+        self.ask[:, col] = asks
+        if quoted:
+            self.ts[quoted, col] = ts if ts is not None else int(time.time() * 1000)
+
+    def expire(self, venue: str, before: int) -> None:
+        # Drops quotes last stamped before `before` (ms): a venue that stopped answering goes blank
+        col = self.venues.index(venue)
+        old = np.flatnonzero((self.ts[:, col] > 0) & (self.ts[:, col] < before))
+        old = old[~(np.isnan(self.bid[old, col]) & np.isnan(self.ask[old, col]))]
+        if len(old):
+            self.bid[old, col] = np.nan
+            self.ask[old, col] = np.nan
+            self.dirty[old] = True
+
+    def put(self, venue: str, rows: np.ndarray, bid: np.ndarray, ask: np.ndarray, ts: int) -> None:
+        # Vectorized `load` for sources that already know their rows (one DEX read per block)
+        col = self.venues.index(venue)
+        self.dirty[rows] |= ~(_same(self.bid[rows, col], bid) & _same(self.ask[rows, col], ask))
+        self.bid[rows, col] = bid
+        self.ask[rows, col] = ask
+        self.ts[rows[~np.isnan(bid) | ~np.isnan(ask)], col] = ts
+
+    def set(self, venue: str, symbol: str, bid: Optional[float], ask: Optional[float], ts: Optional[int]) -> Optional[int]:
+        # Single-leg update for streaming sources; a missing side (None) keeps its previous value,
+        # NaN clears it (the level is gone)
+        row = self.symbol_rows[venue].get(symbol)
+        if row is None:
+            return None
+        col = self.venues.index(venue)
+        if bid is not None and not _same_value(bid, self.bid[row, col]):
+            self.bid[row, col] = bid
+            self.dirty[row] = True
+        if ask is not None and not _same_value(ask, self.ask[row, col]):
+            self.ask[row, col] = ask
+            self.dirty[row] = True
+        if ts is not None:
+            self.ts[row, col] = ts
+        return row
+
+    def drop(self, venue: str, row: int) -> None:
+        # Clears one leg whose source is known to be invalid (a book resyncing after a gap)
+        col = self.venues.index(venue)
+        if not (np.isnan(self.bid[row, col]) and np.isnan(self.ask[row, col])):
+            self.bid[row, col] = np.nan
+            self.ask[row, col] = np.nan
+            self.dirty[row] = True
+
+    def sample(self, row: int) -> SpreadSample:
+        # Scalar path for one row, cheaper than a kernel call on every streamed tick
+        return make_sample(
+            self.bases[row],
+            self.venues,
+            [_opt(x) for x in self.bid[row]],
+            [_opt(x) for x in self.ask[row]],
+        )
+
+    def samples(self) -> List[SpreadSample]:
+        frame = compute(self)
+        return to_samples(self, frame, np.flatnonzero(frame.mask))
+
+
+@dataclass
+class SpreadFrame:
+    rows: np.ndarray
+    mid: np.ndarray
+    spread_abs: np.ndarray
+    spread_bps: np.ndarray
+    mask: np.ndarray
+    top: np.ndarray
+    # Best buy-at-ask / sell-at-bid venue pair per row, -1/NaN where fewer than two venues quote
+    buy: np.ndarray
+    sell: np.ndarray
+    best_bps: np.ndarray
+
+
+def spread_matrix(bid: np.ndarray, ask: np.ndarray) -> np.ndarray:
+    """(rows, venues, venues) bps of buying at the ask on venue i and selling at the bid on venue j.
+
+    The diagonal and pairs with a missing quote are NaN. One broadcast over all rows, so the cost
+    is rows x venues^2 arithmetic in NumPy with no per-pair Python.
+    """
+    buy = ask[:, :, None]
+    sell = bid[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = (sell - buy) / ((sell + buy) / 2.0) * 10_000.0
+    v = bid.shape[1]
+    m[:, np.arange(v), np.arange(v)] = np.nan
+    return m
+
+
+def compute(
+    table: QuoteTable,
+    min_bps: Optional[float] = None,
+    max_bps: Optional[float] = None,
+    top_k: int = 5,
+    rows: Optional[np.ndarray] = None,
+) -> SpreadFrame:
+    """Mids, spreads, |bps| band mask, top-K by |bps| and the best venue pair for every row (or `rows`) in one pass.
+
+    The spread of a row is between its highest and lowest mid across venues, positive when the
+    higher one comes first in venue order; with two venues that is simply venue 0 minus venue 1.
+    Indices in `mask` and `top` are positions within the computed frame.
+    """
+    if rows is None:
+        rows = np.arange(len(table))
+    bid = table.bid[rows]
+    ask = table.ask[rows]
+    mid = (bid + ask) / 2.0
+    known = ~np.isnan(mid)
+    hi = np.where(known, mid, -np.inf).argmax(axis=1)
+    lo = np.where(known, mid, np.inf).argmin(axis=1)
+    at = np.arange(len(rows))
+    mid_hi, mid_lo = mid[at, hi], mid[at, lo]
+    quoted = known.sum(axis=1) >= 2
+    spread_abs = np.where(quoted, np.where(hi <= lo, mid_hi - mid_lo, mid_lo - mid_hi), np.nan)
+    denom = (mid_hi + mid_lo) / 2.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread_bps = np.round(np.where(denom != 0.0, spread_abs / denom * 10_000.0, np.nan), 2)
+
+    v = len(table.venues)
+    matrix = spread_matrix(bid, ask).reshape(len(rows), v * v)
+    flat = np.where(np.isnan(matrix), -np.inf, matrix).argmax(axis=1)
+    best_bps = np.round(matrix[at, flat], 2)
+    paired = ~np.isnan(best_bps)
+    buy = np.where(paired, flat // v, -1)
+    sell = np.where(paired, flat % v, -1)
+
+    abs_bps = np.abs(spread_bps)
+    valid = ~np.isnan(spread_bps)
+    if min_bps is None and max_bps is None:
+        mask = np.ones(len(rows), dtype=bool)
+    else:
+        mask = valid.copy()
+        if min_bps is not None:
+            mask &= abs_bps >= min_bps
+        if max_bps is not None:
+            mask &= abs_bps <= max_bps
+
+    ranked = np.flatnonzero(mask & valid)
+    if top_k <= 0:
+        ranked = ranked[:0]
+    elif top_k < len(ranked):
+        ranked = ranked[np.argpartition(-abs_bps[ranked], top_k - 1)[:top_k]]
+    top = ranked[np.argsort(-abs_bps[ranked], kind="stable")]
+    return SpreadFrame(rows=rows, mid=mid, spread_abs=spread_abs, spread_bps=spread_bps, mask=mask, top=top,
+                       buy=buy, sell=sell, best_bps=best_bps)
+
+
+def to_samples(table: QuoteTable, frame: SpreadFrame, idx: Sequence[int]) -> List[SpreadSample]:
+    out: List[SpreadSample] = []
+    venues = table.venues
+    for i in idx:
+        row = frame.rows[i]
+        base = table.bases[row]
+        buy, sell = int(frame.buy[i]), int(frame.sell[i])
+        out.append(SpreadSample(
+            base=base,
+            symbol=f"{base}/USDT",
+            bid={v: _opt(x) for v, x in zip(venues, table.bid[row])},
+            ask={v: _opt(x) for v, x in zip(venues, table.ask[row])},
+            mid={v: _opt(x) for v, x in zip(venues, frame.mid[i])},
+            spread_abs=_opt(frame.spread_abs[i]),
+            spread_bps=_opt(frame.spread_bps[i]),
+            buy_venue=venues[buy] if buy >= 0 else None,
+            sell_venue=venues[sell] if sell >= 0 else None,
+            best_bps=_opt(frame.best_bps[i]),
+        ))
+    return out
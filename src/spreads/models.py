@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import msgspec
+
+
+class SpreadSample(msgspec.Struct, gc=False):
+    """Quotes of one base asset on every venue (None where missing) and its spreads.
+
+    `spread_bps` is the widest mid spread across venues, positive when the venue with the higher
+    mid comes first in venue order (for Binance/Bybit: Binance minus Bybit). `buy_venue` /
+    `sell_venue` / `best_bps` are the most profitable pair buying at the ask on one venue and
+    selling at the bid on another. `z` is the z-score of `spread_bps` against the asset's
+    rolling history, set only by trackers that keep rolling stats.
+
+    Slotted and not tracked by the garbage collector; `ENCODER` writes it to JSON without an
+    intermediate dict.
+    """
+
+    base: str
+    symbol: str
+    bid: Dict[str, Optional[float]]
+    ask: Dict[str, Optional[float]]
+    mid: Dict[str, Optional[float]]
+    spread_abs: Optional[float]
+    spread_bps: Optional[float]
+    buy_venue: Optional[str] = None
+    sell_venue: Optional[str] = None
+    best_bps: Optional[float] = None
+    z: Optional[float] = None
+
+
+ENCODER = msgspec.json.Encoder()
+
+
+def mid(bid: Optional[float], ask: Optional[float]) -> Optional[float]:
+    if bid is None or ask is None:
+        return None
+    return (bid + ask) / 2.0
+
+
+def spread(mid_b: Optional[float], mid_y: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+    # Returns (spread_abs, spread_bps) of the first mid vs the second
+    if mid_b is None or mid_y is None:
+        return None, None
+    spread_abs = mid_b - mid_y
+    denom = (mid_b + mid_y) / 2.0
+    spread_bps = (spread_abs / denom) * 10_000.0 if denom else None
+    return spread_abs, spread_bps
+
+
+def widest(mids: Sequence[Optional[float]]) -> Tuple[Optional[float], Optional[float]]:
+    # (spread_abs, spread_bps) between the highest and lowest mid, signed by venue order
+    known = [(m, i) for i, m in enumerate(mids) if m is not None]
+    if len(known) < 2:
+        return None, None
+    hi = max(known, key=lambda x: (x[0], -x[1]))
+    lo = min(known, key=lambda x: (x[0], x[1]))
+    diff, bps = spread(hi[0], lo[0])
+    if hi[1] > lo[1]:
+        diff, bps = -diff, (-bps if bps is not None else None)
+    return diff, bps
+
+
+def best_pair(
+    bids: Sequence[Optional[float]],
+    asks: Sequence[Optional[float]],
+) -> Tuple[Optional[int], Optional[int], Optional[float]]:
+    # (buy venue index, sell venue index, bps) of the best buy-at-ask / sell-at-bid pair
+    best: Tuple[Optional[int], Optional[int], Optional[float]] = (None, None, None)
+    for i, ask in enumerate(asks):
+        for j, bid in enumerate(bids):
+            if i == j or ask is None or bid is None or bid + ask == 0:
+                continue
+            bps = (bid - ask) / ((bid + ask) / 2.0) * 10_000.0
+            if best[2] is None or bps > best[2]:
+                best = (i, j, bps)
+    return best
+
+
+def in_band(spread_bps: Optional[float], min_bps: Optional[float], max_bps: Optional[float]) -> bool:
+    if min_bps is None and max_bps is None:
+        return True
+    if spread_bps is None:
+        return False
+    v = abs(spread_bps)
+    if min_bps is not None and v < min_bps:
+        return False
+    if max_bps is not None and v > max_bps:
+        return False
+    return True
+
+
+def make_sample(
+    base: str,
+    venues: Sequence[str],
+    bids: Sequence[Optional[float]],
+    asks: Sequence[Optional[float]],
+) -> SpreadSample:
+    mids = [mid(b, a) for b, a in zip(bids, asks)]
+    spread_abs, spread_bps = widest(mids)
+    buy, sell, best = best_pair(bids, asks)
+    return SpreadSample(
+        base=base,
+        symbol=f"{base}/USDT",
+        bid=dict(zip(venues, bids)),
+        ask=dict(zip(venues, asks)),
+        mid=dict(zip(venues, mids)),
+        spread_abs=spread_abs,
+        spread_bps=round(spread_bps, 2) if spread_bps is not None else None,
+        buy_venue=venues[buy] if buy is not None else None,
+        sell_venue=venues[sell] if sell is not None else None,
+        best_bps=round(best, 2) if best is not None else None,
+    )
+
+
+def candidate_legs(candidates: Iterable[Dict[str, Any]], venues: Sequence[str]) -> Iterator[Tuple[str, ...]]:
+    """Yields (base, symbol on venues[0], symbol on venues[1], ...) for every candidate listed on at
+    least two of `venues`, with "" where it is not listed.
+
+    Reads both the `legs` mapping and the older flat `<venue>_symbol_raw` fields.
+    """
+    for cand in candidates:
+        base = str(cand.get("symbol", "")).split("/")[0]
+        legs = cand.get("legs") or {}
+        symbols = tuple(str(legs.get(v) or cand.get(f"{v}_symbol_raw") or "") for v in venues)
+        if sum(1 for s in symbols if s) < 2:
+            continue
+        yield (base, *symbols)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import msgspec
+
+import recording
+from exchanges.base import ExchangeAdapter
+from exchanges.registry import ADAPTERS
+from recording import Record
+from spreads.depth import DepthStream
+from spreads.incremental import BandEvent, SpreadTracker
+from spreads.kernel import QuoteTable
+from spreads.stream import StreamEngine
+from tasks.market_scanner import MarketCandidate, select_candidates
+
+
+POLL_MODES = ("bulk", "depth")
+
+
+class _ReplayDepthStream(DepthStream):
+    # Snapshot fetches and Bybit resubscribes are not re-issued: the recording already holds
+    # the snapshot or resubscribe answer the live run got
+    def _spawn(self, coro: Any) -> None:
+        coro.close()
+
+
+class Replay:
+    """Feeds recorded market data through the spread loop's and the scanner's compute path.
+
+    A `table` record (written by the engine on every universe load) sets up the `QuoteTable`,
+    the `SpreadTracker` and, for `stream` / `book` recordings, the same stream engine the loop ran;
+    one marked `reshape` moves them onto the new universe in place, as the running loop did.
+    WebSocket records go through its `_on_message`, REST bodies through the adapters' parsers.
+    Polling recordings are evaluated at each `cycle` mark like the live loop, the others after
+    every update. Scanner downloads are collected per venue and turned into candidates at each
+    `scan` mark. `on_events` gets band events with the record time as their timestamp.
+    """
+
+    def __init__(
+        self,
+        min_bps: Optional[float] = None,
+        max_bps: Optional[float] = None,
+        notional: float = 1000.0,
+        on_events: Optional[Callable[[List[BandEvent]], None]] = None,
+        on_scan: Optional[Callable[[List[MarketCandidate]], None]] = None,
+    ) -> None:
+        self.min_bps = min_bps
+        self.max_bps = max_bps
+        self.notional = notional
+        self.on_events = on_events
+        self.on_scan = on_scan
+        self.mode = "bulk"
+        self.tracker: Optional[SpreadTracker] = None
+        self.stream: Optional[StreamEngine] = None
+        self.records: Dict[str, int] = {}
+        self.evaluations = 0
+        self.events = 0
+        self.scans = 0
+        self.now = 0.0
+        self._adapters: Dict[str, ExchangeAdapter] = {}
+        self._scanner: Dict[Tuple[str, str], Any] = {}
+
+    def adapter(self, venue: str) -> ExchangeAdapter:
+        if venue not in self._adapters:
+            self._adapters[venue] = ADAPTERS[venue]()
+        return self._adapters[venue]
+
+    def run(self, records: Iterable[Record], speed: float = 0.0) -> None:
+        """Replays `records` at `speed` times the recorded pace; 0 means as fast as possible."""
+        first: Optional[float] = None
+        started = time.monotonic()
+        for rec in records:
+            if speed > 0:
+                if first is None:
+                    first = rec.ts
+                wait = (rec.ts - first) / speed - (time.monotonic() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            self.feed(rec)
+
+    def feed(self, rec: Record) -> None:
+        self.now = rec.ts
+        self.records[rec.channel] = self.records.get(rec.channel, 0) + 1
+        if rec.channel == recording.TABLE:
+            self._load_table(json.loads(rec.payload))
+        elif rec.channel == recording.WS:
+            if self.stream is not None:
+                self.stream._on_message(rec.venue, rec.payload)
+        elif rec.channel == recording.REST:
+            self._rest(rec)
+        elif rec.channel == recording.VALUE:
+            self._scanner[(rec.venue, rec.endpoint)] = msgspec.json.decode(rec.payload)
+        elif rec.channel == recording.CYCLE:
+            self.evaluate()
+        elif rec.channel == recording.SCAN:
+            self._scan(json.loads(rec.payload))
+
+    def evaluate(self) -> None:
+        if self.tracker is None:
+            return
+        events = self.tracker.evaluate()
+        self.evaluations += 1
+        self._emit(events)
+
+    def _emit(self, events: List[BandEvent]) -> None:
+        if events:
+            for e in events:
+                e.ts = self.now
+            self.events += len(events)
+            if self.on_events is not None:
+                self.on_events(events)
+
+    def _load_table(self, meta: Dict[str, Any]) -> None:
+        legs = [tuple(leg) for leg in meta["legs"]]
+        mode = meta.get("mode", "bulk")
+        if meta.get("reshape") and self.tracker is not None:
+            # A universe change in a running loop: applied in place, as `SpreadEngine.set_universe` did
+            table, src = self.tracker.table.reshape(legs)
+            self._emit(self.tracker.retarget(table, src))
+            if self.stream is not None:
+                self.stream.retarget(table, src)
+            return
+        self.mode = mode
+        table = QuoteTable(legs, meta["venues"])
+        self.tracker = SpreadTracker(table, self.min_bps, self.max_bps)
+        self.stream = None
+        if self.mode == "book":
+            self.stream = _ReplayDepthStream(table, on_update=lambda _row: self.evaluate(), notional=self.notional)
+            # As after subscribing: Binance events wait for their snapshot
+            self.stream._prepare("binance", table.symbols("binance"))
+        elif self.mode == "stream":
+            self.stream = StreamEngine(table, on_update=lambda _row: self.evaluate())
+
+    def _rest(self, rec: Record) -> None:
+        venue, endpoint = rec.venue, rec.endpoint
+        if endpoint in ("markets", "volumes"):
+            parse = self.adapter(venue).parse_markets if endpoint == "markets" else self.adapter(venue).parse_volumes
+            self._scanner[(venue, endpoint)] = parse(rec.payload)
+            return
+        if self.tracker is None:
+            return
+        table = self.tracker.table
+        ts = int(rec.ts * 1000)
+        if endpoint == "snapshot":
+            if isinstance(self.stream, DepthStream):
+                self.stream.load_snapshot(rec.key, json.loads(rec.payload))
+            return
+        if venue not in table.venues:
+            return
+        if endpoint == "tickers":
+            table.load(venue, self.adapter(venue).parse_tickers(rec.payload), ts)
+        elif endpoint == "pools":
+            # DEX reads are recorded already priced, one body per block
+            table.load(venue, msgspec.json.decode(rec.payload), ts)
+        elif endpoint == "book":
+            top = self.adapter(venue).parse_book(rec.payload)
+            table.set(venue, rec.key, top.get("bid"), top.get("ask"), ts)
+        if self.mode not in POLL_MODES:
+            self.evaluate()
+
+    def _scan(self, meta: Dict[str, Any]) -> None:
+        venues = meta.get("venues", [])
+        listed = [(self._scanner.get((v, "markets"), {}), self._scanner.get((v, "volumes"), {})) for v in venues]
+        candidates = select_candidates(venues, listed, float(meta.get("min_volume_usd", 300_000.0)))
+        self.scans += 1
+        if self.on_scan is not None:
+            self.on_scan(candidates)
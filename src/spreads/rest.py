@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+import httpx
+
+import recording
+from exchanges.base import ExchangeAdapter, Top
+from exchanges.registry import ADAPTERS, get_adapters
+from metrics import REQUEST_ERRORS, REQUEST_SECONDS, error_kind, span
+from resilience import CircuitOpen, RequestPolicy
+from spreads.kernel import QuoteTable
+from transport import Transport, get_transport
+
+
+T = TypeVar("T")
+
+
+def _adapters(table: QuoteTable, adapters: Optional[Sequence[ExchangeAdapter]]) -> List[ExchangeAdapter]:
+    # Adapters for the table's exchange venues, in table order; on-chain columns have their own source
+    if adapters is None:
+        return get_adapters(v for v in table.venues if v in ADAPTERS)
+    by_name = {a.name: a for a in adapters}
+    return [by_name[v] for v in table.venues if v in by_name]
+
+
+async def _request(c: httpx.AsyncClient, url: str, params: Dict[str, Any], venue: str, endpoint: str,
+                   policy: Optional[RequestPolicy] = None) -> bytes:
+    start = time.perf_counter()
+    try:
+        r = await (policy.get(c, url, params, venue, endpoint) if policy is not None else c.get(url, params=params))
+        r.raise_for_status()
+    except asyncio.CancelledError:
+        # Cut off by the cycle deadline
+        REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error="deadline")
+        raise
+    except CircuitOpen:
+        REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error="circuit_open")
+        raise
+    except Exception as exc:
+        REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error=error_kind(exc))
+        raise
+    REQUEST_SECONDS.observe(time.perf_counter() - start, venue=venue, endpoint=endpoint)
+    rec = recording.active()
+    if rec is not None:
+        rec.rest(venue, endpoint, str(params.get("symbol") or params.get("instId") or ""), r.content)
+    return r.content
+
+
+def _parse(parse: Callable[[bytes], T], body: bytes, venue: str, endpoint: str) -> T:
+    try:
+        with span("parse", venue):
+            return parse(body)
+    except Exception:
+        REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error="parse")
+        raise
+
+
+async def _get_top(
+    c: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    url: str,
+    params: Dict[str, Any],
+    parse: Callable[[bytes], Top],
+    venue: str = "",
+    policy: Optional[RequestPolicy] = None,
+) -> Optional[Top]:
+    # None when the request failed, so the symbol keeps its last quote rather than losing it
+    async with sem:
+        try:
+            return _parse(parse, await _request(c, url, params, venue, "book", policy), venue, "book")
+        except Exception:
+            return None
+
+
+def ob_top(
+    c: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    adapter: ExchangeAdapter,
+    symbol: str,
+    policy: Optional[RequestPolicy] = None,
+) -> Awaitable[Optional[Top]]:
+    url, params = adapter.book_request(symbol)
+    return _get_top(c, sem, url, params, adapter.parse_book, adapter.name, policy)
+
+
+async def _collect(tasks: List["asyncio.Task[Optional[T]]"], deadline: Optional[float]) -> List[Optional[T]]:
+    # Requests still in flight when the cycle deadline hits are cancelled and reported as missing (None)
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return [t.result() if t not in pending else None for t in tasks]
+
+
+def _expire(table: QuoteTable, venue: str, policy: RequestPolicy) -> None:
+    # Quotes a failing venue left behind are kept, aging, for `stale_ttl` seconds and then dropped
+    table.expire(venue, int((time.time() - policy.stale_ttl) * 1000))
+
+
+async def fetch_quotes(
+    table: QuoteTable,
+    concurrency: int = 50,
+    deadline: Optional[float] = None,
+    transport: Optional[Transport] = None,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> None:
+    """Fetches every leg of every symbol in `table` at once and stores their tops in it.
+
+    `concurrency` caps in-flight requests per exchange, `deadline` bounds the whole cycle in seconds.
+    Symbols whose request failed or missed the deadline keep their last quote, and a venue whose
+    circuit breaker is open is not asked at all; see `RequestPolicy.stale_ttl`.
+    """
+    t = transport or get_transport()
+    policy = t.policy
+    venues = [a for a in _adapters(table, adapters) if not policy.breaker(a.name).blocked]
+    tasks: List["asyncio.Task[Optional[Top]]"] = []
+    symbols: List[List[str]] = []
+    for adapter in venues:
+        c = t.async_client(adapter.rest)
+        sem = asyncio.Semaphore(concurrency)
+        symbols.append(table.symbols(adapter.name))
+        tasks.extend(asyncio.ensure_future(ob_top(c, sem, adapter, s, policy)) for s in symbols[-1])
+    tops = await _collect(tasks, deadline)
+
+    start = 0
+    for adapter, names in zip(venues, symbols):
+        got = {s: top for s, top in zip(names, tops[start:start + len(names)]) if top is not None}
+        with span("load", adapter.name):
+            table.load(adapter.name, got, partial=True)
+        start += len(names)
+    for adapter in _adapters(table, adapters):
+        _expire(table, adapter.name, policy)
+
+
+async def _get_tops(
+    c: httpx.AsyncClient,
+    url: str,
+    params: Dict[str, Any],
+    parse: Callable[[bytes], Dict[str, Top]],
+    venue: str = "",
+    policy: Optional[RequestPolicy] = None,
+) -> Optional[Dict[str, Top]]:
+    try:
+        return _parse(parse, await _request(c, url, params, venue, "tickers", policy), venue, "tickers")
+    except Exception:
+        return None
+
+
+async def fetch_quotes_bulk(
+    table: QuoteTable,
+    deadline: Optional[float] = None,
+    transport: Optional[Transport] = None,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> None:
+    """Pulls every symbol's best bid/ask with one request per exchange and joins them onto `table`.
+
+    A venue whose request failed, or whose circuit breaker is open, keeps its last quotes.
+    """
+    t = transport or get_transport()
+    policy = t.policy
+    venues = [a for a in _adapters(table, adapters) if not policy.breaker(a.name).blocked]
+    tasks: List["asyncio.Task[Optional[Dict[str, Top]]]"] = []
+    for adapter in venues:
+        url, params = adapter.tickers_request()
+        tasks.append(asyncio.ensure_future(
+            _get_tops(t.async_client(adapter.rest), url, params, adapter.parse_tickers, adapter.name, policy)))
+    books = await _collect(tasks, deadline)
+
+    for adapter, book in zip(venues, books):
+        if book is not None:
+            with span("load", adapter.name):
+                table.load(adapter.name, book)
+    for adapter in _adapters(table, adapters):
+        _expire(table, adapter.name, policy)
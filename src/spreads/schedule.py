@@ -0,0 +1,450 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+import numpy as np
+
+import recording
+from exchanges.base import ExchangeAdapter
+from exchanges.registry import ADAPTERS, get_adapters
+from metrics import REQUEST_ERRORS, REQUEST_SECONDS, error_kind, span
+from spreads.incremental import SpreadTracker
+from spreads.kernel import QuoteTable, remap
+from transport import Transport, get_transport
+
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Local request budget, corrected by what the venue reports it has counted.
+
+    `observe` lowers the available tokens when the venue saw more usage than we spent locally
+    (other processes on the same IP, restarts); `block` stops all requests after a 429/418.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, cost: float) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+    async def acquire(self, cost: float) -> None:
+        while True:
+            wait = self.delay(cost)
+            if wait <= 0:
+                self.tokens -= cost
+                return
+            await asyncio.sleep(wait)
+
+    def observe(self, remaining: float) -> None:
+        # `remaining` is the venue's view of what is left of our share of the window
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+def plan_rates(
+    desired: np.ndarray,
+    budget: float,
+    sweep_cost: float,
+    symbol_cost: float,
+    floor_hz: float,
+) -> Tuple[float, np.ndarray, float]:
+    """Splits a venue budget (units/s) between bulk sweeps and single-symbol refreshes.
+
+    A sweep refreshes every symbol, so symbol i ends up at max(sweep_hz, sweep_hz + extra_hz[i]).
+    Picks the sweep rate that makes the desired rates cheapest and, if even that is over budget,
+    scales all desired rates down by the same factor. Returns (sweep_hz, extra_hz, scale).
+    """
+    n = len(desired)
+    if n == 0:
+        return floor_hz, desired.copy(), 1.0
+
+    def cheapest(d: np.ndarray) -> Tuple[float, float]:
+        # Candidate sweep rates are the floor and each desired rate above it
+        s = np.sort(np.maximum(d, floor_hz))
+        above = np.cumsum(s[::-1])[::-1]  # sum of s[k:]
+        k = np.arange(n)
+        costs = s * sweep_cost + symbol_cost * (above - s * (n - k))
+        i = int(np.argmin(costs))
+        floor_cost = floor_hz * sweep_cost + symbol_cost * float(np.sum(np.maximum(d - floor_hz, 0.0)))
+        return (floor_hz, floor_cost) if floor_cost <= costs[i] else (float(s[i]), float(costs[i]))
+
+    scale = 1.0
+    sweep, cost = cheapest(desired)
+    if cost > budget:
+        lo, hi = 0.0, 1.0
+        for _ in range(30):
+            mid = (lo + hi) / 2.0
+            if cheapest(desired * mid)[1] <= budget:
+                lo = mid
+            else:
+                hi = mid
+        scale = lo
+        sweep, cost = cheapest(desired * scale)
+    return sweep, np.maximum(desired * scale - sweep, 0.0), scale
+
+
+class AdaptiveScheduler:
+    """REST polling that spends each venue's rate limit where fresh quotes matter most.
+
+    Every `plan_interval` seconds each row gets a priority from how close its |bps| is to the
+    band (`min_bps`, within `band_scale` bps) and how much its spread has moved recently. Rows
+    map to a desired refresh rate between 1/`slow_interval` and 1/`fast_interval`, and `plan_rates`
+    turns that into bulk sweeps (a floor for every symbol) plus single-symbol requests for the
+    hot ones, within `budget` of each venue's limit (`ExchangeAdapter.limits`). Token buckets follow
+    the venue's usage headers and pause on 429/418.
+
+    `on_update` is called after each response that wrote quotes into `table`. `rates()` reports
+    the refresh rate each symbol actually got over the last planning window.
+    """
+
+    def __init__(
+        self,
+        tracker: SpreadTracker,
+        on_update: Optional[Callable[[], None]] = None,
+        transport: Optional[Transport] = None,
+        adapters: Optional[Sequence[ExchangeAdapter]] = None,
+        budget: float = 0.5,
+        slow_interval: float = 30.0,
+        fast_interval: float = 0.5,
+        band_scale: float = 10.0,
+        plan_interval: float = 2.0,
+        concurrency: int = 10,
+    ) -> None:
+        self.tracker = tracker
+        self.table = tracker.table
+        self.on_update = on_update
+        self.transport = transport or get_transport()
+        by_name = {a.name: a for a in adapters or get_adapters(v for v in self.table.venues if v in ADAPTERS)}
+        self.adapters: Dict[str, ExchangeAdapter] = {v: by_name[v] for v in self.table.venues if v in by_name}
+        venues = list(self.adapters)
+        self.budget = budget
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.band_scale = band_scale
+        self.plan_interval = plan_interval
+        self.concurrency = concurrency
+        n = len(self.table)
+        self.buckets: Dict[str, TokenBucket] = {}
+        for venue, adapter in self.adapters.items():
+            lim = adapter.limits
+            rate = lim.limit * budget / lim.window
+            self.buckets[venue] = TokenBucket(rate, capacity=max(rate * 2.0, lim.sweep_cost, lim.symbol_cost))
+        self.sweep_hz: Dict[str, float] = {v: 1.0 / slow_interval for v in venues}
+        self.extra_hz: Dict[str, np.ndarray] = {v: np.zeros(n) for v in venues}
+        self.scale: Dict[str, float] = {v: 1.0 for v in venues}
+        self.throttled: Dict[str, int] = {v: 0 for v in venues}
+        self.errors: Dict[str, int] = {v: 0 for v in venues}
+        self.requests: Dict[str, int] = {v: 0 for v in venues}
+        self._refreshes: Dict[str, np.ndarray] = {v: np.zeros(n) for v in venues}
+        self._actual: Dict[str, np.ndarray] = {v: np.zeros(n) for v in venues}
+        self._next_due: Dict[str, np.ndarray] = {v: np.full(n, np.nan) for v in venues}  # monotonic, NaN: not hot
+        self._window_start = time.monotonic()
+        self._volatility = np.zeros(n)
+        self._last_bps = np.full(n, np.nan)
+        self._backoff: Dict[str, float] = {v: 0.0 for v in venues}
+        self._symbols: Dict[str, List[str]] = self._symbols_by_row(self.table)
+        self._listed: Dict[str, np.ndarray] = self._listed_rows(self.table)
+        self._sem: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._wake: Dict[str, asyncio.Event] = {}
+
+    def _symbols_by_row(self, table: QuoteTable) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        for venue in self.adapters:
+            names = [""] * len(table)
+            for s, row in table.symbol_rows[venue].items():
+                names[row] = s
+            out[venue] = names
+        return out
+
+    def _listed_rows(self, table: QuoteTable) -> Dict[str, np.ndarray]:
+        # With more than two venues a candidate needs only two legs, so some rows are absent on a venue
+        out: Dict[str, np.ndarray] = {}
+        for venue in self.adapters:
+            listed = np.zeros(len(table), dtype=bool)
+            listed[list(table.symbol_rows[venue].values())] = True
+            out[venue] = listed
+        return out
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> None:
+        """Switches to the tracker's new `table`; surviving rows keep their rates and volatility."""
+        self.table = table
+        for venue in self.adapters:
+            self.extra_hz[venue] = remap(self.extra_hz[venue], src, 0.0)
+            self._refreshes[venue] = remap(self._refreshes[venue], src, 0.0)
+            self._actual[venue] = remap(self._actual[venue], src, 0.0)
+            self._next_due[venue] = remap(self._next_due[venue], src)
+        self._volatility = remap(self._volatility, src, 0.0)
+        self._last_bps = remap(self._last_bps, src)
+        self._symbols = self._symbols_by_row(table)
+        self._listed = self._listed_rows(table)
+        # New `extra_hz` arrays make every venue loop rebuild its due list for the new rows
+        for event in self._wake.values():
+            event.set()
+
+    # Planning
+
+    def priorities(self) -> np.ndarray:
+        bps = np.abs(self.tracker.bps)
+        known = ~np.isnan(bps)
+        # Closeness to the band: 1 inside or at the edge, decaying with the distance in bps
+        near = np.zeros(len(bps))
+        if self.tracker.min_bps is not None:
+            gap = np.maximum(self.tracker.min_bps - bps[known], 0.0)
+            near[known] = np.exp(-gap / self.band_scale)
+        elif self.tracker.max_bps is None:
+            near[known] = 1.0
+        else:
+            near[known] = (bps[known] <= self.tracker.max_bps).astype(float)
+        # Recent movement relative to the typical symbol
+        vol = self._volatility
+        typical = float(np.median(vol[vol > 0])) if (vol > 0).any() else 0.0
+        moving = vol / (vol + typical) if typical > 0 else np.zeros(len(vol))
+        score = np.maximum(near, moving)
+        score[~known] = 1.0  # never quoted yet: find out
+        return score
+
+    def _update_volatility(self, dt: float) -> None:
+        bps = self.tracker.bps
+        moved = np.abs(bps - self._last_bps)
+        moved = np.where(np.isnan(moved), 0.0, moved) / max(dt, 1e-6)
+        alpha = min(1.0, dt / 30.0)  # ~30 s memory
+        self._volatility += alpha * (moved - self._volatility)
+        self._last_bps = bps.copy()
+
+    def plan(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed > 0:
+            for venue in self.adapters:
+                self._actual[venue] = self._refreshes[venue] / elapsed
+                self._refreshes[venue][:] = 0.0
+        self._window_start = now
+        self._update_volatility(elapsed)
+        score = self.priorities()
+        slow, fast = 1.0 / self.slow_interval, 1.0 / self.fast_interval
+        desired = slow + (fast - slow) * score ** 2
+        for venue, adapter in self.adapters.items():
+            lim = adapter.limits
+            budget = lim.limit * self.budget / lim.window
+            # Rows the venue does not list get no refreshes there and no share of its budget
+            wanted = np.where(self._listed[venue], desired, 0.0)
+            sweep, extra, scale = plan_rates(wanted, budget, lim.sweep_cost, lim.symbol_cost, floor_hz=slow)
+            self.sweep_hz[venue], self.extra_hz[venue], self.scale[venue] = sweep, extra, scale
+            if venue in self._wake:
+                self._wake[venue].set()
+
+    def rates(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for row, base in enumerate(self.table.bases):
+            out[base] = {
+                venue: {
+                    "target_hz": round(self.sweep_hz[venue] + float(self.extra_hz[venue][row]), 3),
+                    "actual_hz": round(float(self._actual[venue][row]), 3),
+                }
+                for venue in self.adapters
+            }
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for venue in self.adapters:
+            actual = self._actual[venue]
+            out[venue] = {
+                "sweep_hz": round(self.sweep_hz[venue], 3),
+                "hot_symbols": int((self.extra_hz[venue] > 0).sum()),
+                "scale": round(self.scale[venue], 3),
+                "actual_hz_p50": round(float(np.median(actual)), 3) if len(actual) else 0.0,
+                "actual_hz_max": round(float(actual.max()), 3) if len(actual) else 0.0,
+                "requests": self.requests[venue],
+                "throttled": self.throttled[venue],
+                "errors": self.errors[venue],
+            }
+        return out
+
+    # Requests
+
+    def _observe(self, venue: str, r: httpx.Response) -> None:
+        adapter = self.adapters[venue]
+        bucket = self.buckets[venue]
+        remaining = adapter.remaining(r.headers)
+        if remaining is not None:
+            # Our share of what is left: the venue counts the whole limit, we only spend `budget` of it
+            bucket.observe(remaining - adapter.limits.limit * (1.0 - self.budget))
+        if r.status_code in (418, 429):
+            # 418 means the IP is already banned: honour Retry-After, otherwise back off exponentially
+            self.throttled[venue] += 1
+            self._backoff[venue] = min(max(self._backoff[venue] * 2.0, 1.0), 300.0)
+            retry = r.headers.get("retry-after")
+            bucket.block(float(retry) if retry else self._backoff[venue])
+            print(f"[Scheduler] {venue} HTTP {r.status_code}, pausing {bucket.blocked_until - time.monotonic():.1f}s")
+        else:
+            self._backoff[venue] = 0.0
+
+    async def _get(self, venue: str, endpoint: str, url: str, params: Dict[str, Any], cost: float,
+                   parse: Callable[[bytes], T]) -> Optional[T]:
+        # Not hedged: a duplicate would spend the venue's token budget twice. The breaker still applies,
+        # and while it is open the rows keep their last quotes instead of queueing requests.
+        breaker = self.transport.policy.breaker(venue)
+        if not breaker.allow():
+            REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error="circuit_open")
+            return None
+        try:
+            await self.buckets[venue].acquire(cost)
+            async with self._sem[venue]:
+                self.requests[venue] += 1
+                start = time.perf_counter()
+                r = await self.transport.async_client(url).get(url, params=params)
+        except httpx.HTTPError as exc:
+            breaker.record(False)
+            self.errors[venue] += 1
+            REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error=error_kind(exc))
+            return None
+        # 429/418 pause the token bucket already, so only server errors count against the venue here
+        breaker.record(r.status_code < 500)
+        self._observe(venue, r)
+        if r.status_code >= 400:
+            if r.status_code not in (418, 429):
+                self.errors[venue] += 1
+            REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error=f"http_{r.status_code}")
+            return None
+        REQUEST_SECONDS.observe(time.perf_counter() - start, venue=venue, endpoint=endpoint)
+        rec = recording.active()
+        if rec is not None:
+            rec.rest(venue, endpoint, str(params.get("symbol") or params.get("instId") or ""), r.content)
+        try:
+            with span("parse", venue):
+                return parse(r.content)
+        except (ValueError, TypeError, AttributeError, KeyError, IndexError):
+            self.errors[venue] += 1
+            REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error="parse")
+            return None
+
+    async def _sweep(self, venue: str) -> None:
+        adapter = self.adapters[venue]
+        url, params = adapter.tickers_request()
+        tickers = await self._get(venue, "tickers", url, params, adapter.limits.sweep_cost, adapter.parse_tickers)
+        if tickers is None:
+            return
+        rows = self.table.symbol_rows[venue]
+        tops = {s: t for s, t in tickers.items() if s in rows}
+        if not tops:
+            return
+        self.table.load(venue, tops)
+        self._refreshes[venue][[rows[s] for s in tops]] += 1
+        if self.on_update is not None:
+            self.on_update()
+
+    async def _refresh(self, venue: str, row: int) -> None:
+        adapter = self.adapters[venue]
+        symbol = self._symbols[venue][row]
+        if not symbol:
+            return
+        url, params = adapter.book_request(symbol)
+        top = await self._get(venue, "book", url, params, adapter.limits.symbol_cost, adapter.parse_book)
+        if not top:
+            return
+        # Looked up again: the universe may have changed while the request was out
+        row = self.table.set(venue, symbol, top.get("bid"), top.get("ask"), int(time.time() * 1000))
+        if row is None:
+            return
+        self._refreshes[venue][row] += 1
+        if self.on_update is not None:
+            self.on_update()
+
+    # Loop
+
+    async def run(self) -> None:
+        for venue in self.adapters:
+            self._sem[venue] = asyncio.Semaphore(self.concurrency)
+            self._wake[venue] = asyncio.Event()
+            self._tasks.append(asyncio.create_task(self._run_venue(venue)))
+        self.plan()
+        try:
+            while True:
+                await asyncio.sleep(self.plan_interval)
+                self.plan()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_venue(self, venue: str) -> None:
+        # Requests are spawned when due and wait for tokens on their own, so one slow response never delays the plan.
+        # A row (or the sweep) with a request still waiting is skipped, so a long 429 pause does not pile them up.
+        inflight: "set[asyncio.Task[None]]" = set()
+        waiting: "set[int]" = set()
+        due: List[Tuple[float, int]] = []
+        next_sweep = time.monotonic()
+        planned: Optional[np.ndarray] = None
+
+        def spawn(key: int, coro: Any) -> None:
+            if key in waiting:
+                coro.close()
+                return
+            waiting.add(key)
+            task = asyncio.create_task(coro)
+            inflight.add(task)
+            task.add_done_callback(lambda t: (inflight.discard(t), waiting.discard(key)))
+
+        try:
+            while True:
+                now = time.monotonic()
+                extra = self.extra_hz[venue]
+                if extra is not planned:
+                    # New plan: hot rows keep their next due time unless the new rate makes it come sooner,
+                    # rows that just turned hot start at a random phase, rows that cooled down drop out
+                    planned = extra
+                    hot = np.flatnonzero(extra > 0)
+                    period = 1.0 / extra[hot]
+                    at = self._next_due[venue][hot]
+                    fresh = np.isnan(at) | (at > now + period)
+                    at[fresh] = now + np.random.uniform(0, period[fresh])
+                    self._next_due[venue] = np.full(len(extra), np.nan)
+                    self._next_due[venue][hot] = at
+                    due = list(zip(at.tolist(), hot.tolist()))
+                    heapq.heapify(due)
+                if now >= next_sweep:
+                    spawn(-1, self._sweep(venue))
+                    next_sweep = now + 1.0 / self.sweep_hz[venue]
+                while due and due[0][0] <= now:
+                    _, row = heapq.heappop(due)
+                    spawn(row, self._refresh(venue, row))
+                    self._next_due[venue][row] = at_next = now + 1.0 / extra[row]
+                    heapq.heappush(due, (at_next, row))
+                wake_at = min(next_sweep, due[0][0]) if due else next_sweep
+                self._wake[venue].clear()
+                try:
+                    await asyncio.wait_for(self._wake[venue].wait(), timeout=max(0.0, wake_at - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for t in inflight:
+                t.cancel()
+            await asyncio.gather(*inflight, return_exceptions=True)
@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import multiprocessing as mp
+import time
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+import recording
+from exchanges.registry import ADAPTERS, get_adapters
+from spreads.depth import DepthStream
+from spreads.incremental import SpreadTracker
+from spreads.kernel import QuoteTable, _same, remap
+from spreads.rest import fetch_quotes, fetch_quotes_bulk
+from spreads.schedule import AdaptiveScheduler
+from spreads.stream import StreamEngine
+from transport import get_transport
+
+if TYPE_CHECKING:
+    from spreads.engine import EngineConfig
+
+
+# Worker <-> coordinator messages over a duplex pipe:
+#   coordinator: ("legs", epoch, venues, legs) assigns a shard, ("stop",) ends the worker
+#   worker:      ("quotes", epoch, rows, bid, ask, ts, executable, stats) with the rows changed since the last batch
+FLUSH_INTERVAL = 0.05
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of base assets onto `shards` workers.
+
+    Each shard owns `replicas` points on a 64-bit ring and a symbol belongs to the first point
+    after its hash. Adding or dropping a symbol never moves another one, and going from N to N+1
+    shards moves about 1/(N+1) of the symbols instead of nearly all of them as `hash % N` would.
+    """
+
+    def __init__(self, shards: int, replicas: int = 100) -> None:
+        if shards < 1:
+            raise ValueError("a ring needs at least one shard")
+        self.shards = shards
+        points = sorted((_hash(f"shard-{s}#{r}"), s) for s in range(shards) for r in range(replicas))
+        self._points = [p for p, _ in points]
+        self._owners = [s for _, s in points]
+
+    def owner(self, key: str) -> int:
+        i = bisect.bisect(self._points, _hash(key))
+        return self._owners[i % len(self._points)]
+
+    def split(self, keys: Iterable[str]) -> List[List[str]]:
+        out: List[List[str]] = [[] for _ in range(self.shards)]
+        for key in keys:
+            out[self.owner(key)].append(key)
+        return out
+
+
+class ShardWorker:
+    """One worker process's share of the universe: its own transport, quote table and quote source.
+
+    The source is the engine's `SPREADS_MODE` run on the shard only (REST polling, the WebSocket
+    streams or the adaptive scheduler, whose rate budget is split evenly between shards). Every
+    `flush_interval` seconds, and after each polling cycle, the rows whose quotes changed since the
+    last batch are sent to the coordinator; nothing else crosses the process boundary.
+    """
+
+    def __init__(self, shard: int, shards: int, config: "EngineConfig", conn: Connection,
+                 flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.shard = shard
+        self.shards = shards
+        self.config = config
+        self.conn = conn
+        self.flush_interval = flush_interval
+        self.transport = get_transport()
+        self.epoch = -1
+        self.table: Optional[QuoteTable] = None
+        self.stream: Optional[StreamEngine] = None
+        self.scheduler: Optional[AdaptiveScheduler] = None
+        self.tracker: Optional[SpreadTracker] = None
+        self.cycles = 0
+        self.batches = 0
+        self._sent: Tuple[np.ndarray, ...] = ()
+        self._source: Optional["asyncio.Task[None]"] = None
+        self._stopped = asyncio.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.conn.fileno(), self._on_command)
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            await self._stopped.wait()
+        finally:
+            loop.remove_reader(self.conn.fileno())
+            tasks = [t for t in (flusher, self._source) if t is not None]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.transport.aclose()
+
+    def _on_command(self) -> None:
+        try:
+            while self.conn.poll():
+                msg = self.conn.recv()
+                if msg[0] == "legs":
+                    _, epoch, venues, legs = msg
+                    self._assign(epoch, tuple(venues), legs)
+                elif msg[0] == "stop":
+                    self._stopped.set()
+        except (EOFError, OSError):
+            # The coordinator is gone
+            self._stopped.set()
+
+    def _assign(self, epoch: int, venues: Tuple[str, ...], legs: List[Tuple[str, ...]]) -> None:
+        self.epoch = epoch
+        running = self._source is not None and not self._source.done()
+        if running and self.table is not None and self.table.venues == venues:
+            # Same source, new symbols: only the legs that changed are (un)subscribed or polled
+            table, src = self.table.reshape(legs)
+            if self.tracker is not None:
+                self.tracker.retarget(table, src)
+            source = self.stream or self.scheduler
+            if source is not None:
+                source.retarget(table, src)
+            self.table = table
+            self._sent = tuple(remap(sent, src) for sent in self._sent)
+            print(f"[Shard {self.shard}] {len(table)} symbols, {int((src < 0).sum())} added")
+            return
+        if self._source is not None:
+            self._source.cancel()
+        table = QuoteTable(legs, venues)
+        self.table = table
+        self.stream = self.scheduler = self.tracker = None
+        self._sent = ()
+        self._source = asyncio.create_task(self.serve(table))
+        print(f"[Shard {self.shard}] {len(table)} symbols")
+
+    async def serve(self, table: QuoteTable) -> None:
+        # Runs the configured quote source on `table` until cancelled
+        cfg = self.config
+        adapters = get_adapters(table.venues, cfg.rest_urls())
+        if cfg.mode == "book":
+            self.stream = DepthStream(table, notional=cfg.notional, binance_url=cfg.binance_ws, bybit_url=cfg.bybit_ws,
+                                      binance_rest=cfg.binance_rest, transport=self.transport)
+            await self.stream.run()
+        elif cfg.mode == "stream":
+            self.stream = StreamEngine(table, binance_url=cfg.binance_ws, bybit_url=cfg.bybit_ws)
+            await self.stream.run()
+        elif cfg.mode == "adaptive":
+            tracker = self.tracker = SpreadTracker(table, cfg.min_bps, cfg.max_bps)
+            self.scheduler = AdaptiveScheduler(
+                tracker,
+                on_update=tracker.evaluate,
+                transport=self.transport,
+                adapters=adapters,
+                budget=cfg.rate_budget / self.shards,
+                slow_interval=cfg.interval,
+                fast_interval=cfg.fast_interval,
+                concurrency=cfg.concurrency,
+            )
+            await self.scheduler.run()
+        else:
+            while True:
+                # `self.table`, not `table`: a new assignment swaps it in between cycles
+                if cfg.mode == "depth":
+                    await fetch_quotes(self.table, cfg.concurrency, cfg.deadline, self.transport, adapters)
+                else:
+                    await fetch_quotes_bulk(self.table, cfg.deadline, self.transport, adapters)
+                rec = recording.active()
+                if rec is not None:
+                    rec.mark(recording.CYCLE)
+                self.cycles += 1
+                self.flush()
+                await asyncio.sleep(cfg.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"symbols": len(self.table) if self.table is not None else 0, "batches": self.batches}
+        if self.stream is not None:
+            out["messages"] = sum(self.stream.messages.values())
+            out["reconnects"] = sum(self.stream.reconnects.values())
+        elif self.scheduler is not None:
+            out["requests"] = sum(self.scheduler.requests.values())
+            out["throttled"] = sum(self.scheduler.throttled.values())
+        else:
+            out["cycles"] = self.cycles
+        return out
+
+    def flush(self) -> None:
+        table = self.table
+        if table is None:
+            return
+        executable = self.stream.executable if isinstance(self.stream, DepthStream) else np.empty((len(table), 0))
+        columns = (table.bid, table.ask, executable)
+        if not self._sent or self._sent[-1].shape != executable.shape:
+            # First batch, or the book source came up after a flush without it
+            self._sent = tuple(np.full_like(c, np.nan) for c in columns)
+        changed = np.zeros(len(table), dtype=bool)
+        for now, sent in zip(columns, self._sent):
+            changed |= ~_same(now, sent).all(axis=1)
+        rows = np.flatnonzero(changed)
+        if not len(rows):
+            return
+        for now, sent in zip(columns, self._sent):
+            sent[rows] = now[rows]
+        self.batches += 1
+        self.conn.send(("quotes", self.epoch, rows, table.bid[rows], table.ask[rows], table.ts[rows],
+                        executable[rows], self.stats()))
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+
+def run_worker(shard: int, shards: int, config: "EngineConfig", conn: Connection, flush_interval: float,
+               worker: Type[ShardWorker] = ShardWorker) -> None:
+    # Process entry point; each worker has its own event loop, connections and GIL
+    recording.start_from_env(f"shard{shard}")
+    try:
+        asyncio.run(worker(shard, shards, config, conn, flush_interval).run())
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardPool:
+    """Splits `table` across `workers` processes and merges the quotes they send back into it.
+
+    Symbols go to workers by `HashRing`, so `assign` with a changed universe only re-sends the
+    shards whose symbols changed. Batches are applied straight into the table's arrays and flag
+    the rows dirty, then `on_update` runs once per drained pipe, so band filtering and ranking
+    stay with the caller's `SpreadTracker` in this process. A worker that dies is restarted.
+    """
+
+    def __init__(
+        self,
+        table: QuoteTable,
+        config: "EngineConfig",
+        workers: int,
+        on_update: Optional[Callable[[], None]] = None,
+        flush_interval: float = FLUSH_INTERVAL,
+        worker: Type[ShardWorker] = ShardWorker,
+    ) -> None:
+        self.table = table
+        self.config = config
+        self.workers = workers
+        self.on_update = on_update
+        self.flush_interval = flush_interval
+        self.worker = worker
+        self.ring = HashRing(workers)
+        self.shards: List[List[Tuple[str, ...]]] = [[] for _ in range(workers)]  # legs last sent to each worker
+        self.stats: List[Dict[str, Any]] = [{} for _ in range(workers)]
+        self.updates = [0] * workers
+        self.restarts = [0] * workers
+        self.executable = np.full((len(table), 2), np.nan)
+        # Exchange columns the workers quote; on-chain ones are filled by a source in this process
+        self._cols = np.array([i for i, v in enumerate(table.venues) if v in ADAPTERS], dtype=np.int64)
+        self._rows: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in range(workers)]
+        self._epochs = [0] * workers
+        self._procs: List[Optional[Any]] = [None] * workers
+        self._conns: List[Optional[Connection]] = [None] * workers
+        self._ctx = mp.get_context("spawn")
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> None:
+        """Switches to `table` from `QuoteTable.reshape`; only shards whose legs changed hear of it."""
+        self.executable = remap(self.executable, src)
+        self.table = table
+        if any(conn is not None for conn in self._conns):
+            self.assign(table)
+
+    def assign(self, table: QuoteTable) -> int:
+        """Points the pool at `table` and re-sends the shards whose legs changed; returns how many did.
+
+        Legs are compared, not just bases: a rescan can keep a base but add or drop one of its venue
+        legs (volume crossing the threshold) or rename a raw symbol, and the worker must hear of it.
+        """
+        if table is not self.table:
+            self.table = table
+            self.executable = np.full((len(table), 2), np.nan)
+        sent = 0
+        for shard, bases in enumerate(self.ring.split(table.bases)):
+            self._rows[shard] = np.array([table.rows[b] for b in bases], dtype=np.int64)
+            legs = [table.legs[row] for row in self._rows[shard]]
+            if legs != self.shards[shard]:
+                self.shards[shard] = legs
+                self._send_legs(shard)
+                sent += 1
+        return sent
+
+    def _send_legs(self, shard: int) -> None:
+        # A new epoch makes the coordinator drop batches still in flight for the old assignment
+        self._epochs[shard] += 1
+        conn = self._conns[shard]
+        if conn is not None:
+            cols = self._cols.tolist()
+            venues = tuple(self.table.venues[c] for c in cols)
+            legs = [(leg[0], *(leg[1 + c] for c in cols)) for leg in (self.table.legs[row] for row in self._rows[shard])]
+            conn.send(("legs", self._epochs[shard], venues, legs))
+
+    def _start(self, shard: int) -> None:
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=run_worker,
+            args=(shard, self.workers, self.config, child, self.flush_interval, self.worker),
+            name=f"spread-shard-{shard}",
+            daemon=True,
+        )
+        proc.start()
+        child.close()
+        self._procs[shard], self._conns[shard] = proc, parent
+        asyncio.get_running_loop().add_reader(parent.fileno(), self._drain, shard)
+
+    def _drop(self, shard: int) -> None:
+        conn = self._conns[shard]
+        if conn is None:
+            return
+        asyncio.get_running_loop().remove_reader(conn.fileno())
+        conn.close()
+        self._conns[shard] = None
+
+    def _drain(self, shard: int) -> None:
+        conn = self._conns[shard]
+        if conn is None:
+            return
+        table = self.table
+        applied = 0
+        try:
+            while conn.poll():
+                _, epoch, rows, bid, ask, ts, executable, stats = conn.recv()
+                self.stats[shard] = stats
+                if epoch != self._epochs[shard]:
+                    continue
+                rows = self._rows[shard][rows]
+                at = np.ix_(rows, self._cols)
+                table.bid[at] = bid
+                table.ask[at] = ask
+                table.ts[at] = ts
+                table.dirty[rows] = True
+                if executable.shape[1]:
+                    self.executable[rows] = executable
+                applied += len(rows)
+        except (EOFError, OSError):
+            # Worker exited; the supervisor restarts it
+            self._drop(shard)
+        self.updates[shard] += applied
+        if applied and self.on_update is not None:
+            self.on_update()
+
+    async def run(self) -> None:
+        for shard in range(self.workers):
+            self._start(shard)
+        self.shards = [[] for _ in range(self.workers)]
+        self.assign(self.table)
+        try:
+            while True:
+                await asyncio.sleep(1.0)
+                for shard, proc in enumerate(self._procs):
+                    if proc is not None and not proc.is_alive():
+                        print(f"[Shards] worker {shard} exited with {proc.exitcode}, restarting")
+                        self._drop(shard)
+                        self.restarts[shard] += 1
+                        self._start(shard)
+                        self._send_legs(shard)
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        for shard, conn in enumerate(self._conns):
+            if conn is not None:
+                try:
+                    conn.send(("stop",))
+                except OSError:
+                    pass
+                self._drop(shard)
+        deadline = time.monotonic() + 2.0
+        for proc in self._procs:
+            if proc is None:
+                continue
+            while proc.is_alive() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            if proc.is_alive():
+                proc.terminate()
+            proc.join(1.0)
+        self._procs = [None] * self.workers
+
+    def summary(self) -> List[Dict[str, Any]]:
+        # Per worker: symbols owned, rows merged, restarts and the worker's own counters
+        return [
+            {**self.stats[s], "symbols": len(self.shards[s]), "updates": self.updates[s], "restarts": self.restarts[s]}
+            for s in range(self.workers)
+        ]
+
+
+def moved(before: Sequence[List[str]], after: Sequence[List[str]]) -> int:
+    """Symbols whose shard differs between two splits of the same universe."""
+    owner = {key: s for s, keys in enumerate(before) for key in keys}
+    return sum(1 for s, keys in enumerate(after) for key in keys if owner.get(key, s) != s)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import mmap
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spreads.kernel import VENUES, QuoteTable, compute
+
+
+# Fixed layout, little-endian:
+#   header (192 B): magic, seq (u8, odd while a write is in progress), published_at (f8),
+#                   capacity (u4), rows (u4), retired (u4), venues (u4), venue names (8 x S16)
+#   then column blocks sized by capacity and venue count, in the order of _columns().
+MAGIC = b"CLSPRD02"
+HEADER_BYTES = 192
+SYMBOL_BYTES = 16
+MAX_VENUES = 8
+_HEADER = np.dtype([
+    ("magic", "S8"),
+    ("seq", "<u8"),
+    ("published_at", "<f8"),
+    ("capacity", "<u4"),
+    ("rows", "<u4"),
+    ("retired", "<u4"),
+    ("venues", "<u4"),
+    ("pad", "V24"),
+    ("venue_names", f"S{SYMBOL_BYTES}", (MAX_VENUES,)),
+])
+
+
+def _columns(capacity: int, venues: int) -> Dict[str, Tuple[np.dtype, Tuple[int, ...]]]:
+    return {
+        "base": (np.dtype(f"S{SYMBOL_BYTES}"), (capacity,)),
+        "bid": (np.dtype("<f8"), (capacity, venues)),
+        "ask": (np.dtype("<f8"), (capacity, venues)),
+        "quote_ts": (np.dtype("<i8"), (capacity, venues)),
+        "mid": (np.dtype("<f8"), (capacity, venues)),
+        "spread_abs": (np.dtype("<f8"), (capacity,)),
+        "spread_bps": (np.dtype("<f8"), (capacity,)),
+        "in_band": (np.dtype("u1"), (capacity,)),
+        # Best buy/sell venue index (-1 if none) and its bps
+        "buy": (np.dtype("i1"), (capacity,)),
+        "sell": (np.dtype("i1"), (capacity,)),
+        "best_bps": (np.dtype("<f8"), (capacity,)),
+    }
+
+
+def _size(capacity: int, venues: int) -> int:
+    return HEADER_BYTES + sum(dt.itemsize * int(np.prod(shape)) for dt, shape in _columns(capacity, venues).values())
+
+
+def _map(buf: mmap.mmap, capacity: int, venues: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    header = np.ndarray((), dtype=_HEADER, buffer=buf, offset=0)
+    arrays: Dict[str, np.ndarray] = {}
+    offset = HEADER_BYTES
+    for name, (dt, shape) in _columns(capacity, venues).items():
+        arrays[name] = np.ndarray(shape, dtype=dt, buffer=buf, offset=offset)
+        offset += dt.itemsize * int(np.prod(shape))
+    return header, arrays
+
+
+class SnapshotWriter:
+    """Publishes the quote and spread table into a memory-mapped file guarded by a seqlock.
+
+    Use a path on /dev/shm to keep it in RAM. A table larger than the segment makes the writer
+    retire the old file and atomically replace it with a bigger one; so does a change of venues.
+    """
+
+    def __init__(self, path: str, capacity: int = 1024) -> None:
+        self.path = path
+        self.capacity = 0
+        self.venues: Tuple[str, ...] = ()
+        self._buf: Optional[mmap.mmap] = None
+        self._bases: Optional[list] = None
+        self._create(capacity, VENUES)
+
+    def _create(self, capacity: int, venues: Sequence[str]) -> None:
+        if len(venues) > MAX_VENUES:
+            raise ValueError(f"at most {MAX_VENUES} venues fit the snapshot header")
+        size = _size(capacity, len(venues))
+        tmp = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+        with open(tmp, "r+b") as f:
+            buf = mmap.mmap(f.fileno(), size)
+        header, arrays = _map(buf, capacity, len(venues))
+        header["magic"] = MAGIC
+        header["capacity"] = capacity
+        header["venues"] = len(venues)
+        header["venue_names"][: len(venues)] = [v.encode()[:SYMBOL_BYTES] for v in venues]
+        os.replace(tmp, self.path)
+        if self._buf is not None:
+            # The old mapping is released once nothing references it
+            self._header["retired"] = 1
+        self._buf, self._header, self._arrays = buf, header, arrays
+        self._bases = None
+        self.capacity = capacity
+        self.venues = tuple(venues)
+
+    def publish(self, table: QuoteTable, spread_bps: np.ndarray, in_band: np.ndarray) -> None:
+        n = len(table)
+        if n > self.capacity or table.venues != self.venues:
+            self._create(max(n, 2 * self.capacity) if n > self.capacity else self.capacity, table.venues)
+        frame = compute(table)
+        a = self._arrays
+        self._header["seq"] += 1  # odd: readers retry
+        if self._bases is not table.bases:
+            # Symbol names only change with the candidate universe
+            a["base"][:n] = [b.encode()[:SYMBOL_BYTES] for b in table.bases]
+            self._bases = table.bases
+        a["bid"][:n] = table.bid
+        a["ask"][:n] = table.ask
+        a["quote_ts"][:n] = table.ts
+        a["mid"][:n] = frame.mid
+        a["spread_abs"][:n] = frame.spread_abs
+        a["spread_bps"][:n] = spread_bps
+        a["in_band"][:n] = in_band
+        a["buy"][:n] = frame.buy
+        a["sell"][:n] = frame.sell
+        a["best_bps"][:n] = frame.best_bps
+        self._header["rows"] = n
+        self._header["published_at"] = time.time()
+        self._header["seq"] += 1  # even: consistent again
+
+    def close(self) -> None:
+        _release(self)
+
+
+def _release(owner: object) -> None:
+    buf = owner._buf  # type: ignore[attr-defined]
+    owner._buf = owner._header = owner._arrays = None  # type: ignore[attr-defined]
+    if buf is not None:
+        try:
+            buf.close()
+        except BufferError:
+            pass  # callers still hold views; the mapping goes away with them
+
+
+@dataclass
+class Snapshot:
+    seq: int
+    published_at: float
+    arrays: Dict[str, np.ndarray]
+    venues: Tuple[str, ...] = VENUES
+
+    @property
+    def bases(self) -> list:
+        return [b.decode() for b in self.arrays["base"]]
+
+
+class SnapshotReader:
+    """Maps a published segment straight into NumPy arrays.
+
+    `views()` gives zero-copy arrays plus the sequence number to validate with `unchanged(seq)`
+    after reading; `snapshot()` does that loop and returns a consistent copy.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._buf: Optional[mmap.mmap] = None
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.ndarray((), dtype=_HEADER, buffer=self._buf, offset=0)
+        if bytes(header["magic"]) != MAGIC:
+            raise ValueError(f"{self.path} is not a spread snapshot")
+        self._header, self._arrays = _map(self._buf, int(header["capacity"]), int(header["venues"]))
+        self.venues = tuple(v.decode() for v in header["venue_names"][: int(header["venues"])])
+
+    def views(self) -> Tuple[int, Dict[str, np.ndarray]]:
+        if self._header["retired"]:
+            self._open()
+        while True:
+            seq = int(self._header["seq"])
+            if seq % 2 == 0:
+                break
+            time.sleep(0)
+        n = int(self._header["rows"])
+        return seq, {name: arr[:n] for name, arr in self._arrays.items()}
+
+    def unchanged(self, seq: int) -> bool:
+        return int(self._header["seq"]) == seq and not self._header["retired"]
+
+    def snapshot(self) -> Snapshot:
+        while True:
+            seq, views = self.views()
+            published_at = float(self._header["published_at"])
+            arrays = {name: arr.copy() for name, arr in views.items()}
+            if self.unchanged(seq):
+                return Snapshot(seq=seq, published_at=published_at, arrays=arrays, venues=self.venues)
+
+    def close(self) -> None:
+        _release(self)
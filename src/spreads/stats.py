@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spreads.kernel import remap
+
+
+# Windows as "<number><s|m|h>", e.g. SPREADS_STATS_WINDOWS=1m,15m,1h
+DEFAULT_WINDOWS = "1m,15m,1h"
+BUCKETS = 60
+# Fewer samples than this in a window and its stddev / z-score are NaN
+MIN_SAMPLES = 10
+
+_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_windows(raw: Optional[str]) -> Dict[str, float]:
+    """{"1m": 60.0, ...} from a comma-separated list; empty for None or ""."""
+    out: Dict[str, float] = {}
+    for name in (raw or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        m = re.fullmatch(r"(\d+(?:\.\d+)?)([smh])", name)
+        if m is None:
+            raise ValueError(f"bad stats window {name!r}, expected e.g. 30s, 15m or 1h")
+        out[name] = float(m.group(1)) * _UNITS[m.group(2)]
+    return out
+
+
+class RollingWindow:
+    """Mean, stddev, min, max and EWMA of every row's samples over the last `length` seconds.
+
+    The window is a ring of `buckets` time slots, each holding per-row count, sum, sum of squares,
+    min and max in (buckets, rows) arrays, plus running totals over the ring. A sample is added
+    to its slot and the totals in O(1) per row; when time moves into a new slot the expiring one
+    is subtracted from the totals and cleared. Memory is fixed by rows x buckets, and the window
+    slides in steps of `length / buckets`. Totals are re-summed from the slots once per lap so
+    the running subtraction cannot drift.
+
+    The EWMA has a time constant of `length` and weighs each sample by the time since the row's
+    previous one, so it does not depend on how often rows are sampled.
+    """
+
+    def __init__(self, rows: int, length: float, buckets: int = BUCKETS) -> None:
+        self.length = length
+        self.buckets = buckets
+        self.step = length / buckets
+        self.count = np.zeros((buckets, rows), dtype=np.int64)
+        self.sum = np.zeros((buckets, rows))
+        self.sumsq = np.zeros((buckets, rows))
+        self.min = np.full((buckets, rows), np.inf)
+        self.max = np.full((buckets, rows), -np.inf)
+        self.n = np.zeros(rows, dtype=np.int64)
+        self.total = np.zeros(rows)
+        self.total_sq = np.zeros(rows)
+        self.ewma = np.full(rows, np.nan)
+        self.last_ts = np.full(rows, np.nan)
+        self._slot: Optional[int] = None  # absolute slot number of the newest samples
+
+    def add(self, values: np.ndarray, now: float, rows: Optional[np.ndarray] = None) -> None:
+        # `rows` must be unique; NaN values (rows without a spread) are skipped
+        self._advance(now)
+        if rows is None:
+            rows = np.arange(len(self.n))
+        ok = ~np.isnan(values)
+        rows, values = rows[ok], values[ok]
+        if not len(rows):
+            return
+        b = self._slot % self.buckets
+        self.count[b, rows] += 1
+        self.sum[b, rows] += values
+        self.sumsq[b, rows] += values * values
+        self.min[b, rows] = np.minimum(self.min[b, rows], values)
+        self.max[b, rows] = np.maximum(self.max[b, rows], values)
+        self.n[rows] += 1
+        self.total[rows] += values
+        self.total_sq[rows] += values * values
+
+        prev = self.ewma[rows]
+        dt = now - self.last_ts[rows]
+        alpha = np.where(np.isnan(prev), 1.0, -np.expm1(-np.maximum(dt, 0.0) / self.length))
+        self.ewma[rows] = np.where(np.isnan(prev), values, prev + alpha * (values - prev))
+        self.last_ts[rows] = now
+
+    def _advance(self, now: float) -> None:
+        slot = int(now // self.step)
+        if self._slot is None:
+            self._slot = slot
+            return
+        if slot <= self._slot:
+            return
+        for s in range(self._slot + 1, min(slot, self._slot + self.buckets) + 1):
+            b = s % self.buckets
+            self.n -= self.count[b]
+            self.total -= self.sum[b]
+            self.total_sq -= self.sumsq[b]
+            self.count[b] = 0
+            self.sum[b] = 0.0
+            self.sumsq[b] = 0.0
+            self.min[b] = np.inf
+            self.max[b] = -np.inf
+            if b == 0:
+                self.total = self.sum.sum(axis=0)
+                self.total_sq = self.sumsq.sum(axis=0)
+        self._slot = slot
+
+    def mean(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        n, total = (self.n, self.total) if rows is None else (self.n[rows], self.total[rows])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(n > 0, total / n, np.nan)
+
+    def std(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        n, total, sq = (self.n, self.total, self.total_sq) if rows is None else (
+            self.n[rows], self.total[rows], self.total_sq[rows])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (sq - total * total / n) / (n - 1)
+        return np.where(n >= MIN_SAMPLES, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def zscore(self, values: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        std = self.std(rows)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(std > 0, (values - self.mean(rows)) / std, np.nan)
+
+    def extremes(self, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # O(buckets) per row, for reads; adds never scan the ring
+        lo = self.min if rows is None else self.min[:, rows]
+        hi = self.max if rows is None else self.max[:, rows]
+        lo, hi = lo.min(axis=0), hi.max(axis=0)
+        return np.where(np.isfinite(lo), lo, np.nan), np.where(np.isfinite(hi), hi, np.nan)
+
+    def remap(self, src: np.ndarray) -> None:
+        # Rows moved by `QuoteTable.reshape`; added rows start empty
+        for name, fill in (("count", 0), ("sum", 0.0), ("sumsq", 0.0), ("min", np.inf), ("max", -np.inf)):
+            setattr(self, name, remap(getattr(self, name).T, src, fill).T.copy())
+        self.n = remap(self.n, src, 0)
+        self.total = remap(self.total, src, 0.0)
+        self.total_sq = remap(self.total_sq, src, 0.0)
+        self.ewma = remap(self.ewma, src)
+        self.last_ts = remap(self.last_ts, src)
+
+
+class RollingStats:
+    """One `RollingWindow` per configured window over the same rows, sampled together.
+
+    `z_window` names the window `zscore` uses for band filtering and ranking.
+    """
+
+    def __init__(self, rows: int, windows: Dict[str, float], z_window: Optional[str] = None,
+                 buckets: int = BUCKETS) -> None:
+        if not windows:
+            raise ValueError("at least one stats window is needed")
+        self.windows: Dict[str, RollingWindow] = {name: RollingWindow(rows, length, buckets)
+                                                  for name, length in windows.items()}
+        self.z_window = z_window or next(iter(windows))
+        if self.z_window not in self.windows:
+            raise ValueError(f"z-score window {self.z_window!r} is not one of {', '.join(windows)}")
+        self.samples = 0
+
+    def sample(self, values: np.ndarray, now: float, rows: Optional[np.ndarray] = None) -> None:
+        for w in self.windows.values():
+            w.add(values, now, rows)
+        self.samples += 1
+
+    def zscore(self, values: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.windows[self.z_window].zscore(values, rows)
+
+    def retarget(self, src: np.ndarray) -> None:
+        for w in self.windows.values():
+            w.remap(src)
+
+    def describe(self, rows: Sequence[int], values: np.ndarray) -> List[Dict[str, Dict[str, Optional[float]]]]:
+        """Per row, {window: {count, mean, std, z, ewma, min, max}} for the current `values`."""
+        idx = np.asarray(rows, dtype=np.int64)
+        per_window = {}
+        for name, w in self.windows.items():
+            lo, hi = w.extremes(idx)
+            per_window[name] = {
+                "count": w.n[idx].astype(float),
+                "mean": w.mean(idx),
+                "std": w.std(idx),
+                "z": w.zscore(values, idx),
+                "ewma": w.ewma[idx],
+                "min": lo,
+                "max": hi,
+            }
+        return [
+            {name: {k: (None if np.isnan(v[i]) else int(v[i]) if k == "count" else round(float(v[i]), 3))
+                    for k, v in cols.items()}
+             for name, cols in per_window.items()}
+            for i in range(len(idx))
+        ]
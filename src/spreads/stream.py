@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import msgspec
+import numpy as np
+import websockets
+
+import recording
+from exchanges import schemas
+from exchanges.schemas import Level
+from spreads.kernel import VENUES, QuoteTable
+
+
+BINANCE_WS_URL = "wss://fstream.binance.com/ws"
+BYBIT_WS_URL = "wss://stream.bybit.com/v5/public/linear"
+
+# Binance futures allows 200 streams per connection, Bybit has no hard cap but we keep books spread out
+BINANCE_MAX_STREAMS = 200
+BYBIT_MAX_TOPICS = 200
+BINANCE_PARAMS_PER_REQUEST = 50
+BYBIT_ARGS_PER_REQUEST = 10
+BYBIT_PING_INTERVAL = 20.0
+# Seconds to wait for the venue's close frame on shutdown; the library default of 10 s per step
+# holds a SIGTERM up for half a minute when a busy socket never answers
+CLOSE_TIMEOUT = 2.0
+
+# (symbol, bid, ask, exchange timestamp in ms); a side is None when unchanged, NaN when removed
+Tick = Tuple[str, Optional[float], Optional[float], Optional[int]]
+
+
+def _level_price(levels: List[Level]) -> Optional[float]:
+    # A zero size on a level-1 delta means the level is gone until the next update: NaN clears
+    # the leg, where None (side absent from the delta) keeps it
+    if not levels:
+        return None
+    price, size = levels[0]
+    return price if size > 0 else math.nan
+
+
+def parse_binance_book_ticker(raw: Any) -> Optional[Tick]:
+    try:
+        msg = schemas.binance_book_ticker_event.decode(raw)
+    except msgspec.DecodeError:
+        return None  # valid JSON of another shape (ValidationError), or not JSON at all
+    if msg.e != "bookTicker":
+        return None
+    return msg.s, msg.b, msg.a, msg.T or msg.E
+
+
+def parse_bybit_orderbook(raw: Any) -> Optional[Tick]:
+    try:
+        msg = schemas.bybit_stream_message.decode(raw)
+    except msgspec.DecodeError:
+        return None
+    if not msg.topic.startswith("orderbook.") or msg.data is None:
+        return None
+    data = msg.data
+    return data.s, _level_price(data.b), _level_price(data.a), msg.ts
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class _Connection:
+    # One WebSocket's share of a venue; `symbols` is what it (re)subscribes on connect
+    def __init__(self, venue: str, symbols: List[str]) -> None:
+        self.venue = venue
+        self.symbols = symbols
+        self.ws: Any = None
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class StreamEngine:
+    """Keeps WebSocket top-of-book subscriptions open and writes every leg update into `table`.
+
+    `on_update` is called with the table row right after each update.
+
+    Symbols are split across connections so no connection exceeds the venue stream limit;
+    a dropped connection is reopened with backoff and its symbols resubscribed. `retarget`
+    moves the engine onto a new universe by unsubscribing and subscribing only the symbols that
+    changed, on the connections already open where they have room.
+    """
+
+    def __init__(
+        self,
+        table: QuoteTable,
+        on_update: Optional[Callable[[int], None]] = None,
+        binance_url: str = BINANCE_WS_URL,
+        bybit_url: str = BYBIT_WS_URL,
+        binance_max_streams: int = BINANCE_MAX_STREAMS,
+        bybit_max_topics: int = BYBIT_MAX_TOPICS,
+    ) -> None:
+        self.table = table
+        self.on_update = on_update
+        self.urls = {"binance": binance_url, "bybit": bybit_url}
+        self.limits = {"binance": binance_max_streams, "bybit": bybit_max_topics}
+        self.reconnects: Dict[str, int] = {v: 0 for v in VENUES}
+        self.messages: Dict[str, int] = {v: 0 for v in VENUES}
+        self._conns: List[_Connection] = []
+        self._background: "set[asyncio.Task[None]]" = set()
+        self._running = False
+
+    async def run(self) -> None:
+        self._running = True
+        for venue in VENUES:
+            self._open(venue, self.table.symbols(venue))
+        try:
+            # Connections come and go with `retarget`, so this waits for cancellation, not for them
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        self._running = False
+        tasks = [c.task for c in self._conns if c.task is not None] + list(self._background)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._conns = []
+
+    def retarget(self, table: QuoteTable, src: np.ndarray) -> None:
+        """Switches to `table` (from `QuoteTable.reshape`; `src` maps its rows to the old ones)."""
+        old, self.table = self.table, table
+        for venue in VENUES:
+            before, after = old.symbol_rows[venue], table.symbol_rows[venue]
+            self._drop_symbols(venue, [s for s in before if s not in after])
+            self._add_symbols(venue, [s for s in after if s not in before])
+
+    def _open(self, venue: str, symbols: List[str]) -> None:
+        for chunk in _chunks(symbols, self.limits[venue]):
+            conn = _Connection(venue, chunk)
+            conn.task = asyncio.create_task(self._run_connection(conn))
+            self._conns.append(conn)
+
+    def _drop_symbols(self, venue: str, symbols: List[str]) -> None:
+        if not symbols:
+            return
+        gone = set(symbols)
+        for conn in [c for c in self._conns if c.venue == venue]:
+            dropped = [s for s in conn.symbols if s in gone]
+            if not dropped:
+                continue
+            conn.symbols = [s for s in conn.symbols if s not in gone]
+            if not conn.symbols and conn.task is not None:
+                conn.task.cancel()
+                self._conns.remove(conn)
+            elif conn.ws is not None:
+                self._spawn(self._unsubscribe(venue, conn.ws, dropped))
+        self._forget(venue, symbols)
+
+    def _add_symbols(self, venue: str, symbols: List[str]) -> None:
+        if not symbols:
+            return
+        self._prepare(venue, symbols)
+        rest = list(symbols)
+        for conn in [c for c in self._conns if c.venue == venue]:
+            room = self.limits[venue] - len(conn.symbols)
+            if room <= 0 or not rest:
+                continue
+            chunk, rest = rest[:room], rest[room:]
+            conn.symbols = conn.symbols + chunk
+            # A connection that is not up yet subscribes its whole list once it is
+            if conn.ws is not None:
+                self._spawn(self._subscribe(venue, conn.ws, chunk))
+        if rest and self._running:
+            self._open(venue, rest)
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: "asyncio.Task[None]") -> None:
+        # A failed send is not retried: the connection it was for reconnects and resubscribes its list
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            exc = task.exception()
+            print(f"[Stream] request failed: {type(exc).__name__}: {exc}")
+
+    async def _run_connection(self, conn: _Connection) -> None:
+        venue = conn.venue
+        delay = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.urls[venue], max_size=2 ** 22, close_timeout=CLOSE_TIMEOUT) as ws:
+                    conn.ws = ws
+                    try:
+                        await self._subscribe(venue, ws, list(conn.symbols))
+                        delay = 1.0
+                        heartbeat = asyncio.create_task(self._heartbeat(ws)) if venue == "bybit" else None
+                        rec = recording.active()
+                        try:
+                            async for raw in ws:
+                                if rec is not None:
+                                    rec.ws(venue, raw)
+                                self._on_message(venue, raw)
+                        finally:
+                            if heartbeat is not None:
+                                heartbeat.cancel()
+                    finally:
+                        conn.ws = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001 - any failure means reconnect
+                print(f"[Stream] {venue} connection error: {type(exc).__name__}: {exc}")
+            self.reconnects[venue] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2.0, 30.0)
+
+    def _topics(self, venue: str, symbols: List[str]) -> List[str]:
+        if venue == "binance":
+            return [f"{s.lower()}@bookTicker" for s in symbols]
+        return [f"orderbook.1.{s}" for s in symbols]
+
+    def _prepare(self, venue: str, symbols: List[str]) -> None:
+        # Per-symbol state to reset before a subscription starts delivering; none for top of book
+        pass
+
+    def _forget(self, venue: str, symbols: List[str]) -> None:
+        # Per-symbol state to drop once a symbol left the universe
+        pass
+
+    async def _subscribe(self, venue: str, ws: Any, symbols: List[str]) -> None:
+        await self._request(venue, ws, "subscribe", symbols)
+
+    async def _unsubscribe(self, venue: str, ws: Any, symbols: List[str]) -> None:
+        await self._request(venue, ws, "unsubscribe", symbols)
+
+    async def _request(self, venue: str, ws: Any, op: str, symbols: List[str]) -> None:
+        topics = self._topics(venue, symbols)
+        if venue == "binance":
+            for i, chunk in enumerate(_chunks(topics, BINANCE_PARAMS_PER_REQUEST), start=1):
+                await ws.send(json.dumps({"method": op.upper(), "params": chunk, "id": i}))
+        else:
+            for chunk in _chunks(topics, BYBIT_ARGS_PER_REQUEST):
+                await ws.send(json.dumps({"op": op, "args": chunk}))
+
+    async def _heartbeat(self, ws: Any) -> None:
+        # Bybit drops connections without an application-level ping
+        while True:
+            await asyncio.sleep(BYBIT_PING_INTERVAL)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    def _on_message(self, venue: str, raw: Any) -> None:
+        tick = parse_binance_book_ticker(raw) if venue == "binance" else parse_bybit_orderbook(raw)
+        if tick is None:
+            return
+        self.messages[venue] += 1
+        row = self.table.set(venue, *tick)
+        if row is not None and self.on_update is not None:
+            self.on_update(row)
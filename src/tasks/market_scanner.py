@@ -1,150 +1,331 @@
 from __future__ import annotations
 
+import contextlib
 import json
 import os
-from dataclasses import dataclass
-from typing import Dict, List, Set
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
 
 import httpx
+import msgspec
 
+import recording
+from exchanges.base import ExchangeAdapter, Request
+from exchanges.registry import DEFAULT_VENUES, get_adapters, parse_venues, rest_urls
+from metrics import REQUEST_ERRORS, error_kind, gauge, span
+from transport import Transport, get_transport
+
+
+SCAN_SECONDS = gauge("cryptolab_scan_seconds", "Duration of the last market scan")
+SCAN_CANDIDATES = gauge("cryptolab_scan_candidates", "Candidates found by the last market scan")
+SCAN_LAST = gauge("cryptolab_scan_last_timestamp_seconds", "Unix time the last market scan finished")
 
 EXCLUDED_PREFIXES = ("1000",)  # exclude tokens like 1000PEPE
 USDT = "USDT"
 
 
-@dataclass
-class MarketCandidate:
+class MarketCandidate(msgspec.Struct, gc=False):
     symbol: str
-    binance_volume_usd: float
-    bybit_volume_usd: float
-    binance_symbol_raw: str
-    bybit_symbol_raw: str
-
-
-def _httpx_client() -> httpx.Client:
-    return httpx.Client(
-        http2=False,
-        timeout=httpx.Timeout(5.0, read=5.0),
-        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
-        headers={"User-Agent": "CryptoLab/market-scanner"},
-    )
-
-
-def _fetch_binance_perp_usdt_bases(client: httpx.Client) -> Set[str]:
-    # Binance Futures exchange info (USDT perpetuals)
-    url = "https://fapi.binance.com/fapi/v1/exchangeInfo"
-    resp = client.get(url)
-    resp.raise_for_status()
-    data = resp.json()
-    bases: Set[str] = set()
-    for sym in data.get("symbols", []):
-        if sym.get("status") != "TRADING":
-            continue
-        if sym.get("contractType") != "PERPETUAL":
-            continue
-        if sym.get("quoteAsset") != USDT:
-            continue
-        base = sym.get("baseAsset", "")
-        if base.startswith(EXCLUDED_PREFIXES):
-            continue
-        bases.add(base)
-    return bases
-
-
-def _fetch_binance_24h_map(client: httpx.Client) -> Dict[str, float]:
-    # Map e.g. BTCUSDT -> quoteVolume (USD-ish)
-    url = "https://fapi.binance.com/fapi/v1/ticker/24hr"
-    resp = client.get(url)
-    resp.raise_for_status()
-    tickers = resp.json()
-    vol_map: Dict[str, float] = {}
-    for t in tickers:
-        sym = t.get("symbol", "")
-        qv = t.get("quoteVolume")
-        try:
-            vol_map[sym] = float(qv) if qv is not None else 0.0
-        except Exception:
-            vol_map[sym] = 0.0
-    return vol_map
-
-
-def _fetch_bybit_linear_usdt_tickers(client: httpx.Client) -> Dict[str, Dict[str, str]]:
-    # Bybit v5 linear tickers (USDT/USDC). We'll filter to USDT.
-    url = "https://api.bybit.com/v5/market/tickers?category=linear"
-    resp = client.get(url)
-    resp.raise_for_status()
-    data = resp.json()
-    result: Dict[str, Dict[str, str]] = {}
-    for t in data.get("result", {}).get("list", []):
-        symbol = t.get("symbol", "")  # e.g., BTCUSDT
-        if not symbol.endswith(USDT):
-            continue
-        result[symbol] = t
-    return result
-
-
-def _binance_symbol_from_base(base: str) -> str:
-    return f"{base}{USDT}"
-
-
-def _bybit_base_from_symbol(symbol: str) -> str:
-    return symbol[:-len(USDT)] if symbol.endswith(USDT) else symbol
-
-
-def _safe_float(value: object) -> float:
+    legs: Dict[str, str]  # venue -> raw symbol, only venues meeting the volume threshold
+    volumes_usd: Dict[str, float]
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "MarketCandidate":
+        if "legs" in d:
+            return cls(symbol=d["symbol"], legs=dict(d["legs"]), volumes_usd=dict(d.get("volumes_usd", {})))
+        # Files written before venues were pluggable: flat binance_*/bybit_* fields
+        venues = [k[: -len("_symbol_raw")] for k in d if k.endswith("_symbol_raw")]
+        return cls(
+            symbol=d["symbol"],
+            legs={v: d[f"{v}_symbol_raw"] for v in venues},
+            volumes_usd={v: float(d.get(f"{v}_volume_usd", 0.0)) for v in venues},
+        )
+
+
+class CandidateDelta(msgspec.Struct):
+    # `version` counts written deltas; a reader that sees a jump of more than one reloads the full file
+    version: int = 0
+    generated_at: float = 0.0
+    added: List[MarketCandidate] = []
+    removed: List[str] = []
+    updated: List[MarketCandidate] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.updated)
+
+
+class MetadataCache:
+    """On-disk cache for slow-changing responses such as `exchangeInfo`, keyed by URL.
+
+    Within `ttl` seconds the cached value is used without any request. After that the URL is
+    re-requested with `If-None-Match`/`If-Modified-Since` when the last response had an
+    `ETag`/`Last-Modified`, so an unchanged document costs a 304. Only the parsed value is
+    stored, not the raw multi-megabyte body.
+    """
+
+    def __init__(self, path: str = "data/cache/scanner.json", ttl: float = 3600.0) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, client: httpx.Client, request: Request, parse: Callable[[bytes], Any]) -> Any:
+        url, params = request
+        key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry["fetched_at"] < self.ttl:
+            return entry["value"]
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        resp = client.get(url, params=params, headers=headers)
+        if resp.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+        else:
+            resp.raise_for_status()
+            entry = {
+                "value": parse(resp.content),
+                "etag": resp.headers.get("etag"),
+                "last_modified": resp.headers.get("last-modified"),
+                "fetched_at": time.time(),
+            }
+            self.entries[key] = entry
+        self._save()
+        return entry["value"]
+
+    def _save(self) -> None:
+        # The scanner fetches every venue's markets from a thread pool; one save at a time, each
+        # encoding a copy so another thread adding an entry can't change the dict mid-encode
+        with self._lock:
+            _write_json(self.path, dict(self.entries), indent=None)
+
+
+def _write_json(path: str, payload: Any, indent: Optional[int] = 2) -> None:
+    # Write to a temp file and rename so readers never see a half-written file.
+    # msgspec encodes the candidate structs directly, without building dicts first.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = msgspec.json.encode(payload)
+    # A unique temp name in the same directory, so concurrent writers never rename each other's file
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
     try:
-        return float(value)
-    except Exception:
-        return 0.0
-
+        with os.fdopen(fd, "wb") as f:
+            f.write(msgspec.json.format(data, indent=indent) if indent else data)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def _fetch(
+    client: httpx.Client,
+    request: Request,
+    parse: Callable[[bytes], Any],
+    cache: Optional[MetadataCache] = None,
+    venue: str = "",
+    endpoint: str = "",
+) -> Any:
+    # Timed per venue and download, parsing included, as stage `scan_<endpoint>`
+    rec = recording.active()
+    fetched = False
+    if rec is not None:
+        # Bodies are recorded as they are parsed; a cache hit records the cached value instead
+        parse_body = parse
+
+        def parse(body: bytes) -> Any:
+            nonlocal fetched
+            fetched = True
+            rec.rest(venue, endpoint, "", body)
+            return parse_body(body)
 
-def find_common_high_volume_futures(min_volume_usd: float = 300_000.0) -> List[MarketCandidate]:
+    try:
+        with span(f"scan_{endpoint}", venue):
+            if cache is not None:
+                value = cache.get(client, request, parse)
+                if rec is not None and not fetched:
+                    rec.value(venue, endpoint, value)
+                return value
+            url, params = request
+            resp = client.get(url, params=params)
+            resp.raise_for_status()
+            return parse(resp.content)
+    except Exception as exc:
+        REQUEST_ERRORS.inc(venue=venue, endpoint=endpoint, error=error_kind(exc))
+        raise
+
+
+def find_common_high_volume_futures(
+    min_volume_usd: float = 300_000.0,
+    transport: Optional[Transport] = None,
+    cache: Optional[MetadataCache] = None,
+    venues: Sequence[str] = DEFAULT_VENUES,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> List[MarketCandidate]:
+    """USDT perpetuals listed on at least two venues with 24h volume >= `min_volume_usd` on each of them."""
     print("[Scanner] Loading exchanges and markets via HTTP...")
-    client = _httpx_client()
-
-    binance_bases = _fetch_binance_perp_usdt_bases(client)
-    binance_24h = _fetch_binance_24h_map(client)
-
-    bybit_tickers = _fetch_bybit_linear_usdt_tickers(client)
-    bybit_bases: Set[str] = set(_bybit_base_from_symbol(s) for s in bybit_tickers.keys())
-
-    commons: Set[str] = binance_bases & bybit_bases
-
-    candidates: List[MarketCandidate] = []
-    print(f"[Scanner] Common bases found: {len(commons)}. Fetching 24h volumes...")
-    for base in sorted(commons):
-        b_symbol = _binance_symbol_from_base(base)  # BTC -> BTCUSDT
-        y_symbol = f"{base}{USDT}"
-
-        vol_b = _safe_float(binance_24h.get(b_symbol))
-        bybit_rec = bybit_tickers.get(y_symbol, {})
-        vol_y = _safe_float(bybit_rec.get("turnover24h"))  # USD turnover 24h
-
-        if vol_b >= min_volume_usd and vol_y >= min_volume_usd:
-            candidates.append(
-                MarketCandidate(
-                    symbol=f"{base}/{USDT}",
-                    binance_volume_usd=round(vol_b, 2),
-                    bybit_volume_usd=round(vol_y, 2),
-                    binance_symbol_raw=b_symbol,
-                    bybit_symbol_raw=y_symbol,
-                )
+    t = transport or get_transport()
+    adapters = list(adapters or get_adapters(venues))
+
+    # Every download is independent; with a fresh `cache` the market lists cost no request at all
+    with ThreadPoolExecutor(max_workers=2 * len(adapters)) as pool:
+        jobs = [
+            (
+                pool.submit(_fetch, t.client(a.rest), a.markets_request(), a.parse_markets, cache, a.name, "markets"),
+                pool.submit(_fetch, t.client(a.rest), a.volumes_request(), a.parse_volumes, None, a.name, "volumes"),
             )
+            for a in adapters
+        ]
+        listed = [(markets.result(), volumes.result()) for markets, volumes in jobs]
+    return select_candidates([a.name for a in adapters], listed, min_volume_usd)
+
+
+def select_candidates(
+    venues: Sequence[str],
+    listed: Sequence[Tuple[Dict[str, str], Dict[str, float]]],
+    min_volume_usd: float = 300_000.0,
+) -> List[MarketCandidate]:
+    """Candidates from each venue's (base -> raw symbol markets, raw symbol -> 24h volume) pair."""
+    bases = sorted({b for markets, _ in listed for b in markets if not b.startswith(EXCLUDED_PREFIXES)})
+    candidates: List[MarketCandidate] = []
+    print(f"[Scanner] Bases listed across {len(venues)} venues: {len(bases)}. Checking 24h volumes...")
+    for base in bases:
+        legs: Dict[str, str] = {}
+        volumes: Dict[str, float] = {}
+        for venue, (markets, vol_map) in zip(venues, listed):
+            raw = markets.get(base)
+            if raw is None:
+                continue
+            vol = vol_map.get(raw, 0.0)
+            if vol >= min_volume_usd:
+                legs[venue] = raw
+                volumes[venue] = round(vol, 2)
+        if len(legs) >= 2:
+            candidates.append(MarketCandidate(symbol=f"{base}/{USDT}", legs=legs, volumes_usd=volumes))
 
     print(f"[Scanner] Candidates meeting volume threshold: {len(candidates)}")
     return candidates
 
 
 def write_candidates(path: str, candidates: List[MarketCandidate]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    payload = [c.__dict__ for c in candidates]
-    with open(path, "w") as f:
-        json.dump(payload, f, indent=2)
+    _write_json(path, candidates)
     print(f"[Scanner] Wrote {len(candidates)} candidates to {path}")
 
 
+def read_candidates(path: str) -> List[MarketCandidate]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [MarketCandidate.from_dict(c) for c in json.load(f)]
+
+
+def diff_candidates(
+    old: List[MarketCandidate],
+    new: List[MarketCandidate],
+    volume_tolerance: float = 0.1,
+) -> CandidateDelta:
+    """Added and removed symbols, plus kept ones whose legs changed or whose volume on any venue
+    moved by more than `volume_tolerance` (relative), so routine volume drift does not count as
+    a change."""
+    before = {c.symbol: c for c in old}
+    after = {c.symbol: c for c in new}
+
+    def moved(a: float, b: float) -> bool:
+        return abs(b - a) > volume_tolerance * max(abs(a), 1.0)
+
+    updated = [
+        c for s, c in after.items()
+        if s in before and (
+            c.legs != before[s].legs
+            or any(moved(before[s].volumes_usd.get(v, 0.0), vol) for v, vol in c.volumes_usd.items())
+        )
+    ]
+    return CandidateDelta(
+        generated_at=time.time(),
+        added=[c for s, c in after.items() if s not in before],
+        removed=sorted(s for s in before if s not in after),
+        updated=updated,
+    )
+
+
+def delta_path(path: str) -> str:
+    # data/candidates.json -> data/candidates.delta.json
+    root, ext = os.path.splitext(path)
+    return f"{root}.delta{ext or '.json'}"
+
+
+def update_candidates(path: str, candidates: List[MarketCandidate], volume_tolerance: float = 0.1) -> CandidateDelta:
+    """Diffs `candidates` against the file at `path` and, if anything changed, writes the delta to
+    `delta_path(path)` first and then the full list, both atomically. An unchanged universe leaves
+    both files (and their mtimes) alone, so loops watching the file do not reload for nothing."""
+    delta = diff_candidates(read_candidates(path), candidates, volume_tolerance)
+    if not delta:
+        print(f"[Scanner] No changes to {path}")
+        return delta
+    dpath = delta_path(path)
+    previous = 0
+    if os.path.exists(dpath):
+        try:
+            with open(dpath, "r") as f:
+                previous = int(json.load(f).get("version", 0))
+        except (OSError, ValueError):
+            previous = 0
+    delta.version = previous + 1
+    _write_json(dpath, delta)
+    write_candidates(path, candidates)
+    print(f"[Scanner] Delta v{delta.version}: +{len(delta.added)} -{len(delta.removed)} ~{len(delta.updated)}")
+    return delta
+
+
+def scan_universe(
+    path: str = "data/candidates.json",
+    min_volume_usd: float = 300_000.0,
+    cache: Optional[MetadataCache] = None,
+    transport: Optional[Transport] = None,
+    venues: Sequence[str] = DEFAULT_VENUES,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> Tuple[List[MarketCandidate], CandidateDelta]:
+    """`scan` that also returns the full candidate list, for callers that apply it in memory."""
+    start = time.perf_counter()
+    with span("scan"):
+        candidates = find_common_high_volume_futures(
+            min_volume_usd, transport=transport, cache=cache or MetadataCache(), venues=venues, adapters=adapters)
+        rec = recording.active()
+        if rec is not None:
+            rec.mark(recording.SCAN, {"venues": list(venues), "min_volume_usd": min_volume_usd})
+        delta = update_candidates(path, candidates)
+    SCAN_SECONDS.set(round(time.perf_counter() - start, 3))
+    SCAN_CANDIDATES.set(len(candidates))
+    SCAN_LAST.set(round(time.time(), 3))
+    return candidates, delta
+
+
+def scan(
+    path: str = "data/candidates.json",
+    min_volume_usd: float = 300_000.0,
+    cache: Optional[MetadataCache] = None,
+    transport: Optional[Transport] = None,
+    venues: Sequence[str] = DEFAULT_VENUES,
+    adapters: Optional[Sequence[ExchangeAdapter]] = None,
+) -> CandidateDelta:
+    return scan_universe(path, min_volume_usd, cache, transport, venues, adapters)[1]
+
+
 if __name__ == "__main__":
-    cs = find_common_high_volume_futures()
-    write_candidates("data/candidates.json", cs)
+    recording.start_from_env("scanner")
+    scan_venues = parse_venues(os.environ.get("SPREADS_VENUES"))
+    scan(venues=scan_venues, adapters=get_adapters(scan_venues, rest_urls(os.environ)))
 
 
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpcore
+import httpx
+
+from resilience import RequestPolicy
+
+
+BINANCE_FAPI = "https://fapi.binance.com"
+BYBIT_API = "https://api.bybit.com"
+OKX_API = "https://www.okx.com"
+
+# Cheapest endpoint per host, used to open connections before the first real request
+WARM_PATHS = {
+    BINANCE_FAPI: "/fapi/v1/ping",
+    BYBIT_API: "/v5/market/time",
+    OKX_API: "/api/v5/public/time",
+}
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    handshake_ms: float = 0.0
+    queue_wait_ms: float = 0.0
+    dns_lookups: int = 0
+    dns_hits: int = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "handshake_ms_total": round(self.handshake_ms, 1),
+            "handshake_ms_avg": round(self.handshake_ms / self.new_connections, 1) if self.new_connections else 0.0,
+            "queue_wait_ms_avg": round(self.queue_wait_ms / self.requests, 2) if self.requests else 0.0,
+            "dns_lookups": self.dns_lookups,
+            "dns_hits": self.dns_hits,
+        }
+
+
+class DNSCache:
+    """Resolved addresses per (host, port), kept for `ttl` seconds.
+
+    Every address a lookup returned is kept; connects try them in order and the one that last
+    worked moves to the front, so an unreachable first address fails over instead of failing
+    every connect until the entry expires.
+    """
+
+    def __init__(self, ttl: float, stats: Dict[str, PoolStats]) -> None:
+        self.ttl = ttl
+        self._stats = stats
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, host: str, port: int) -> Optional[List[str]]:
+        entry = self._entries.get((host, port))
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._stats.setdefault(host, PoolStats()).dns_hits += 1
+            return entry[1]
+        return None
+
+    def _store(self, host: str, port: int, infos: Any) -> List[str]:
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise httpcore.ConnectError(f"no addresses for {host}")
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic(), addresses)
+        self._stats.setdefault(host, PoolStats()).dns_lookups += 1
+        return addresses
+
+    def prefer(self, host: str, port: int, address: str) -> None:
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[1][0] != address and address in entry[1]:
+                self._entries[(host, port)] = (entry[0], [address] + [a for a in entry[1] if a != address])
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        addresses = self._cached(host, port)
+        if addresses is None:
+            try:
+                infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError as exc:
+                raise httpcore.ConnectError(exc) from exc
+            addresses = self._store(host, port, infos)
+        return addresses
+
+    async def aresolve(self, host: str, port: int) -> List[str]:
+        addresses = self._cached(host, port)
+        if addresses is None:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError as exc:
+                raise httpcore.ConnectError(exc) from exc
+            addresses = self._store(host, port, infos)
+        return addresses
+
+
+# A connect to one address that fails like this moves on to the next address of the host
+CONNECT_ERRORS = (httpcore.ConnectError, httpcore.ConnectTimeout)
+
+
+class _CachingBackend(httpcore.NetworkBackend):
+    # TLS still uses the origin host for SNI and certificate checks, only the TCP connect goes to the cached IP
+    def __init__(self, dns: DNSCache) -> None:
+        self._dns = dns
+        self._inner = httpcore.SyncBackend()
+
+    def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None, local_address: Optional[str] = None,
+                    socket_options: Any = None) -> httpcore.NetworkStream:
+        addresses = self._dns.resolve(host, port)
+        for i, address in enumerate(addresses):
+            try:
+                stream = self._inner.connect_tcp(address, port, timeout, local_address, socket_options)
+            except CONNECT_ERRORS:
+                if i == len(addresses) - 1:
+                    raise
+                continue
+            if i:
+                self._dns.prefer(host, port, address)
+            return stream
+        raise httpcore.ConnectError(f"no addresses for {host}")
+
+    def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                            socket_options: Any = None) -> httpcore.NetworkStream:
+        return self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    def sleep(self, seconds: float) -> None:
+        self._inner.sleep(seconds)
+
+
+class _AsyncCachingBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, dns: DNSCache) -> None:
+        self._dns = dns
+        self._inner = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None,
+                          socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        addresses = await self._dns.aresolve(host, port)
+        for i, address in enumerate(addresses):
+            try:
+                stream = await self._inner.connect_tcp(address, port, timeout, local_address, socket_options)
+            except CONNECT_ERRORS:
+                if i == len(addresses) - 1:
+                    raise
+                continue
+            if i:
+                self._dns.prefer(host, port, address)
+            return stream
+        raise httpcore.ConnectError(f"no addresses for {host}")
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        return await self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+
+def _install_backend(transport: Any, backend: Any) -> None:
+    # httpx has no public hook for the network backend, so swap it on the pool it owns. If a
+    # future httpx/httpcore moves that attribute, keep the default backend rather than set a
+    # field nothing reads.
+    pool = getattr(transport, "_pool", None)
+    if pool is None or not hasattr(pool, "_network_backend"):
+        print(f"[Transport] Cannot install the DNS cache on {type(transport).__name__}: httpcore pool has no "
+              f"_network_backend (httpx {httpx.__version__}, httpcore {httpcore.__version__}); using system DNS")
+        return
+    pool._network_backend = backend
+
+
+class _RequestTrace:
+    """httpcore trace callback for one request: new vs reused connection, handshake and queue wait."""
+
+    def __init__(self, stats: PoolStats, tls: bool) -> None:
+        self.stats = stats
+        # Handshake ends with TLS for https, with the TCP connect otherwise
+        self.handshake_done = "connection.start_tls.complete" if tls else "connection.connect_tcp.complete"
+        self.started = time.perf_counter()
+        self.first_event: Optional[float] = None
+        self.connect_started: Optional[float] = None
+
+    def record(self, name: str) -> None:
+        now = time.perf_counter()
+        if self.first_event is None and name.endswith(("connect_tcp.started", "send_request_headers.started")):
+            self.first_event = now
+            self.stats.requests += 1
+            self.stats.queue_wait_ms += (now - self.started) * 1000.0
+            if name.endswith("send_request_headers.started"):
+                self.stats.reused_connections += 1
+        if name == "connection.connect_tcp.started":
+            self.connect_started = now
+            self.stats.new_connections += 1
+        elif name == self.handshake_done and self.connect_started is not None:
+            self.stats.handshake_ms += (now - self.connect_started) * 1000.0
+
+    def __call__(self, name: str, info: Dict[str, Any]) -> None:
+        self.record(name)
+
+
+class _AsyncRequestTrace(_RequestTrace):
+    async def __call__(self, name: str, info: Dict[str, Any]) -> None:  # type: ignore[override]
+        self.record(name)
+
+
+def _origin(url: str) -> str:
+    u = httpx.URL(url)
+    return f"{u.scheme}://{u.netloc.decode()}"
+
+
+class Transport:
+    """Long-lived HTTP clients shared across the process, one pool per exchange host.
+
+    Sync and async callers get separate pools for the same host but share DNS cache and stats.
+    Async clients are bound to the event loop that first uses them, so keep one loop alive.
+    `policy` holds the hedging and circuit breaker state the spread loop's requests go through.
+    """
+
+    def __init__(
+        self,
+        http2: bool = False,
+        timeout: float = 5.0,
+        max_connections: int = 100,
+        keepalive_expiry: float = 90.0,
+        dns_ttl: float = 300.0,
+        user_agent: str = "CryptoLab",
+        policy: Optional[RequestPolicy] = None,
+    ) -> None:
+        self.http2 = http2
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.user_agent = user_agent
+        self.policy = policy or RequestPolicy()
+        self._stats: Dict[str, PoolStats] = {}
+        self.dns = DNSCache(dns_ttl, self._stats)
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def _kwargs(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "timeout": httpx.Timeout(self.timeout, read=self.timeout),
+            "limits": httpx.Limits(
+                max_keepalive_connections=self.max_connections,
+                max_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "headers": {"User-Agent": self.user_agent},
+        }
+
+    def _host_stats(self, host: str) -> PoolStats:
+        return self._stats.setdefault(host, PoolStats())
+
+    def client(self, url: str) -> httpx.Client:
+        origin = _origin(url)
+        with self._lock:
+            c = self._clients.get(origin)
+            if c is None or c.is_closed:
+                def hook(request: httpx.Request) -> None:
+                    request.extensions["trace"] = _RequestTrace(
+                        self._host_stats(request.url.host), request.url.scheme == "https")
+
+                kwargs = self._kwargs()
+                transport = httpx.HTTPTransport(http2=self.http2, limits=kwargs["limits"])
+                _install_backend(transport, _CachingBackend(self.dns))
+                c = httpx.Client(transport=transport, event_hooks={"request": [hook]}, **kwargs)
+                self._clients[origin] = c
+            return c
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        origin = _origin(url)
+        c = self._async_clients.get(origin)
+        if c is None or c.is_closed:
+            async def hook(request: httpx.Request) -> None:
+                request.extensions["trace"] = _AsyncRequestTrace(
+                    self._host_stats(request.url.host), request.url.scheme == "https")
+
+            kwargs = self._kwargs()
+            transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=kwargs["limits"])
+            _install_backend(transport, _AsyncCachingBackend(self.dns))
+            c = httpx.AsyncClient(transport=transport, event_hooks={"request": [hook]}, **kwargs)
+            self._async_clients[origin] = c
+        return c
+
+    def warm(self, url: str, connections: int = 4) -> None:
+        # Parallel requests force the pool to open `connections` sockets up front
+        path = WARM_PATHS.get(_origin(url), "/")
+        c = self.client(url)
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            list(pool.map(lambda _: _safe_get(c, _origin(url) + path), range(connections)))
+
+    async def awarm(self, url: str, connections: int = 4) -> None:
+        path = WARM_PATHS.get(_origin(url), "/")
+        c = self.async_client(url)
+        await asyncio.gather(*(_asafe_get(c, _origin(url) + path) for _ in range(connections)))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: s.as_dict() for host, s in self._stats.items()}
+
+    def close(self) -> None:
+        for c in self._clients.values():
+            c.close()
+        self._clients = {}
+
+    async def aclose(self) -> None:
+        for c in self._async_clients.values():
+            await c.aclose()
+        self._async_clients = {}
+
+
+def _safe_get(c: httpx.Client, url: str) -> None:
+    try:
+        c.get(url)
+    except httpx.HTTPError:
+        pass
+
+
+async def _asafe_get(c: httpx.AsyncClient, url: str) -> None:
+    try:
+        await c.get(url)
+    except httpx.HTTPError:
+        pass
+
+
+_default: Optional[Transport] = None
+_default_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """Process-wide transport configured from TRANSPORT_* environment variables."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Transport(
+                http2=os.environ.get("TRANSPORT_HTTP2", "0") == "1",
+                timeout=float(os.environ.get("TRANSPORT_TIMEOUT", "5")),
+                keepalive_expiry=float(os.environ.get("TRANSPORT_KEEPALIVE", "90")),
+                dns_ttl=float(os.environ.get("TRANSPORT_DNS_TTL", "300")),
+                policy=RequestPolicy(
+                    hedge=os.environ.get("TRANSPORT_HEDGE", "1") == "1",
+                    hedge_quantile=float(os.environ.get("TRANSPORT_HEDGE_QUANTILE", "0.95")),
+                    hedge_min_ms=float(os.environ.get("TRANSPORT_HEDGE_MIN_MS", "10")),
+                    hedge_ratio=float(os.environ.get("TRANSPORT_HEDGE_RATIO", "0.1")),
+                    breaker_failures=int(os.environ.get("TRANSPORT_BREAKER_FAILURES", "5")),
+                    breaker_cooldown=float(os.environ.get("TRANSPORT_BREAKER_COOLDOWN", "5")),
+                    stale_ttl=float(os.environ.get("TRANSPORT_STALE_TTL", "60")),
+                ),
+            )
+        return _default
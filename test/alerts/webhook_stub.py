@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for a Telegram-style bot API: accepts POSTs with a JSON `text` (and `chat_id`) on any
+# path, prints them, and can be slow, fail or rate-limit to check the alert sinks never hold up the loop.
+#   python test/alerts/webhook_stub.py --port 8799 --delay-ms 3000
+#   ALERTS_SINKS=console,webhook ALERTS_WEBHOOK_URL=http://127.0.0.1:8799/bot123/sendMessage make run-spread
+
+
+class Handler(BaseHTTPRequestHandler):
+    args: argparse.Namespace
+    received = 0
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0") or 0))
+        if self.args.delay_ms:
+            time.sleep(self.args.delay_ms / 1000.0)
+        if random.random() < self.args.throttle_rate:
+            self._send(429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                             "parameters": {"retry_after": 1}})
+            return
+        if random.random() < self.args.fail_rate:
+            self._send(500, {"ok": False, "error_code": 500, "description": "Internal Server Error"})
+            return
+        try:
+            msg = json.loads(body)
+        except ValueError:
+            self._send(400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid JSON"})
+            return
+        type(self).received += 1
+        lines = str(msg.get("text", "")).count("\n") + 1
+        print(f"[Webhook] #{self.received} chat={msg.get('chat_id', '')} {lines} lines\n{msg.get('text', '')}", flush=True)
+        self._send(200, {"ok": True, "result": {"message_id": self.received}})
+
+    def _send(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Time to answer every message")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of messages answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of messages answered with 429")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), type("StubHandler", (Handler,), {"args": args}))
+    print(f"[Webhook] Listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from typing import Dict, List
+
+import httpx
+import websockets
+
+
+# Fan-out load test for the live spread service. Start the mock streams and the API first:
+#   python test/ws/mock_ws_server.py --rate 20
+#   SPREADS_MODE=stream SPREADS_BINANCE_WS=ws://127.0.0.1:8765/ws \
+#     SPREADS_BYBIT_WS=ws://127.0.0.1:8765/v5/public/linear make api
+#   python test/api/load_subscribers.py --clients 500 --slow 50
+
+
+# Only the message header is parsed so the load generator stays cheaper than the server. The hub
+# writes compact msgspec JSON; the optional spaces also match the older json.dumps output.
+HEADER = re.compile(r'"type": ?"(\w+)", ?"version": ?(\d+), ?"published_at": ?([\d.eE+-]+)')
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+
+async def client(url: str, duration: float, delay: float, stats: Dict[str, List[float]]) -> None:
+    # `delay` > 0 makes a slow reader that holds each message before asking for the next one
+    deadline = time.monotonic() + duration
+    messages = rows = 0
+    try:
+        # A slow client keeps a single message buffered so it falls behind the server, not its own queue
+        async with websockets.connect(url, max_size=None, max_queue=1 if delay else 16, open_timeout=30) as ws:
+            while time.monotonic() < deadline:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=max(0.01, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                m = HEADER.search(raw, 0, 200)
+                if m and m.group(1) == "update" and float(m.group(3)):
+                    stats["latency_ms"].append((time.time() - float(m.group(3))) * 1000.0)
+                messages += 1
+                rows += raw.count('"base":')
+                if delay:
+                    await asyncio.sleep(delay)
+    except Exception as exc:  # noqa: BLE001
+        stats["errors"].append(f"{type(exc).__name__}: {exc}")
+    stats["messages"].append(messages)
+    stats["rows"].append(rows)
+
+
+def summary(name: str, stats: Dict[str, List[float]], duration: float) -> Dict[str, float]:
+    lat = stats["latency_ms"]
+    n = max(1, len(stats["messages"]))
+    return {
+        "group": name,
+        "clients": len(stats["messages"]),
+        "errors": len(stats["errors"]),
+        "msgs_per_client_s": round(sum(stats["messages"]) / n / duration, 1),
+        "rows_per_client_s": round(sum(stats["rows"]) / n / duration, 1),
+        "p50_ms": round(percentile(lat, 50), 1),
+        "p95_ms": round(percentile(lat, 95), 1),
+        "p99_ms": round(percentile(lat, 99), 1),
+        "max_ms": round(max(lat), 1) if lat else 0.0,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    url = f"ws://{args.host}:{args.port}/ws/spreads"
+    if args.in_band:
+        url += "?in_band=true"
+    fast: Dict[str, List[float]] = {"latency_ms": [], "messages": [], "rows": [], "errors": []}
+    slow: Dict[str, List[float]] = {"latency_ms": [], "messages": [], "rows": [], "errors": []}
+    tasks = []
+    for i in range(args.clients):
+        slow_client = i < args.slow
+        tasks.append(asyncio.create_task(
+            client(url, args.duration, args.slow_delay if slow_client else 0.0, slow if slow_client else fast)))
+        if args.ramp:
+            # Spread connection setup so handshakes do not all land at once
+            await asyncio.sleep(args.ramp / args.clients)
+    await asyncio.gather(*tasks)
+    for name, stats in (("fast", fast), ("slow", slow)):
+        if stats["messages"]:
+            print(json.dumps(summary(name, stats, args.duration)))
+        for err in stats["errors"][:3]:
+            print(f"[Load] {name} error: {err}")
+    async with httpx.AsyncClient() as c:
+        r = await c.get(f"http://{args.host}:{args.port}/status")
+        print(json.dumps({"server": r.json()}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--clients", type=int, default=200, help="Total WebSocket subscribers")
+    parser.add_argument("--slow", type=int, default=20, help="How many of them read slowly")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="Seconds a slow client waits per message")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds each client stays subscribed")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which clients connect")
+    parser.add_argument("--in-band", action="store_true", help="Subscribe to in-band rows only")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import msgspec
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from exchanges.base import price, volume  # noqa: E402
+from exchanges.binance import BinanceAdapter  # noqa: E402
+from exchanges.bybit import BybitAdapter  # noqa: E402
+from spreads.models import ENCODER, SpreadSample  # noqa: E402
+from spreads.stream import parse_binance_book_ticker, parse_bybit_orderbook  # noqa: E402
+
+
+# Decode time and allocations per payload: the typed msgspec path the adapters and streams use now
+# against the previous `json.loads` + dict walking, on synthetic payloads shaped like the real
+# responses (every field the venue sends, not only the ones we read).
+#   python test/decode/bench_decode.py --symbols 600
+
+
+def _num() -> str:
+    return f"{random.uniform(0.01, 50000):.4f}"
+
+
+def binance_24hr(n: int) -> bytes:
+    return json.dumps([{
+        "symbol": f"S{i}USDT", "priceChange": _num(), "priceChangePercent": "1.23", "weightedAvgPrice": _num(),
+        "lastPrice": _num(), "lastQty": _num(), "openPrice": _num(), "highPrice": _num(), "lowPrice": _num(),
+        "volume": _num(), "quoteVolume": _num(), "openTime": 1700000000000, "closeTime": 1700086400000,
+        "firstId": 1, "lastId": 1000, "count": 999,
+    } for i in range(n)]).encode()
+
+
+def binance_book_ticker(n: int) -> bytes:
+    return json.dumps([{
+        "symbol": f"S{i}USDT", "bidPrice": _num(), "bidQty": _num(), "askPrice": _num(), "askQty": _num(),
+        "time": 1700000000000, "lastUpdateId": 123456789,
+    } for i in range(n)]).encode()
+
+
+def binance_exchange_info(n: int) -> bytes:
+    filters = [{"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000", "tickSize": "0.01"},
+               {"filterType": "LOT_SIZE", "minQty": "0.001", "maxQty": "1000", "stepSize": "0.001"},
+               {"filterType": "MIN_NOTIONAL", "notional": "5"}]
+    return json.dumps({"timezone": "UTC", "serverTime": 1700000000000, "rateLimits": [], "assets": [], "symbols": [{
+        "symbol": f"S{i}USDT", "pair": f"S{i}USDT", "contractType": "PERPETUAL", "deliveryDate": 4133404800000,
+        "onboardDate": 1569398400000, "status": "TRADING", "baseAsset": f"S{i}", "quoteAsset": "USDT",
+        "marginAsset": "USDT", "pricePrecision": 2, "quantityPrecision": 3, "underlyingType": "COIN",
+        "filters": filters, "orderTypes": ["LIMIT", "MARKET", "STOP"], "timeInForce": ["GTC", "IOC", "FOK"],
+    } for i in range(n)]}).encode()
+
+
+def bybit_tickers(n: int) -> bytes:
+    return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": [{
+        "symbol": f"S{i}USDT", "lastPrice": _num(), "indexPrice": _num(), "markPrice": _num(), "prevPrice24h": _num(),
+        "price24hPcnt": "0.01", "highPrice24h": _num(), "lowPrice24h": _num(), "prevPrice1h": _num(),
+        "openInterest": _num(), "openInterestValue": _num(), "turnover24h": _num(), "volume24h": _num(),
+        "fundingRate": "0.0001", "nextFundingTime": "1700000000000", "bid1Price": _num(), "bid1Size": _num(),
+        "ask1Price": _num(), "ask1Size": _num(),
+    } for i in range(n)]}, "time": 1700000000000}).encode()
+
+
+def binance_ws(n: int) -> List[bytes]:
+    return [json.dumps({"e": "bookTicker", "u": 400900217, "s": f"S{i}USDT", "b": _num(), "B": _num(), "a": _num(),
+                        "A": _num(), "T": 1700000000000, "E": 1700000000001}).encode() for i in range(n)]
+
+
+def bybit_ws(n: int) -> List[bytes]:
+    return [json.dumps({"topic": f"orderbook.1.S{i}USDT", "type": "delta", "ts": 1700000000000, "data": {
+        "s": f"S{i}USDT", "b": [[_num(), _num()]], "a": [[_num(), _num()]], "u": 1, "seq": 2}, "cts": 1}).encode()
+        for i in range(n)]
+
+
+# The dict-walking parsers the adapters and streams used before the typed schemas
+
+def legacy_binance_volumes(body: bytes) -> Dict[str, float]:
+    return {t.get("symbol", ""): volume(t.get("quoteVolume")) for t in json.loads(body)}
+
+
+def legacy_binance_tickers(body: bytes) -> Dict[str, Dict[str, Optional[float]]]:
+    return {t.get("symbol", ""): {"bid": price(t.get("bidPrice")), "ask": price(t.get("askPrice"))}
+            for t in json.loads(body)}
+
+
+def legacy_binance_markets(body: bytes) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for sym in json.loads(body).get("symbols", []):
+        if sym.get("status") == "TRADING" and sym.get("contractType") == "PERPETUAL" and sym.get("quoteAsset") == "USDT":
+            out[sym.get("baseAsset", "")] = sym.get("symbol")
+    return out
+
+
+def legacy_bybit_tickers(body: bytes) -> Dict[str, Dict[str, Optional[float]]]:
+    return {t.get("symbol", ""): {"bid": price(t.get("bid1Price")), "ask": price(t.get("ask1Price"))}
+            for t in json.loads(body).get("result", {}).get("list", [])}
+
+
+def legacy_binance_ws(raw: bytes) -> Any:
+    msg = json.loads(raw)
+    if msg.get("e") != "bookTicker":
+        return None
+    return msg["s"], float(msg["b"]), float(msg["a"]), msg.get("T") or msg.get("E")
+
+
+def legacy_bybit_ws(raw: bytes) -> Any:
+    msg = json.loads(raw)
+    data = msg.get("data", {})
+    b, a = data.get("b", []), data.get("a", [])
+    bid = float(b[0][0]) if b and float(b[0][1]) > 0 else None
+    ask = float(a[0][0]) if a and float(a[0][1]) > 0 else None
+    return data.get("s", ""), bid, ask, msg.get("ts")
+
+
+def samples(n: int) -> List[SpreadSample]:
+    venues = ("binance", "bybit")
+    out = []
+    for i in range(n):
+        bid = {v: random.uniform(1, 100) for v in venues}
+        ask = {v: p * 1.0002 for v, p in bid.items()}
+        out.append(SpreadSample(base=f"S{i}", symbol=f"S{i}/USDT", bid=bid, ask=ask,
+                                mid={v: (bid[v] + ask[v]) / 2 for v in venues}, spread_abs=0.01, spread_bps=12.5,
+                                buy_venue="bybit", sell_venue="binance", best_bps=10.0))
+    return out
+
+
+def legacy_encode(rows: List[SpreadSample]) -> bytes:
+    # Old write_spreads: one dict per sample, then the stdlib encoder
+    fields = SpreadSample.__struct_fields__
+    return json.dumps([{f: getattr(s, f) for f in fields} for s in rows], indent=2).encode()
+
+
+def typed_encode(rows: List[SpreadSample]) -> bytes:
+    return msgspec.json.format(ENCODER.encode(rows), indent=2)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int, int]:
+    # (best time per call in us, peak bytes allocated during one call, bytes still held by its result)
+    t = min(timeit.repeat(fn, number=1, repeat=repeat)) * 1e6
+    tracemalloc.start()
+    result = fn()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return t, peak, held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    random.seed(1)
+    n = args.symbols
+    binance, bybit = BinanceAdapter(), BybitAdapter()
+    b24, bbt, binfo, ybt = binance_24hr(n), binance_book_ticker(n), binance_exchange_info(n), bybit_tickers(n)
+    bws, yws = binance_ws(n), bybit_ws(n)
+    rows = samples(n)
+
+    cases = [
+        (f"binance ticker/24hr ({len(b24) // 1024} KiB)", lambda: legacy_binance_volumes(b24), lambda: binance.parse_volumes(b24)),
+        (f"binance bookTicker ({len(bbt) // 1024} KiB)", lambda: legacy_binance_tickers(bbt), lambda: binance.parse_tickers(bbt)),
+        (f"binance exchangeInfo ({len(binfo) // 1024} KiB)", lambda: legacy_binance_markets(binfo), lambda: binance.parse_markets(binfo)),
+        (f"bybit tickers ({len(ybt) // 1024} KiB)", lambda: legacy_bybit_tickers(ybt), lambda: bybit.parse_tickers(ybt)),
+        (f"binance ws bookTicker x{n}", lambda: [legacy_binance_ws(m) for m in bws],
+         lambda: [parse_binance_book_ticker(m) for m in bws]),
+        (f"bybit ws orderbook.1 x{n}", lambda: [legacy_bybit_ws(m) for m in yws],
+         lambda: [parse_bybit_orderbook(m) for m in yws]),
+        (f"encode {n} SpreadSample", lambda: legacy_encode(rows), lambda: typed_encode(rows)),
+    ]
+    print(f"{'payload':<34} {'old us':>9} {'new us':>9} {'speedup':>8} {'old peak KiB':>13} {'new peak KiB':>13}")
+    for name, old, new in cases:
+        if "encode" not in name:
+            assert old() == new(), f"{name}: typed decoding disagrees with the old parser"
+        t_old, peak_old, _ = measure(old, args.repeat)
+        t_new, peak_new, _ = measure(new, args.repeat)
+        print(f"{name:<34} {t_old:>9.0f} {t_new:>9.0f} {t_old / t_new:>7.1f}x {peak_old / 1024:>13.0f} {peak_new / 1024:>13.0f}")
+
+    legacy = {f: getattr(rows[0], f) for f in SpreadSample.__struct_fields__}
+    print(f"[Bench] SpreadSample: {sys.getsizeof(rows[0])} bytes per struct vs {sys.getsizeof(legacy)} for a dataclass __dict__ alone")
+
+
+if __name__ == "__main__":
+    main()
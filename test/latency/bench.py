@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import ccxt
+import ccxt.async_support as accxt
+import httpx
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from exchanges.registry import get_adapters  # noqa: E402
+from spreads.incremental import SpreadTracker  # noqa: E402
+from spreads.kernel import QuoteTable  # noqa: E402
+from spreads.rest import fetch_quotes, fetch_quotes_bulk  # noqa: E402
+from transport import BINANCE_FAPI, BYBIT_API, Transport  # noqa: E402
+
+
+# Request latency percentiles for raw httpx, requests, ccxt and our own spread pipeline, each
+# measured cold (a fresh client / instance / Transport per sample, so connection set-up is
+# included) and warm (one long-lived client, swept over concurrency levels). By default
+# everything runs against test/latency/mock_rest.py on localhost, so numbers are reproducible
+# and independent of the network; --live hits the real exchanges instead.
+# Results are compared with results/baseline_<mode>.json and the script exits 1 when a p50 or p99
+# got slower than the baseline by more than --tolerance (relative) plus --slack-ms (absolute).
+#   python test/latency/bench.py                     # offline, compare with the baseline
+#   python test/latency/bench.py --save-baseline     # record a new baseline
+#   python test/latency/bench.py --live --concurrency 1,4
+
+HERE = Path(__file__).resolve().parent
+RESULTS = HERE / "results"
+QUANTILES = (50.0, 90.0, 99.0, 99.9)
+GATED = ("p50", "p99")
+CCXT_SYMBOL = "BTC/USDT:USDT"
+LIVE_BASES = ["BTC", "ETH", "SOL", "XRP", "DOGE", "BNB", "ADA", "AVAX", "LINK", "LTC", "DOT", "TRX"]
+
+
+class Histogram:
+    """Log-bucketed latency histogram: constant memory, every percentile within `precision` of the sample."""
+
+    def __init__(self, precision: float = 0.01) -> None:
+        self.base = math.log1p(precision)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, ms: float) -> None:
+        i = int(math.log(max(ms, 1e-3) * 1000.0) / self.base)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100.0 * self.count)
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                # Geometric middle of the bucket, in ms
+                return min(math.exp((i + 0.5) * self.base) / 1000.0, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        out: Dict[str, float] = {"count": self.count}
+        for q in QUANTILES:
+            out[f"p{q:g}"] = round(self.percentile(q), 3)
+        out["max"] = round(self.max, 3)
+        return out
+
+
+class Timer:
+    def __init__(self, hist: Histogram) -> None:
+        self.hist = hist
+        self.errors = 0
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            await fn()
+        except Exception:  # noqa: BLE001
+            self.errors += 1
+            return
+        self.hist.record((time.perf_counter() - start) * 1000.0)
+
+    def call(self, fn: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception:  # noqa: BLE001
+            self.errors += 1
+            return
+        self.hist.record((time.perf_counter() - start) * 1000.0)
+
+
+Results = Dict[str, Dict[str, float]]
+
+
+def _store(results: Results, key: str, timer: Timer) -> None:
+    results[key] = dict(timer.hist.summary(), errors=timer.errors)
+    s = results[key]
+    print(f"  {key:<40} n={s['count']:<5.0f} p50={s['p50']:>8.2f} p90={s['p90']:>8.2f} p99={s['p99']:>8.2f} "
+          f"p99.9={s['p99.9']:>8.2f} max={s['max']:>8.2f} ms  errors={timer.errors}")
+
+
+async def _sweep(call: Callable[[], Awaitable[Any]], total: int, concurrency: int) -> Timer:
+    # `concurrency` workers share `total` requests; one untimed round first fills the pool
+    await asyncio.gather(*(call() for _ in range(concurrency)), return_exceptions=True)
+    timer = Timer(Histogram())
+    per = max(total // concurrency, 1)
+
+    async def worker() -> None:
+        for _ in range(per):
+            await timer.acall(call)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timer
+
+
+def _threaded_sweep(call: Callable[[], Any], total: int, concurrency: int) -> Timer:
+    timer = Timer(Histogram())
+    lock = threading.Lock()
+    per = max(total // concurrency, 1)
+
+    def worker() -> None:
+        call()  # untimed, opens this thread's connection
+        local = Timer(Histogram())
+        for _ in range(per):
+            local.call(call)
+        with lock:
+            for i, n in local.hist.buckets.items():
+                timer.hist.buckets[i] = timer.hist.buckets.get(i, 0) + n
+            timer.hist.count += local.hist.count
+            timer.hist.max = max(timer.hist.max, local.hist.max)
+            timer.errors += local.errors
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(worker) for _ in range(concurrency)]:
+            f.result()
+    return timer
+
+
+# Clients
+
+def ticker_urls(rest: Dict[str, str]) -> Dict[str, str]:
+    # The single-symbol tickers ccxt's fetch_ticker requests, so raw clients and ccxt do the same work
+    return {
+        "binance": f"{rest['binance']}/fapi/v1/ticker/24hr?symbol=BTCUSDT",
+        "bybit": f"{rest['bybit']}/v5/market/tickers?category=linear&symbol=BTCUSDT",
+    }
+
+
+def _check(r: Any) -> None:
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP {r.status_code}")
+
+
+async def bench_httpx(results: Results, urls: Dict[str, str], args: argparse.Namespace) -> None:
+    for venue, url in urls.items():
+        cold = Timer(Histogram())
+        for _ in range(args.cold):
+            async def fresh() -> None:
+                async with httpx.AsyncClient(timeout=args.timeout) as c:
+                    _check(await c.get(url))
+            await cold.acall(fresh)
+        _store(results, f"httpx {venue} cold", cold)
+
+        limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as c:
+            async def get() -> None:
+                _check(await c.get(url))
+            for n in args.levels:
+                _store(results, f"httpx {venue} warm c={n}", await _sweep(get, args.warm, n))
+
+
+def bench_requests(results: Results, urls: Dict[str, str], args: argparse.Namespace) -> None:
+    for venue, url in urls.items():
+        cold = Timer(Histogram())
+        for _ in range(args.cold):
+            cold.call(lambda: _check(requests.get(url, timeout=args.timeout)))
+        _store(results, f"requests {venue} cold", cold)
+
+        for n in args.levels:
+            local = threading.local()
+            sessions: List[requests.Session] = []
+
+            def get() -> None:
+                s = getattr(local, "session", None)
+                if s is None:
+                    s = local.session = requests.Session()
+                    sessions.append(s)
+                _check(s.get(url, timeout=args.timeout))
+
+            _store(results, f"requests {venue} warm c={n}", _threaded_sweep(get, args.warm, n))
+            for s in sessions:
+                s.close()
+
+
+CCXT_CLASSES = {"binance": "binanceusdm", "bybit": "bybit"}
+
+
+def _point(exchange: Any, url: str) -> None:
+    # Rewrites ccxt's API URL map onto the mock
+    hosts = (BINANCE_FAPI, BYBIT_API, "https://api.{hostname}")
+
+    def rewrite(v: Any) -> Any:
+        if isinstance(v, dict):
+            return {k: rewrite(x) for k, x in v.items()}
+        if isinstance(v, str):
+            for h in hosts:
+                v = v.replace(h, url)
+        return v
+
+    exchange.urls["api"] = rewrite(exchange.urls["api"])
+
+
+def _ccxt(module: Any, venue: str, rest: Optional[Dict[str, str]], args: argparse.Namespace) -> Any:
+    ex = getattr(module, CCXT_CLASSES[venue])({"enableRateLimit": False, "timeout": int(args.timeout * 1000),
+                                               "options": {"defaultType": "swap"}})
+    if rest is not None:
+        _point(ex, rest[venue])
+    return ex
+
+
+async def bench_ccxt(results: Results, rest: Optional[Dict[str, str]], args: argparse.Namespace) -> None:
+    for venue in CCXT_CLASSES:
+        # Markets are loaded once; cold samples pay for the instance and its connection, not load_markets
+        shared = _ccxt(ccxt, venue, rest, args)
+        shared.load_markets()
+        cold = Timer(Histogram())
+        for _ in range(args.cold):
+            def fresh() -> None:
+                ex = _ccxt(ccxt, venue, rest, args)
+                ex.set_markets(shared.markets, shared.currencies)
+                ex.fetch_ticker(CCXT_SYMBOL)
+                ex.session.close()
+            cold.call(fresh)
+        _store(results, f"ccxt {venue} cold", cold)
+
+        ex = _ccxt(accxt, venue, rest, args)
+        try:
+            ex.set_markets(shared.markets, shared.currencies)
+            for n in args.levels:
+                _store(results, f"ccxt {venue} warm c={n}",
+                       await _sweep(lambda: ex.fetch_ticker(CCXT_SYMBOL), args.warm, n))
+        finally:
+            await ex.close()
+
+
+async def bench_pipeline(results: Results, rest: Dict[str, str], bases: List[str], args: argparse.Namespace) -> None:
+    # One sample is a whole spread cycle: requests, decoding, QuoteTable load and band evaluation
+    adapters = get_adapters(("binance", "bybit"), rest)
+    table = QuoteTable([(b, f"{b}USDT", f"{b}USDT") for b in bases])
+    tracker = SpreadTracker(table, min_bps=1.0)
+
+    cold = Timer(Histogram())
+    for _ in range(args.cold):
+        async def fresh() -> None:
+            t = Transport(timeout=args.timeout)
+            try:
+                await fetch_quotes_bulk(table, transport=t, adapters=adapters)
+                tracker.evaluate()
+            finally:
+                await t.aclose()
+        await cold.acall(fresh)
+    _store(results, f"pipeline bulk/{len(bases)} cold", cold)
+
+    t = Transport(timeout=args.timeout, max_connections=max(args.levels))
+    try:
+        async def bulk() -> None:
+            await fetch_quotes_bulk(table, transport=t, adapters=adapters)
+            tracker.evaluate()
+
+        _store(results, f"pipeline bulk/{len(bases)} warm c=1", await _sweep(bulk, args.cycles, 1))
+        for n in args.levels:
+            async def depth(n: int = n) -> None:
+                await fetch_quotes(table, concurrency=n, transport=t, adapters=adapters)
+                tracker.evaluate()
+            _store(results, f"pipeline depth/{len(bases)} warm c={n}", await _sweep(depth, args.cycles, 1))
+    finally:
+        await t.aclose()
+
+
+# Mock server and baselines
+
+def start_mock(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    cmd = [sys.executable, "-u", str(HERE / "mock_rest.py"), "--port", "0", "--symbols", str(args.mock_symbols),
+           "--delay-ms", str(args.delay_ms), "--jitter-ms", str(args.jitter_ms)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline() if proc.stdout else ""
+    if "http://" not in line:
+        proc.kill()
+        raise SystemExit(f"[Bench] mock server failed to start: {line!r}")
+    return proc, line.split()[3]
+
+
+def compare(results: Results, baseline: Results, tolerance: float, slack_ms: float) -> List[str]:
+    regressions = []
+    for key, base in baseline.items():
+        now = results.get(key)
+        if now is None:
+            continue
+        for p in GATED:
+            limit = base[p] * (1.0 + tolerance) + slack_ms
+            if now[p] > limit:
+                regressions.append(f"{key} {p}: {now[p]:.2f} ms > {limit:.2f} ms (baseline {base[p]:.2f})")
+    return regressions
+
+
+async def run(args: argparse.Namespace, rest: Dict[str, str], bases: List[str]) -> Results:
+    results: Results = {}
+    urls = ticker_urls(rest)
+    targets = set(args.targets)
+    if "httpx" in targets:
+        print("[Bench] httpx")
+        await bench_httpx(results, urls, args)
+    if "requests" in targets:
+        print("[Bench] requests")
+        await asyncio.to_thread(bench_requests, results, urls, args)
+    if "ccxt" in targets:
+        print("[Bench] ccxt")
+        await bench_ccxt(results, None if args.live else rest, args)
+    if "pipeline" in targets:
+        print("[Bench] pipeline")
+        await bench_pipeline(results, rest, bases, args)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="Real exchanges instead of the local mock")
+    parser.add_argument("--mock-url", default="", help="Use an already running mock_rest.py")
+    parser.add_argument("--targets", default="httpx,requests,ccxt,pipeline")
+    parser.add_argument("--concurrency", default="1,8,32", help="Warm concurrency levels")
+    parser.add_argument("--cold", type=int, default=30, help="Cold samples per client and venue")
+    parser.add_argument("--warm", type=int, default=400, help="Warm requests per concurrency level")
+    parser.add_argument("--cycles", type=int, default=50, help="Pipeline cycles per concurrency level")
+    parser.add_argument("--symbols", type=int, default=50, help="Symbols in the pipeline's QuoteTable")
+    parser.add_argument("--mock-symbols", type=int, default=300)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Mock processing time per response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--baseline", default="", help="Defaults to results/baseline_<mock|live>.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown of p50/p99")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="Allowed absolute slowdown on top")
+    args = parser.parse_args()
+    args.levels = [int(n) for n in args.concurrency.split(",")]
+    args.targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    mode = "live" if args.live else "mock"
+
+    proc = None
+    if args.live:
+        rest = {"binance": BINANCE_FAPI, "bybit": BYBIT_API}
+        bases = (LIVE_BASES * (args.symbols // len(LIVE_BASES) + 1))[:min(args.symbols, len(LIVE_BASES))]
+    else:
+        if args.mock_url:
+            url = args.mock_url.rstrip("/")
+        else:
+            proc, url = start_mock(args)
+        rest = {"binance": url, "bybit": url}
+        bases = (["BTC", "ETH"] + [f"S{i:04d}" for i in range(args.symbols)])[:args.symbols]
+    print(f"[Bench] {mode}: {rest['binance']}, concurrency {args.levels}, {os.cpu_count()} cores")
+
+    try:
+        results = asyncio.run(run(args, rest, bases))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    RESULTS.mkdir(parents=True, exist_ok=True)
+    report = {
+        "meta": {"mode": mode, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cores": os.cpu_count(), "delay_ms": args.delay_ms,
+                 "concurrency": args.levels, "symbols": args.symbols},
+        "results": results,
+    }
+    (RESULTS / f"latency_{mode}.json").write_text(json.dumps(report, indent=2))
+    baseline_path = Path(args.baseline) if args.baseline else RESULTS / f"baseline_{mode}.json"
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"[Bench] Baseline saved to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"[Bench] No baseline at {baseline_path}, run with --save-baseline to record one")
+        return
+    regressions = compare(results, json.loads(baseline_path.read_text())["results"], args.tolerance, args.slack_ms)
+    if regressions:
+        print(f"[Bench] {len(regressions)} regression(s) against {baseline_path.name}:")
+        for r in regressions:
+            print(f"  {r}")
+        sys.exit(1)
+    print(f"[Bench] No regressions against {baseline_path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from exchanges.registry import get_adapters  # noqa: E402
+from execution import SESSIONS, Execution, Executor, VenueSession  # noqa: E402
+from spreads.incremental import BandEvent  # noqa: E402
+from transport import Transport  # noqa: E402
+
+
+# Two-leg order entry against test/sim/exchange_sim.py, which checks signatures, recvWindow
+# timestamps against a skewed server clock and duplicate client order ids like the venues do.
+# Reports the clock offset estimate against the injected skew, signal-to-ack and signing time
+# with warm sessions versus fresh connections per signal, and, on a second simulator that drops
+# the response of --drop-rate of the orders it placed, how many lost legs the lookup recovered
+# and whether any client order id was placed twice.
+#   python test/latency/bench_exec.py
+#   python test/latency/bench_exec.py --latency lognormal:20:150 --signals 500 --save
+
+HERE = Path(__file__).resolve().parent
+SIM = HERE.parent / "sim" / "exchange_sim.py"
+RESULTS = HERE / "results"
+VENUES = ("binance", "bybit")
+KEY, SECRET = "bench-key", "bench-secret"
+
+
+def start_sim(args: argparse.Namespace, *extra: str) -> Tuple[subprocess.Popen, str]:
+    cmd = [sys.executable, "-u", str(SIM), "--port", "0", "--ws-port", "0", "--stats", "0",
+           "--symbols", str(args.symbols), "--latency", args.latency, "--clock-skew-ms", str(args.skew_ms),
+           "--api-key", KEY, "--api-secret", SECRET, *extra]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline() if proc.stdout else ""
+    if "http://" not in line:
+        proc.kill()
+        raise SystemExit(f"[Bench] simulator failed to start: {line!r}")
+    return proc, line.split()[3]
+
+
+def summarize(ms: List[float]) -> Dict[str, float]:
+    a = np.array(ms)
+    return {
+        "count": len(a),
+        "p50": round(float(np.percentile(a, 50)), 3),
+        "p90": round(float(np.percentile(a, 90)), 3),
+        "p99": round(float(np.percentile(a, 99)), 3),
+        "max": round(float(a.max()), 3),
+    }
+
+
+def executor(rest: str, transport: Transport) -> Executor:
+    sessions: Dict[str, VenueSession] = {
+        a.name: SESSIONS[a.name](a, KEY, SECRET, transport) for a in get_adapters(VENUES, {v: rest for v in VENUES})
+    }
+    return Executor(sessions, notional=100.0, cooldown=0.0)
+
+
+def signals(rest: str, n: int) -> List[BandEvent]:
+    # Buy Binance at its ask, sell Bybit at its bid, on the simulator's current tops
+    binance = {t["symbol"]: t for t in httpx.get(f"{rest}/fapi/v1/ticker/bookTicker").json()}
+    bybit = {t["symbol"]: t for t in httpx.get(f"{rest}/v5/market/tickers", params={"category": "linear"})
+             .json()["result"]["list"]}
+    out: List[BandEvent] = []
+    ts = time.time()
+    for i, (symbol, b) in enumerate(binance.items()):
+        if len(out) == n:
+            break
+        base = symbol[:-4]
+        ask, bid = float(b["askPrice"]), float(bybit[symbol]["bid1Price"])
+        bps = round((bid - ask) / ask * 10_000.0, 2)
+        out.append(BandEvent("enter", base, f"{base}/USDT", bps, ts + i / 1000.0, buy_venue="binance",
+                             sell_venue="bybit", buy_price=ask, sell_price=bid, best_bps=bps))
+    return out
+
+
+async def run_signals(ex: Executor, events: List[BandEvent], interval: float, fresh: bool = False) -> List[Execution]:
+    done: List[Execution] = []
+    quiet = contextlib.redirect_stdout(io.StringIO())  # one [Exec] line per signal otherwise
+    for e in events:
+        if fresh:
+            # The un-warmed path: new connections for every signal, as a client built per order would open
+            t = Transport(timeout=5.0, max_connections=4)
+            for s in ex.sessions.values():
+                s.transport = t
+        with quiet:
+            result = await ex.execute(e)
+        if result is not None:
+            done.append(result)
+        if fresh:
+            await t.aclose()
+        await asyncio.sleep(interval)
+    return done
+
+
+def _report(executions: List[Execution]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"signal_to_ack_ms": summarize([x.signal_to_ack * 1000.0 for x in executions])}
+    out["sign_us"] = summarize([x.sign_seconds * 1e6 for x in executions])
+    out["both_legs_acked"] = sum(x.ok for x in executions)
+    out["one_legged"] = sum(x.one_legged for x in executions)
+    out["recovered"] = sum(a.recovered for x in executions for a in x.legs)
+    out["failed_legs"] = sum(not a.ok for x in executions for a in x.legs)
+    out["placed"] = sum(a.ok and not a.duplicate for x in executions for a in x.legs)
+    return out
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    proc, rest = start_sim(args)
+    results: Dict[str, Any] = {}
+    try:
+        transport = Transport(timeout=5.0, max_connections=4)
+        ex = executor(rest, transport)
+        await ex.start()
+        results["clock"] = {
+            s.name: {"offset_ms": round(s.clock.offset_ms, 2), "error_ms": round(s.clock.offset_ms - args.skew_ms, 2),
+                     "rtt_ms": round(s.clock.rtt_ms or 0.0, 2)}
+            for s in ex.sessions.values()
+        }
+        print(f"[Bench] clock: {results['clock']}")
+        events = signals(rest, args.signals)
+        print(f"[Bench] warm: {len(events)} signals")
+        warm = await run_signals(ex, events, args.interval)
+        results["warm"] = _report(warm)
+        print(f"[Bench]   {results['warm']}")
+        cold_events = signals(rest, args.signals)
+        print(f"[Bench] cold: {len(cold_events)} signals, fresh connections each")
+        results["cold"] = _report(await run_signals(ex, cold_events, args.interval, fresh=True))
+        print(f"[Bench]   {results['cold']}")
+        await transport.aclose()
+    finally:
+        proc.kill()
+    proc, rest = start_sim(args, "--order-drop-rate", str(args.drop_rate))
+    try:
+        # Lost responses: each is looked up, and resent only when the venue has no such order
+        transport = Transport(timeout=5.0, max_connections=4)
+        ex = executor(rest, transport)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await ex.start()
+        events = signals(rest, args.signals)
+        print(f"[Bench] lossy: {len(events)} signals, {args.drop_rate:.0%} of order responses dropped")
+        results["lossy"] = _report(await run_signals(ex, events, args.interval))
+        results["lossy"]["sim"] = httpx.get(f"{rest}/sim/orders").json()
+        print(f"[Bench]   {results['lossy']}")
+        await transport.aclose()
+    finally:
+        proc.kill()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Signal-to-ack latency of two-leg order entry")
+    parser.add_argument("--latency", default="lognormal:2:20", help="Simulator REST latency (P50:P99 in ms)")
+    parser.add_argument("--skew-ms", type=int, default=250, help="Simulator clock minus the local clock")
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--signals", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02, help="Pause between signals")
+    parser.add_argument("--drop-rate", type=float, default=0.1, help="Share of order responses lost in the lossy run")
+    parser.add_argument("--save", action="store_true", help="Write results/exec_mock.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"\n{'scenario':<10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'sign us':>9} {'placed':>7} "
+          f"{'recovered':>9} {'failed':>7}")
+    for key in ("warm", "cold", "lossy"):
+        r = results[key]
+        s = r["signal_to_ack_ms"]
+        print(f"{key:<10} {s['p50']:>9.2f} {s['p99']:>9.2f} {s['max']:>9.2f} {r['sign_us']['p50']:>9.1f} "
+              f"{r['placed']:>7} {r['recovered']:>9} {r['failed_legs']:>7}")
+    sim = results["lossy"]["sim"]
+    print(f"lossy run: {sim['orders']} orders on the simulator, {sim['repeated']} client ids placed more than once")
+    if args.save:
+        RESULTS.mkdir(exist_ok=True)
+        meta = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cores": os.cpu_count(),
+            **{k: v for k, v in vars(args).items() if k != "save"},
+        }
+        path = RESULTS / "exec_mock.json"
+        path.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"[Bench] Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from exchanges.registry import get_adapters  # noqa: E402
+from resilience import RequestPolicy  # noqa: E402
+from spreads.incremental import SpreadTracker  # noqa: E402
+from spreads.kernel import QuoteTable  # noqa: E402
+from spreads.rest import fetch_quotes, fetch_quotes_bulk  # noqa: E402
+from transport import Transport  # noqa: E402
+
+
+# Whole spread cycles (requests, decoding, QuoteTable load, band evaluation) against
+# test/sim/exchange_sim.py with injected REST latency, once with plain requests and once with
+# hedged ones, in bulk and depth mode; p50 / p99 / max cycle latency side by side. A second
+# simulator degrades one venue past the cycle deadline to compare cycles with and without
+# circuit breakers, and how many of that venue's quotes survive as stale ones.
+#   python test/latency/bench_hedge.py
+#   python test/latency/bench_hedge.py --latency lognormal:5:400 --cycles 500 --save
+
+HERE = Path(__file__).resolve().parent
+SIM = HERE.parent / "sim" / "exchange_sim.py"
+RESULTS = HERE / "results"
+VENUES = ("binance", "bybit")
+NEVER = 10 ** 9
+
+
+def start_sim(args: argparse.Namespace, *extra: str) -> Tuple[subprocess.Popen, str]:
+    cmd = [sys.executable, "-u", str(SIM), "--port", "0", "--ws-port", "0", "--stats", "0",
+           "--symbols", str(args.symbols), "--latency", args.latency, *extra]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline() if proc.stdout else ""
+    if "http://" not in line:
+        proc.kill()
+        raise SystemExit(f"[Bench] simulator failed to start: {line!r}")
+    return proc, line.split()[3]
+
+
+def summarize(ms: List[float]) -> Dict[str, float]:
+    a = np.array(ms)
+    return {
+        "count": len(a),
+        "p50": round(float(np.percentile(a, 50)), 2),
+        "p90": round(float(np.percentile(a, 90)), 2),
+        "p99": round(float(np.percentile(a, 99)), 2),
+        "max": round(float(a.max()), 2),
+    }
+
+
+async def cycles(
+    table: QuoteTable,
+    rest: str,
+    policy: RequestPolicy,
+    mode: str,
+    n: int,
+    warmup: int,
+    concurrency: int,
+    deadline: Any = None,
+    interval: float = 0.0,
+) -> Dict[str, Any]:
+    adapters = get_adapters(VENUES, {v: rest for v in VENUES})
+    tracker = SpreadTracker(table, min_bps=1.0)
+    t = Transport(timeout=10.0, max_connections=concurrency * 2, policy=policy)
+    ms: List[float] = []
+    try:
+        for i in range(warmup + n):
+            start = time.perf_counter()
+            if mode == "depth":
+                await fetch_quotes(table, concurrency=concurrency, deadline=deadline, transport=t, adapters=adapters)
+            else:
+                await fetch_quotes_bulk(table, deadline=deadline, transport=t, adapters=adapters)
+            tracker.evaluate()
+            if i >= warmup:
+                ms.append((time.perf_counter() - start) * 1000.0)
+            if interval:
+                await asyncio.sleep(interval)
+    finally:
+        await t.aclose()
+    out: Dict[str, Any] = summarize(ms)
+    summary = policy.summary()
+    out["requests"] = sum(v["requests"] for v in summary.values())
+    out["hedged"] = sum(v["hedged"] for v in summary.values())
+    out["hedge_wins"] = sum(v["hedge_wins"] for v in summary.values())
+    out["trips"] = sum(v["trips"] for v in summary.values())
+    return out
+
+
+def _table(symbols: int) -> QuoteTable:
+    bases = ["BTC", "ETH"] + [f"S{i:04d}" for i in range(symbols - 2)]
+    return QuoteTable([(b, f"{b}USDT", f"{b}USDT") for b in bases])
+
+
+async def tail(args: argparse.Namespace, rest: str) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for mode, symbols in (("bulk", args.symbols), ("depth", args.depth_symbols)):
+        for hedge in (False, True):
+            policy = RequestPolicy(hedge=hedge, hedge_quantile=args.quantile, hedge_min_ms=args.hedge_min_ms,
+                                   hedge_ratio=args.ratio)
+            n = args.cycles if mode == "bulk" else max(args.cycles // 2, 20)
+            key = f"{mode}/{symbols} {'hedged' if hedge else 'plain'}"
+            print(f"[Bench] {key}: {n} cycles")
+            results[key] = await cycles(_table(symbols), rest, policy, mode, n, args.warmup, args.concurrency)
+            print(f"[Bench]   {results[key]}")
+    return results
+
+
+async def degraded(args: argparse.Namespace, rest: str) -> Dict[str, Dict[str, Any]]:
+    # Bybit answers slower than the deadline; the table starts with quotes from one patient cycle
+    results: Dict[str, Dict[str, Any]] = {}
+    for breaker in (False, True):
+        table = _table(args.symbols)
+        await cycles(table, rest, RequestPolicy(hedge=False), "bulk", 1, 0, args.concurrency)
+        policy = RequestPolicy(hedge=False, breaker_failures=5 if breaker else NEVER)
+        key = f"bulk/{args.symbols} bybit degraded, {'breaker' if breaker else 'no breaker'}"
+        print(f"[Bench] {key}: {args.degraded_cycles} cycles {args.interval}s apart, deadline {args.deadline}s")
+        out = await cycles(table, rest, policy, "bulk", args.degraded_cycles, 0, args.concurrency, args.deadline,
+                           args.interval)
+        col = table.venues.index("bybit")
+        quoted = ~np.isnan(table.bid[:, col])
+        out["bybit_quoted"] = int(quoted.sum())
+        newest = float(table.ts[quoted, col].max()) / 1000.0 if quoted.any() else None
+        out["bybit_age_s"] = round(time.time() - newest, 1) if newest is not None else None
+        results[key] = out
+        print(f"[Bench]   {out}")
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    proc, rest = start_sim(args)
+    try:
+        results.update(await tail(args, rest))
+    finally:
+        proc.kill()
+    proc, rest = start_sim(args, "--venue-latency", f"bybit=fixed:{args.degraded_ms}")
+    try:
+        results.update(await degraded(args, rest))
+    finally:
+        proc.kill()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="p99 cycle latency with and without hedged requests")
+    parser.add_argument("--latency", default="lognormal:5:150", help="Simulator REST latency (P50:P99 in ms)")
+    parser.add_argument("--symbols", type=int, default=600, help="Symbols per bulk cycle")
+    parser.add_argument("--depth-symbols", type=int, default=20, help="Symbols per depth cycle")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--cycles", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30, help="Unmeasured cycles that fill the latency trackers")
+    parser.add_argument("--quantile", type=float, default=0.95)
+    parser.add_argument("--hedge-min-ms", type=float, default=10.0)
+    parser.add_argument("--ratio", type=float, default=0.1)
+    parser.add_argument("--degraded-ms", type=float, default=2000.0, help="Bybit latency in the breaker scenario")
+    parser.add_argument("--degraded-cycles", type=int, default=100)
+    parser.add_argument("--deadline", type=float, default=0.5)
+    parser.add_argument("--interval", type=float, default=0.1, help="Pause between cycles in the breaker scenario")
+    parser.add_argument("--save", action="store_true", help="Write results/hedge_mock.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"\n{'scenario':<48} {'p50':>9} {'p99':>9} {'max':>9} {'hedged':>7} {'trips':>6}")
+    for key, r in results.items():
+        print(f"{key:<48} {r['p50']:>9.2f} {r['p99']:>9.2f} {r['max']:>9.2f} {r['hedged']:>7} {r['trips']:>6}")
+    if args.save:
+        RESULTS.mkdir(exist_ok=True)
+        meta = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cores": os.cpu_count(),
+            **{k: v for k, v in vars(args).items() if k != "save"},
+        }
+        path = RESULTS / "hedge_mock.json"
+        path.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"[Bench] Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
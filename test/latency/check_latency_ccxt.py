@@ -11,27 +11,31 @@ import ccxt
 from dotenv import load_dotenv
 
 
-def measure_ccxt_latency(exchange_id: str, symbol: str = "BTC/USDT") -> Dict[str, float | int | str]:
+def build_exchange(exchange_id: str) -> ccxt.Exchange:
+    exchange_class = getattr(ccxt, exchange_id)
+    api_key = os.getenv(f"{exchange_id.upper()}_API_KEY", "")
+    api_secret = os.getenv(f"{exchange_id.upper()}_API_SECRET", "")
+    password = os.getenv(f"{exchange_id.upper()}_API_PASSWORD", "")  # e.g., for OKX
+
+    return exchange_class({
+        "apiKey": api_key,
+        "secret": api_secret,
+        "password": password or None,
+        "enableRateLimit": True,
+        "options": {"defaultType": "swap"},  # better for perp symbols
+    })
+
+
+def measure_ccxt_latency(exchange: ccxt.Exchange, symbol: str = "BTC/USDT") -> Dict[str, float | int | str]:
+    # The instance (and its HTTP session and markets) is reused across trials, so only the first
+    # trial pays for load_markets and the connection set-up
     start = time.monotonic()
     try:
-        exchange_class = getattr(ccxt, exchange_id)
-        api_key = os.getenv(f"{exchange_id.upper()}_API_KEY", "")
-        api_secret = os.getenv(f"{exchange_id.upper()}_API_SECRET", "")
-        password = os.getenv(f"{exchange_id.upper()}_API_PASSWORD", "")  # e.g., for OKX
-
-        exchange = exchange_class({
-            "apiKey": api_key,
-            "secret": api_secret,
-            "password": password or None,
-            "enableRateLimit": True,
-            "options": {"defaultType": "swap"},  # better for perp symbols
-        })
-
         # Public request (ticker) — includes network latency and exchange processing
         ticker = exchange.fetch_ticker(symbol)
         latency_ms = (time.monotonic() - start) * 1000.0
         return {
-            "exchange": exchange_id,
+            "exchange": exchange.id,
             "symbol": symbol,
             "latency_ms": round(latency_ms, 1),
             "last": ticker.get("last"),
@@ -39,7 +43,7 @@ def measure_ccxt_latency(exchange_id: str, symbol: str = "BTC/USDT") -> Dict[str
     except Exception as exc:  # noqa: BLE001
         latency_ms = (time.monotonic() - start) * 1000.0
         return {
-            "exchange": exchange_id,
+            "exchange": exchange.id,
             "symbol": symbol,
             "latency_ms": round(latency_ms, 1),
             "error": f"{type(exc).__name__}: {exc}",
@@ -59,8 +63,9 @@ def main() -> None:
 
     # Adjust symbols per exchange if needed (perp vs spot)
     symbol = os.getenv("CCXT_SYMBOL", "BTC/USDT")
+    instances = {e: build_exchange(e) for e in exchanges}
     if args.trials <= 1:
-        results = [measure_ccxt_latency(e, symbol) for e in exchanges]
+        results = [measure_ccxt_latency(instances[e], symbol) for e in exchanges]
         print(json.dumps(results, indent=2))
         return
 
@@ -68,7 +73,7 @@ def main() -> None:
     errors: Dict[str, int] = {e: 0 for e in exchanges}
     for _ in range(args.trials):
         for ex in exchanges:
-            res = measure_ccxt_latency(ex, symbol)
+            res = measure_ccxt_latency(instances[ex], symbol)
             series[ex].append(float(res["latency_ms"]))
             if "error" in res:
                 errors[ex] += 1
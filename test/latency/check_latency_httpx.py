@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import json
+import sys
 import time
 import argparse
+from pathlib import Path
 from statistics import mean
 from typing import Dict, Iterable, List
 
 import httpx
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from transport import Transport  # noqa: E402
+
 
 def measure_httpx_latency(client: httpx.Client, url: str) -> Dict[str, str | float | int]:
     start = time.monotonic()
@@ -31,19 +37,16 @@ def measure_httpx_latency(client: httpx.Client, url: str) -> Dict[str, str | flo
         }
 
 
-def run_once(endpoints: Iterable[str]) -> List[Dict[str, str | float | int]]:
-    # Force HTTP/1.1 for consistent latency measurements
-    client = httpx.Client(
-        http2=False,
-        timeout=httpx.Timeout(2.0, read=2.0),
-        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
-    )
-    return [measure_httpx_latency(client, e) for e in endpoints]
+def run_once(endpoints: Iterable[str], transport: Transport) -> List[Dict[str, str | float | int]]:
+    # Pooled clients are reused across trials, so only the first trial per host pays the handshake
+    return [measure_httpx_latency(transport.client(e), e) for e in endpoints]
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--trials", type=int, default=1, help="Number of requests per endpoint")
+    parser.add_argument("--http2", action="store_true", help="Negotiate HTTP/2 where the server supports it")
+    parser.add_argument("--warm", type=int, default=0, help="Pre-open N connections per host before measuring")
     args = parser.parse_args()
 
     endpoints = [
@@ -55,15 +58,21 @@ def main() -> None:
         "https://api.dydx.exchange/v3/orderbook/BTC-USD",
     ]
 
+    transport = Transport(http2=args.http2, timeout=2.0)
+    if args.warm:
+        for e in endpoints:
+            transport.warm(e, args.warm)
+
     if args.trials <= 1:
-        print(json.dumps(run_once(endpoints), indent=2))
+        print(json.dumps(run_once(endpoints, transport), indent=2))
+        print(f"[Pool] {json.dumps(transport.stats())}", file=sys.stderr)
         return
 
     # Aggregate over multiple trials
     series: Dict[str, List[float]] = {e: [] for e in endpoints}
     statuses: Dict[str, List[int]] = {e: [] for e in endpoints}
     for _ in range(args.trials):
-        results = run_once(endpoints)
+        results = run_once(endpoints, transport)
         for res in results:
             series[res["url"]].append(float(res["latency_ms"]))
             statuses[res["url"]].append(int(res["status"]))
@@ -83,6 +92,7 @@ def main() -> None:
         })
 
     print(json.dumps(summary, indent=2))
+    print(f"[Pool] {json.dumps(transport.stats())}", file=sys.stderr)
 
 
 if __name__ == "__main__":
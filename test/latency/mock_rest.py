@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+# Keep-alive HTTP/1.1 server answering the Binance USD-M and Bybit v5 public market endpoints
+# the scanner, the spread loop and the latency scripts hit, so benchmarks run without network.
+# Bulk bodies are rebuilt every `--refresh` seconds; `--delay-ms` / `--jitter-ms` add a simulated
+# exchange processing time to every response.
+#   python test/latency/mock_rest.py --port 8790 --symbols 300 --delay-ms 2
+
+BINANCE = "/fapi/v1"
+BYBIT = "/v5/market"
+
+
+class Quotes:
+    def __init__(self, symbols: int, divergence_bps: float) -> None:
+        self.bases = ["BTC", "ETH"] + [f"S{i:04d}" for i in range(max(symbols - 2, 0))]
+        self.prices = {b: random.uniform(1.0, 1000.0) for b in self.bases}
+        self.prices.update({"BTC": 65000.0, "ETH": 3200.0})
+        self.divergence = divergence_bps / 10_000.0
+        self.bodies: Dict[str, bytes] = {}
+        self.step()
+
+    def step(self) -> None:
+        for b in self.bases:
+            self.prices[b] *= 1.0 + random.gauss(0.0, 0.0005)
+        self.bodies = {
+            f"{BINANCE}/ticker/bookTicker": self._binance_book_tickers(),
+            f"{BINANCE}/ticker/24hr": self._binance_24hr(),
+            f"{BINANCE}/exchangeInfo": self._binance_exchange_info(),
+            f"{BYBIT}/tickers": self._bybit_tickers(),
+            f"{BYBIT}/instruments-info": self._bybit_instruments(),
+        }
+
+    def top(self, venue: str, base: str) -> Tuple[float, float]:
+        p = self.prices.get(base, 0.0) * (1.0 + (self.divergence if venue == "bybit" else 0.0))
+        return p * 0.9999, p * 1.0001
+
+    def _binance_book_tickers(self) -> bytes:
+        ts = int(time.time() * 1000)
+        rows = []
+        for b in self.bases:
+            bid, ask = self.top("binance", b)
+            rows.append({"symbol": f"{b}USDT", "bidPrice": f"{bid:.6f}", "bidQty": "1.000", "askPrice": f"{ask:.6f}",
+                         "askQty": "1.000", "time": ts, "lastUpdateId": ts})
+        return json.dumps(rows).encode()
+
+    def _binance_24hr(self) -> bytes:
+        return json.dumps([{"symbol": f"{b}USDT", "lastPrice": f"{self.prices[b]:.6f}",
+                            "quoteVolume": f"{5e8 / (i + 1):.2f}"} for i, b in enumerate(self.bases)]).encode()
+
+    def _binance_exchange_info(self) -> bytes:
+        return json.dumps({"timezone": "UTC", "symbols": [
+            {"symbol": f"{b}USDT", "pair": f"{b}USDT", "contractType": "PERPETUAL", "status": "TRADING",
+             "baseAsset": b, "quoteAsset": "USDT", "marginAsset": "USDT", "pricePrecision": 6, "quantityPrecision": 3,
+             "filters": []} for b in self.bases]}).encode()
+
+    def _bybit_tickers(self) -> bytes:
+        rows = []
+        for i, b in enumerate(self.bases):
+            bid, ask = self.top("bybit", b)
+            rows.append({"symbol": f"{b}USDT", "lastPrice": f"{(bid + ask) / 2:.6f}", "bid1Price": f"{bid:.6f}",
+                         "bid1Size": "1", "ask1Price": f"{ask:.6f}", "ask1Size": "1",
+                         "turnover24h": f"{4e8 / (i + 1):.2f}", "volume24h": "1000"})
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": rows},
+                           "time": int(time.time() * 1000)}).encode()
+
+    def _bybit_instruments(self) -> bytes:
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": [
+            {"symbol": f"{b}USDT", "contractType": "LinearPerpetual", "status": "Trading", "baseCoin": b,
+             "quoteCoin": "USDT", "settleCoin": "USDT"} for b in self.bases]}}).encode()
+
+    def depth(self, venue: str, symbol: str, limit: int) -> bytes:
+        bid, ask = self.top(venue, symbol[:-4] if symbol.endswith("USDT") else symbol)
+        bids = [[f"{bid * (1 - 0.0001 * i):.6f}", "1.000"] for i in range(limit)]
+        asks = [[f"{ask * (1 + 0.0001 * i):.6f}", "1.000"] for i in range(limit)]
+        ts = int(time.time() * 1000)
+        if venue == "binance":
+            return json.dumps({"lastUpdateId": ts, "E": ts, "T": ts, "bids": bids, "asks": asks}).encode()
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"s": symbol, "b": bids, "a": asks, "ts": ts,
+                                                                     "u": ts}, "time": ts}).encode()
+
+    def ticker(self, symbol: str) -> bytes:
+        # Single-symbol 24hr ticker, what ccxt's fetch_ticker calls on Binance
+        base = symbol[:-4] if symbol.endswith("USDT") else symbol
+        bid, ask = self.top("binance", base)
+        p = self.prices.get(base, 0.0)
+        return json.dumps({"symbol": symbol, "lastPrice": f"{p:.6f}", "openPrice": f"{p:.6f}", "highPrice": f"{p:.6f}",
+                           "lowPrice": f"{p:.6f}", "volume": "1000", "quoteVolume": f"{p * 1000:.2f}",
+                           "bidPrice": f"{bid:.6f}", "askPrice": f"{ask:.6f}", "closeTime": int(time.time() * 1000),
+                           "openTime": int(time.time() * 1000) - 86_400_000}).encode()
+
+    def route(self, target: str) -> Tuple[int, bytes]:
+        url = urlparse(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        symbol = query.get("symbol", "")
+        limit = int(query.get("limit", "5") or 5)
+        if url.path == f"{BINANCE}/depth":
+            return 200, self.depth("binance", symbol, min(limit, 50))
+        if url.path == f"{BYBIT}/orderbook":
+            return 200, self.depth("bybit", symbol, min(limit, 50))
+        if url.path == f"{BINANCE}/ticker/24hr" and symbol:
+            return 200, self.ticker(symbol)
+        if url.path == f"{BYBIT}/tickers" and symbol:
+            bid, ask = self.top("bybit", symbol[:-4])
+            return 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": [
+                {"symbol": symbol, "bid1Price": f"{bid:.6f}", "ask1Price": f"{ask:.6f}",
+                 "lastPrice": f"{(bid + ask) / 2:.6f}"}]}}).encode()
+        if url.path.startswith(BYBIT) and query.get("category", "linear") != "linear":
+            # Only linear perpetuals are simulated; spot/inverse/option come back empty
+            return 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": query["category"],
+                                                                              "list": []}}).encode()
+        if url.path in self.bodies:
+            return 200, self.bodies[url.path]
+        if url.path in ("/fapi/v1/ping", "/fapi/v1/time", "/v5/market/time", "/"):
+            return 200, json.dumps({"serverTime": int(time.time() * 1000)}).encode()
+        return 404, b'{"code":-1,"msg":"not found"}'
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, quotes: Quotes,
+                 args: argparse.Namespace) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            parts = lines[0].split(" ")
+            headers: Dict[str, str] = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            length = int(headers.get("content-length", "0") or 0)
+            if length:
+                await reader.readexactly(length)
+            if len(parts) < 2:
+                status, body = 400, b"{}"
+            else:
+                status, body = quotes.route(parts[1])
+            if args.delay_ms or args.jitter_ms:
+                await asyncio.sleep(max(args.delay_ms + random.uniform(-args.jitter_ms, args.jitter_ms), 0.0) / 1000.0)
+            close = headers.get("connection", "").lower() == "close"
+            out: List[bytes] = [
+                f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n".encode(),
+                b"Content-Type: application/json\r\n",
+                f"Content-Length: {len(body)}\r\n".encode(),
+                b"Connection: close\r\n" if close else b"Connection: keep-alive\r\n",
+                b"\r\n",
+                body,
+            ]
+            writer.writelines(out)
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    quotes = Quotes(args.symbols, args.divergence_bps)
+    server = await asyncio.start_server(lambda r, w: handle(r, w, quotes, args), args.host, args.port, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+    # The first stdout line is parsed by bench.py to learn the port when started with --port 0
+    print(f"[MockREST] Listening on http://{args.host}:{port} ({len(quotes.bases)} symbols)", flush=True)
+    async with server:
+        while True:
+            await asyncio.sleep(args.refresh)
+            quotes.step()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790, help="0 picks a free port")
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Simulated exchange processing time")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--refresh", type=float, default=1.0, help="Seconds between bulk body rebuilds")
+    parser.add_argument("--divergence-bps", type=float, default=15.0, help="Bybit price offset vs Binance")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from spreads.engine import EngineConfig  # noqa: E402
+from spreads.incremental import SpreadTracker  # noqa: E402
+from spreads.kernel import QuoteTable  # noqa: E402
+from spreads.shard import HashRing, ShardPool, ShardWorker, moved  # noqa: E402
+from spreads.stream import StreamEngine  # noqa: E402
+
+
+# Throughput of the sharded spread loop with the network taken out: every worker replays
+# pre-encoded Binance bookTicker / Bybit orderbook.1 messages for its shard through the same
+# parse + QuoteTable path the stream mode uses, as fast as it can, and ships changed rows to the
+# coordinator, which merges them and runs the band filter and ranking.
+#   python test/shard/bench_shards.py --symbols 2000 --workers 1,2,4,8 --seconds 5
+
+VARIANTS = 16
+
+
+def _feed(table: QuoteTable) -> List[Tuple[str, str]]:
+    out: List[Tuple[str, str]] = []
+    for _ in range(VARIANTS):
+        for symbol in table.symbols("binance"):
+            p = random.uniform(1.0, 100.0)
+            out.append(("binance", json.dumps({"e": "bookTicker", "s": symbol, "b": f"{p:.4f}", "a": f"{p * 1.0002:.4f}",
+                                               "T": int(time.time() * 1000)})))
+        for symbol in table.symbols("bybit"):
+            p = random.uniform(1.0, 100.0)
+            out.append(("bybit", json.dumps({"topic": f"orderbook.1.{symbol}", "ts": int(time.time() * 1000),
+                                             "data": {"s": symbol, "b": [[f"{p:.4f}", "3"]], "a": [[f"{p * 1.0002:.4f}", "2"]]}})))
+    random.shuffle(out)
+    return out
+
+
+class ReplayWorker(ShardWorker):
+    async def serve(self, table: QuoteTable) -> None:
+        self.stream = StreamEngine(table)
+        feed = _feed(table)
+        on_message = self.stream._on_message
+        while True:
+            for i in range(0, len(feed), 500):
+                for venue, raw in feed[i:i + 500]:
+                    on_message(venue, raw)
+                # Lets the flush loop and command reader run
+                await asyncio.sleep(0)
+
+
+def _messages(pool: ShardPool) -> int:
+    return sum(s.get("messages", 0) for s in pool.stats)
+
+
+async def _measure(legs: List[Tuple[str, str, str]], workers: int, seconds: float, warmup: float) -> Tuple[float, float, float]:
+    table = QuoteTable(legs)
+    tracker = SpreadTracker(table, min_bps=1.0)
+    evaluated = [0]
+
+    def on_update() -> None:
+        tracker.evaluate()
+        evaluated[0] += 1
+
+    pool = ShardPool(table, EngineConfig(mode="stream"), workers, on_update=on_update, worker=ReplayWorker)
+    task = asyncio.create_task(pool.run())
+    try:
+        await asyncio.sleep(warmup)
+        m0, u0, e0 = _messages(pool), sum(pool.updates), evaluated[0]
+        await asyncio.sleep(seconds)
+        m1, u1, e1 = _messages(pool), sum(pool.updates), evaluated[0]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    return (m1 - m0) / seconds, (u1 - u0) / seconds, (e1 - e0) / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)) or "1")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=3.0, help="Process start-up and feed encoding")
+    args = parser.parse_args()
+
+    legs = [(f"S{i:05d}", f"S{i:05d}USDT", f"S{i:05d}USDT") for i in range(args.symbols)]
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"[Bench] {args.symbols} symbols, {os.cpu_count()} cores, {args.seconds}s per run")
+    base = None
+    for n in counts:
+        msgs, rows, evals = asyncio.run(_measure(legs, n, args.seconds, args.warmup))
+        base = base or msgs
+        print(f"[Bench] workers={n:<3} messages/s={msgs:>10.0f}  speedup={msgs / base:5.2f}x  "
+              f"rows merged/s={rows:>9.0f}  evaluations/s={evals:>6.0f}")
+
+    bases = [leg[0] for leg in legs]
+    for n in counts:
+        ring = moved(HashRing(n).split(bases), HashRing(n + 1).split(bases))
+        modulo = sum(1 for i in range(len(bases)) if i % n != i % (n + 1))
+        print(f"[Bench] {n} -> {n + 1} workers: ring moves {ring / len(bases):.1%} of symbols, modulo {modulo / len(bases):.1%}")
+
+
+if __name__ == "__main__":
+    main()
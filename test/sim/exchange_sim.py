@@ -0,0 +1,903 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import math
+import random
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import websockets
+
+
+# Local Binance USD-M / Bybit v5 linear stand-in for load tests well past the real universe: one
+# process serves the REST endpoints the scanner and the spread loop use on --port and the
+# bookTicker / depth / orderbook.1 / orderbook.50 WebSocket streams on --ws-port, all driven by
+# one random-walk market so REST snapshots and stream diffs agree. Symbol count, update rate and
+# the share of symbols moving per tick, REST latency distribution (or one per venue, to degrade a
+# single exchange), 5xx and 429 injection, the venues' weight limits and the Bybit-vs-Binance
+# divergence are flags. With --block-time the same WebSocket port also serves an Ethereum
+# JSON-RPC node on /rpc: one Uniswap V3 pool per symbol behind Multicall3 `aggregate3`, priced off
+# the Binance mid with its own divergence and repriced once per block, with `newHeads`
+# subscriptions. --pools-out writes the pool list the engine reads. Signed IOC orders are accepted
+# on POST /fapi/v1/order and /v5/order/create, and looked up by client id, with the venues' HMAC,
+# recvWindow, precision and duplicate client order id checks, against a server clock
+# --clock-skew-ms off the local one; --order-drop-rate loses responses of orders that were placed.
+#
+#   python test/sim/exchange_sim.py --symbols 5000 --rate 10 --latency lognormal:2:25 --error-rate 0.001
+#   SPREADS_BINANCE_REST=http://127.0.0.1:8790 SPREADS_BYBIT_REST=http://127.0.0.1:8790 make scan
+#   SPREADS_BINANCE_WS=ws://127.0.0.1:8765/ws SPREADS_BYBIT_WS=ws://127.0.0.1:8765/v5/public/linear \
+#     SPREADS_BINANCE_REST=... SPREADS_BYBIT_REST=... SPREADS_MODE=stream make run-spread
+#   python test/sim/exchange_sim.py --block-time 2 --pools-out data/dex_pools.json
+#   SPREADS_DEX_RPC=ws://127.0.0.1:8765/rpc SPREADS_DEX_MULTICALL=0xca11bde05977b3631167028862be2a173976ca11 ...
+#   SPREADS_EXECUTE=1 BINANCE_API_KEY=sim-key BINANCE_API_SECRET=sim-secret BYBIT_API_KEY=sim-key \
+#     BYBIT_API_SECRET=sim-secret SPREADS_BINANCE_REST=... SPREADS_BYBIT_REST=... make run-spread
+
+BINANCE = "/fapi/v1"
+BYBIT = "/v5/market"
+BOOK_LEVELS = 20
+
+# Per-venue request weight windows, as the adapters' VenueLimits (binance: per minute, bybit: per 5 s)
+LIMITS = {"binance": (2400.0, 60.0), "bybit": (600.0, 5.0)}
+BINANCE_WEIGHTS = {"ticker/bookTicker": 5.0, "ticker/24hr": 40.0, "exchangeInfo": 1.0, "depth": 2.0}
+# Lot and tick sizes; the venues disagree on the lot so order entry has to round to the coarser one
+BINANCE_STEP, BYBIT_STEP, TICK = "0.001", "0.01", "0.000001"
+ORDER_PATHS = (f"{BINANCE}/order?", "/v5/order/", "/sim/orders")
+
+MULTICALL3 = "ca11bde05977b3631167028862be2a173976ca11"
+SLOT0 = "3850c7bd"
+LIQUIDITY = "1a686502"
+BASE_DECIMALS, STABLE_DECIMALS = 18, 6
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.10g}"
+
+
+class Latency:
+    """REST response delay: `none`, `fixed:MS`, `uniform:LO:HI` or `lognormal:P50:P99`, in milliseconds."""
+
+    def __init__(self, spec: str) -> None:
+        kind, *values = spec.split(":")
+        self.kind = kind
+        self.values = [float(v) for v in values]
+        if kind == "lognormal":
+            p50, p99 = self.values
+            self.mu = math.log(p50)
+            self.sigma = max(math.log(p99) - self.mu, 0.0) / 2.3263
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(*self.values)
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(self.mu, self.sigma)
+        else:
+            return 0.0
+        return ms / 1000.0
+
+
+class Book:
+    """Levels on a fixed tick grid around the walk price; `step` returns the diff to the previous state."""
+
+    def __init__(self, mid: float) -> None:
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.update_id = 0
+        self.step(mid)
+
+    def step(self, mid: float) -> Tuple[List[List[str]], List[List[str]], int, int]:
+        tick = 10 ** (math.floor(math.log10(mid)) - 4)
+        best_bid = math.floor(mid / tick) * tick
+        bids = {round(best_bid - i * tick, 10): round(random.uniform(1, 50), 3) for i in range(BOOK_LEVELS)}
+        asks = {round(best_bid + (i + 1) * tick, 10): round(random.uniform(1, 50), 3) for i in range(BOOK_LEVELS)}
+        # Only part of the book changes per update, like a real diff stream
+        for new, old in ((bids, self.bids), (asks, self.asks)):
+            for p in new:
+                if p in old and random.random() < 0.7:
+                    new[p] = old[p]
+        diff_b = _diff(self.bids, bids)
+        diff_a = _diff(self.asks, asks)
+        first = self.update_id + 1
+        self.update_id += random.randint(1, 3)
+        self.bids, self.asks = bids, asks
+        return diff_b, diff_a, first, self.update_id
+
+    def levels(self, limit: int = BOOK_LEVELS) -> Tuple[List[List[str]], List[List[str]]]:
+        bids = [[_fmt(p), _fmt(s)] for p, s in sorted(self.bids.items(), reverse=True)[:limit]]
+        asks = [[_fmt(p), _fmt(s)] for p, s in sorted(self.asks.items())[:limit]]
+        return bids, asks
+
+
+def _diff(old: Dict[float, float], new: Dict[float, float]) -> List[List[str]]:
+    out = [[_fmt(p), "0"] for p in old if p not in new]
+    out += [[_fmt(p), _fmt(s)] for p, s in new.items() if old.get(p) != s]
+    return out
+
+
+class Market:
+    """Binance mid prices as a random walk per symbol; Bybit is the same price times a per-symbol
+    divergence that wanders around `--divergence-bps` (± `--divergence-noise-bps`), so spreads
+    drift in and out of any band. Every tick moves a `share` of the symbols."""
+
+    def __init__(self, symbols: int, divergence_bps: float, noise_bps: float, seed: int) -> None:
+        self.rng = np.random.default_rng(seed)
+        self.bases = ["BTC", "ETH"] + [f"S{i:04d}" for i in range(max(symbols - 2, 0))]
+        self.index = {f"{b}USDT": i for i, b in enumerate(self.bases)}
+        n = len(self.bases)
+        self.prices = self.rng.uniform(1.0, 1000.0, n)
+        self.prices[:2] = (65000.0, 3200.0)
+        self.target = divergence_bps / 10_000.0 + self.rng.normal(0.0, noise_bps / 10_000.0, n)
+        self.divergence = self.target.copy()
+        self.noise = noise_bps / 10_000.0
+        self.books: Dict[Tuple[str, str], Book] = {}
+        self.moved: Set[str] = set(self.index)
+        self.generation = 0
+        self.skew_ms = 0
+        self.exchange_info = self._binance_exchange_info()
+        self.instruments = self._bybit_instruments()
+        self._bodies: Dict[str, bytes] = {}
+        self._built = -1
+        self._messages: Dict[Tuple[str, str, str], str] = {}
+
+    def step(self, share: float) -> None:
+        n = len(self.bases)
+        moved = np.arange(n) if share >= 1.0 else np.flatnonzero(self.rng.random(n) < share)
+        self.prices[moved] *= np.exp(self.rng.normal(0.0, 0.0005, len(moved)))
+        # Mean-reverting divergence so symbols keep crossing band edges
+        self.divergence[moved] += (0.05 * (self.target[moved] - self.divergence[moved])
+                                   + self.rng.normal(0.0, self.noise * 0.2 + 1e-6, len(moved)))
+        self.moved = {f"{self.bases[i]}USDT" for i in moved}
+        self.generation += 1
+        self._messages = {}
+
+    def server_ms(self) -> int:
+        # The venues' clock, off the local one by --clock-skew-ms
+        return int(time.time() * 1000) + self.skew_ms
+
+    def mid(self, venue: str, i: int) -> float:
+        p = float(self.prices[i])
+        return p * (1.0 + float(self.divergence[i])) if venue == "bybit" else p
+
+    def top(self, venue: str, i: int) -> Tuple[float, float]:
+        p = self.mid(venue, i)
+        return p * 0.9999, p * 1.0001
+
+    def book(self, venue: str, symbol: str) -> Book:
+        book = self.books.get((venue, symbol))
+        if book is None:
+            book = self.books[(venue, symbol)] = Book(self.mid(venue, self.index[symbol]))
+        return book
+
+    # Stream messages, encoded once per tick and shared by every subscriber
+
+    def ticker_message(self, venue: str, symbol: str, ts: int) -> str:
+        key = (venue, "ticker", symbol)
+        msg = self._messages.get(key)
+        if msg is None:
+            bid, ask = self.top(venue, self.index[symbol])
+            if venue == "binance":
+                msg = json.dumps({"e": "bookTicker", "u": ts, "s": symbol, "b": f"{bid:.6f}", "B": "1",
+                                  "a": f"{ask:.6f}", "A": "1", "T": ts, "E": ts})
+            else:
+                msg = json.dumps({"topic": f"orderbook.1.{symbol}", "type": "snapshot", "ts": ts,
+                                  "data": {"s": symbol, "b": [[f"{bid:.6f}", "1"]], "a": [[f"{ask:.6f}", "1"]]}})
+            self._messages[key] = msg
+        return msg
+
+    def depth_message(self, venue: str, symbol: str, ts: int) -> str:
+        key = (venue, "depth", symbol)
+        msg = self._messages.get(key)
+        if msg is None:
+            book = self.book(venue, symbol)
+            prev = book.update_id
+            b, a, first, last = book.step(self.mid(venue, self.index[symbol]))
+            if venue == "binance":
+                msg = json.dumps({"e": "depthUpdate", "E": ts, "T": ts, "s": symbol, "U": first, "u": last,
+                                  "pu": prev, "b": b, "a": a})
+            else:
+                # Bybit update ids are consecutive per topic
+                book.update_id = last = prev + 1
+                msg = json.dumps({"topic": f"orderbook.50.{symbol}", "type": "delta", "ts": ts,
+                                  "data": {"s": symbol, "b": b, "a": a, "u": last, "seq": last}})
+            self._messages[key] = msg
+        return msg
+
+    def bybit_snapshot(self, symbol: str) -> str:
+        book = self.book("bybit", symbol)
+        bids, asks = book.levels()
+        return json.dumps({"topic": f"orderbook.50.{symbol}", "type": "snapshot", "ts": int(time.time() * 1000),
+                           "data": {"s": symbol, "b": bids, "a": asks, "u": book.update_id, "seq": book.update_id}})
+
+    # REST bodies; bulk ones are rebuilt at most once per tick
+
+    def _bulk(self, path: str) -> bytes:
+        if self._built != self.generation:
+            self._bodies = {}
+            self._built = self.generation
+        body = self._bodies.get(path)
+        if body is None:
+            build = {
+                f"{BINANCE}/ticker/bookTicker": self._binance_book_tickers,
+                f"{BINANCE}/ticker/24hr": self._binance_24hr,
+                f"{BYBIT}/tickers": self._bybit_tickers,
+            }[path]
+            body = self._bodies[path] = build()
+        return body
+
+    def _volume(self, i: int) -> float:
+        # Every symbol clears the scanner's $300k threshold, so the universe is the full symbol count
+        return 1e6 + 5e8 / (i + 1)
+
+    def _binance_row(self, i: int) -> Dict[str, object]:
+        ts = int(time.time() * 1000)
+        bid, ask = self.top("binance", i)
+        return {"symbol": f"{self.bases[i]}USDT", "bidPrice": f"{bid:.6f}", "bidQty": "1.000", "askPrice": f"{ask:.6f}",
+                "askQty": "1.000", "time": ts, "lastUpdateId": ts}
+
+    def _binance_book_tickers(self) -> bytes:
+        return json.dumps([self._binance_row(i) for i in range(len(self.bases))]).encode()
+
+    def _binance_24hr(self) -> bytes:
+        return json.dumps([{"symbol": f"{b}USDT", "lastPrice": f"{self.prices[i]:.6f}",
+                            "quoteVolume": f"{self._volume(i):.2f}"} for i, b in enumerate(self.bases)]).encode()
+
+    def _binance_exchange_info(self) -> bytes:
+        return json.dumps({"timezone": "UTC", "symbols": [
+            {"symbol": f"{b}USDT", "pair": f"{b}USDT", "contractType": "PERPETUAL", "status": "TRADING",
+             "baseAsset": b, "quoteAsset": "USDT", "marginAsset": "USDT", "pricePrecision": 6, "quantityPrecision": 3,
+             "filters": [{"filterType": "PRICE_FILTER", "minPrice": TICK, "maxPrice": "1000000", "tickSize": TICK},
+                         {"filterType": "LOT_SIZE", "minQty": BINANCE_STEP, "maxQty": "1000000",
+                          "stepSize": BINANCE_STEP}]} for b in self.bases]}).encode()
+
+    def _bybit_row(self, i: int) -> Dict[str, str]:
+        bid, ask = self.top("bybit", i)
+        return {"symbol": f"{self.bases[i]}USDT", "lastPrice": f"{(bid + ask) / 2:.6f}", "bid1Price": f"{bid:.6f}",
+                "bid1Size": "1", "ask1Price": f"{ask:.6f}", "ask1Size": "1",
+                "turnover24h": f"{self._volume(i):.2f}", "volume24h": "1000"}
+
+    def _bybit_tickers(self) -> bytes:
+        rows = [self._bybit_row(i) for i in range(len(self.bases))]
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": rows},
+                           "time": int(time.time() * 1000)}).encode()
+
+    def _bybit_instruments(self) -> bytes:
+        # One page regardless of `limit`: the real 1000-row page would cap a 5k-symbol universe
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": [
+            {"symbol": f"{b}USDT", "contractType": "LinearPerpetual", "status": "Trading", "baseCoin": b,
+             "quoteCoin": "USDT", "settleCoin": "USDT", "priceFilter": {"tickSize": TICK},
+             "lotSizeFilter": {"qtyStep": BYBIT_STEP, "minOrderQty": BYBIT_STEP, "maxOrderQty": "1000000"}}
+            for b in self.bases]}}).encode()
+
+    def depth(self, venue: str, symbol: str, limit: int) -> bytes:
+        # A streamed book answers with its own levels and update id (Binance depth snapshots), others are synthetic
+        ts = int(time.time() * 1000)
+        book = self.books.get((venue, symbol))
+        if book is not None:
+            bids, asks = book.levels(limit)
+            # Binance: inside the next depthUpdate's [U, u] range, as USD-M futures snapshots are
+            update_id = book.update_id + (venue == "binance")
+        else:
+            bid, ask = self.top(venue, self.index[symbol])
+            bids = [[f"{bid * (1 - 0.0001 * k):.6f}", "1.000"] for k in range(limit)]
+            asks = [[f"{ask * (1 + 0.0001 * k):.6f}", "1.000"] for k in range(limit)]
+            update_id = ts
+        if venue == "binance":
+            return json.dumps({"lastUpdateId": update_id, "E": ts, "T": ts, "bids": bids, "asks": asks}).encode()
+        return json.dumps({"retCode": 0, "retMsg": "OK", "result": {"s": symbol, "b": bids, "a": asks, "ts": ts,
+                                                                     "u": update_id}, "time": ts}).encode()
+
+    def route(self, target: str) -> Tuple[str, float, int, bytes]:
+        # -> (venue, request weight, status, body)
+        url = urlparse(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        symbol = query.get("symbol", "")
+        limit = min(int(query.get("limit", "5") or 5), BOOK_LEVELS)
+        if url.path.startswith(BINANCE):
+            endpoint = url.path[len(BINANCE) + 1:]
+            weight = BINANCE_WEIGHTS.get(endpoint, 1.0)
+            if symbol and symbol not in self.index:
+                return "binance", weight, 400, b'{"code":-1121,"msg":"Invalid symbol."}'
+            if endpoint == "depth":
+                return "binance", weight, 200, self.depth("binance", symbol, limit)
+            if endpoint == "exchangeInfo":
+                return "binance", weight, 200, self.exchange_info
+            if endpoint == "ticker/bookTicker" and symbol:
+                return "binance", 2.0, 200, json.dumps(self._binance_row(self.index[symbol])).encode()
+            if endpoint in ("ticker/bookTicker", "ticker/24hr"):
+                return "binance", weight, 200, self._bulk(f"{BINANCE}/{endpoint}")
+            if endpoint in ("ping", "time"):
+                return "binance", 1.0, 200, json.dumps({"serverTime": self.server_ms()}).encode()
+        elif url.path.startswith(BYBIT):
+            endpoint = url.path[len(BYBIT) + 1:]
+            if query.get("category", "linear") != "linear":
+                # Only linear perpetuals are simulated; spot/inverse/option come back empty
+                return "bybit", 1.0, 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {
+                    "category": query["category"], "list": []}}).encode()
+            if symbol and symbol not in self.index:
+                return "bybit", 1.0, 200, b'{"retCode":10001,"retMsg":"params error: symbol invalid","result":{}}'
+            if endpoint == "orderbook":
+                return "bybit", 1.0, 200, self.depth("bybit", symbol, limit)
+            if endpoint == "instruments-info":
+                return "bybit", 1.0, 200, self.instruments
+            if endpoint == "tickers" and symbol:
+                return "bybit", 1.0, 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {
+                    "category": "linear", "list": [self._bybit_row(self.index[symbol])]}}).encode()
+            if endpoint == "tickers":
+                return "bybit", 1.0, 200, self._bulk(url.path)
+            if endpoint == "time":
+                return "bybit", 1.0, 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {
+                    "timeSecond": str(self.server_ms() // 1000)}, "time": self.server_ms()}).encode()
+        if url.path == "/":
+            return "", 0.0, 200, b"{}"
+        return "", 0.0, 404, b'{"code":-1,"msg":"not found"}'
+
+
+def _on_grid(value: str, step: str) -> bool:
+    try:
+        return Decimal(value) > 0 and Decimal(value) % Decimal(step) == 0
+    except InvalidOperation:
+        return False
+
+
+class Orders:
+    """Signed order entry and order queries on both venues, checked the way the venues check them.
+
+    Nothing fills and no book changes: an IOC order is acknowledged and expires at once, any other
+    order stays open. Binance, like the real one, only refuses a client order id that an open
+    order still carries, so a resent IOC order is placed again; Bybit refuses any id it has seen.
+    `GET /sim/orders` counts placements and the client ids placed more than once.
+    """
+
+    def __init__(self, market: Market, key: str, secret: str) -> None:
+        self.market = market
+        self.key = key
+        self.secret = secret.encode()
+        self.ids = itertools.count(1)
+        # (venue, client order id) -> (order id, status) of the latest order with that id
+        self.orders: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self.placements: Dict[Tuple[str, str], int] = {}
+
+    def _sign(self, payload: bytes) -> str:
+        return hmac.new(self.secret, payload, hashlib.sha256).hexdigest()
+
+    def _stale(self, ts: str, recv_window: str) -> bool:
+        # Binance and Bybit both refuse timestamps over 1 s ahead of them or older than the recv window
+        now = self.market.server_ms()
+        try:
+            return not now - int(recv_window or 5000) <= int(ts) < now + 1000
+        except ValueError:
+            return True
+
+    def _place(self, venue: str, client_id: str, tif: str) -> int:
+        order_id = next(self.ids)
+        self.orders[(venue, client_id)] = (order_id, "EXPIRED" if tif == "IOC" else "NEW")
+        self.placements[(venue, client_id)] = self.placements.get((venue, client_id), 0) + 1
+        return order_id
+
+    def summary(self) -> bytes:
+        return json.dumps({"orders": sum(self.placements.values()),
+                           "repeated": sum(1 for n in self.placements.values() if n > 1)}).encode()
+
+    def route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[str, float, int, bytes]:
+        path = urlparse(target).path
+        if path == f"{BINANCE}/order":
+            return ("binance", 1.0) + self._binance(method, target, headers, body)
+        if path == "/v5/order/create" and method == "POST":
+            return ("bybit", 1.0) + self._bybit(target, headers, body)
+        if path == "/v5/order/realtime" and method == "GET":
+            return ("bybit", 1.0) + self._bybit(target, headers, body)
+        if path == "/sim/orders":
+            return "", 0.0, 200, self.summary()
+        return "", 0.0, 404, b'{"code":-1,"msg":"not found"}'
+
+    def _binance(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        def error(code: int, msg: str) -> Tuple[int, bytes]:
+            return 400 if code != -2015 else 401, json.dumps({"code": code, "msg": msg}).encode()
+
+        # The signature covers the query string followed by the body, minus the signature itself
+        total = urlparse(target).query + body.decode("latin-1")
+        payload, _, signature = total.rpartition("&signature=")
+        if headers.get("x-mbx-apikey") != self.key:
+            return error(-2015, "Invalid API-key, IP, or permissions for action.")
+        if not hmac.compare_digest(self._sign(payload.encode("latin-1")), signature):
+            return error(-1022, "Signature for this request is not valid.")
+        q = {k: v[0] for k, v in parse_qs(payload).items()}
+        required = ("symbol", "side", "type", "quantity", "price", "timestamp") if method == "POST" else (
+            "symbol", "origClientOrderId", "timestamp")
+        for name in required:
+            if not q.get(name):
+                return error(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+        if self._stale(q["timestamp"], q.get("recvWindow", "")):
+            return error(-1021, "Timestamp for this request is outside of the recvWindow.")
+        if q["symbol"] not in self.market.index:
+            return error(-1121, "Invalid symbol.")
+        if method == "GET":
+            order = self.orders.get(("binance", q["origClientOrderId"]))
+            if order is None:
+                return error(-2013, "Order does not exist.")
+            return 200, json.dumps({"orderId": order[0], "symbol": q["symbol"], "status": order[1],
+                                    "clientOrderId": q["origClientOrderId"]}).encode()
+        if not _on_grid(q["quantity"], BINANCE_STEP) or not _on_grid(q["price"], TICK):
+            return error(-1111, "Precision is over the maximum defined for this asset.")
+        client_id = q.get("newClientOrderId") or f"sim{next(self.ids)}"
+        if self.orders.get(("binance", client_id), (0, ""))[1] == "NEW":
+            return error(-4116, "ClientOrderId is duplicated.")
+        tif = q.get("timeInForce", "GTC")
+        order_id = self._place("binance", client_id, tif)
+        return 200, json.dumps({"orderId": order_id, "symbol": q["symbol"], "status": "NEW",
+                                "clientOrderId": client_id, "price": q["price"], "origQty": q["quantity"],
+                                "side": q["side"], "type": q["type"], "timeInForce": tif,
+                                "updateTime": self.market.server_ms()}).encode()
+
+    def _bybit(self, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        def error(code: int, msg: str) -> Tuple[int, bytes]:
+            return 200, json.dumps({"retCode": code, "retMsg": msg, "result": {},
+                                    "time": self.market.server_ms()}).encode()
+
+        # POST signs the body, GET the query string
+        query = urlparse(target).query
+        signed = body if body else query.encode()
+        ts, recv_window = headers.get("x-bapi-timestamp", ""), headers.get("x-bapi-recv-window", "")
+        if headers.get("x-bapi-api-key") != self.key:
+            return error(10003, "API key is invalid.")
+        expected = self._sign(ts.encode() + self.key.encode() + recv_window.encode() + signed)
+        if not hmac.compare_digest(expected, headers.get("x-bapi-sign", "")):
+            return error(10004, "error sign! origin_string[...]")
+        if self._stale(ts, recv_window):
+            return error(10002, "invalid request, please check your server timestamp or recv_window param")
+        if not body:
+            q = {k: v[0] for k, v in parse_qs(query).items()}
+            order = self.orders.get(("bybit", q.get("orderLinkId", "")))
+            rows = [] if order is None else [{"orderId": f"{order[0]:08d}-0000-0000-0000-000000000000",
+                                              "orderLinkId": q["orderLinkId"], "symbol": q.get("symbol", ""),
+                                              "orderStatus": "Cancelled" if order[1] == "EXPIRED" else "New"}]
+            return 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": rows},
+                                    "time": self.market.server_ms()}).encode()
+        try:
+            q = json.loads(body)
+        except ValueError:
+            return error(10001, "params error: body is not JSON")
+        if q.get("category") != "linear" or q.get("symbol") not in self.market.index:
+            return error(10001, "params error: symbol invalid")
+        if not _on_grid(str(q.get("qty", "")), BYBIT_STEP):
+            return error(10001, "Qty invalid")
+        if not _on_grid(str(q.get("price", "")), TICK):
+            return error(10001, "Price invalid")
+        link_id = q.get("orderLinkId") or f"sim{next(self.ids)}"
+        if ("bybit", link_id) in self.orders:
+            return error(110072, "OrderLinkedID is duplicate")
+        order_id = self._place("bybit", link_id, q.get("timeInForce", "GTC"))
+        return 200, json.dumps({"retCode": 0, "retMsg": "OK", "result": {
+            "orderId": f"{order_id:08d}-0000-0000-0000-000000000000", "orderLinkId": link_id},
+            "time": self.market.server_ms()}).encode()
+
+
+def _word(value: int) -> str:
+    return f"{value:064x}"
+
+
+class Chain:
+    """Uniswap V3 pools for every symbol on a chain that mines a block every `--block-time` seconds.
+
+    Pool i holds the base (18 decimals) against a 6-decimal stablecoin, as token0 for even i and
+    token1 for odd i, at the Binance mid times a per-symbol divergence that wanders like Bybit's.
+    Prices only change when a block is mined, as on chain.
+    """
+
+    def __init__(self, market: Market, divergence_bps: float, noise_bps: float, fee: int) -> None:
+        self.market = market
+        n = len(market.bases)
+        self.fee = fee
+        self.addresses = [f"{0x51 << 152 | i:040x}" for i in range(n)]
+        self.index = {a: i for i, a in enumerate(self.addresses)}
+        self.target = divergence_bps / 10_000.0 + market.rng.normal(0.0, noise_bps / 10_000.0, n)
+        self.divergence = self.target.copy()
+        self.noise = noise_bps / 10_000.0
+        self.number = 1
+        self.timestamp = int(time.time())
+        self.sqrt_price: List[int] = []
+        self.calls = 0
+        self.reprice()
+
+    def mine(self) -> None:
+        self.divergence += 0.05 * (self.target - self.divergence) + self.market.rng.normal(
+            0.0, self.noise * 0.2 + 1e-6, len(self.divergence))
+        self.number += 1
+        self.timestamp = int(time.time())
+        self.reprice()
+
+    def reprice(self) -> None:
+        price = self.market.prices * (1.0 + self.divergence)
+        scale = 10.0 ** (STABLE_DECIMALS - BASE_DECIMALS)
+        ratio = np.where(np.arange(len(price)) % 2 == 0, price * scale, 1.0 / (price * scale))
+        self.sqrt_price = [int(math.sqrt(r) * 2 ** 96) for r in ratio.tolist()]
+
+    def pools(self) -> List[Dict[str, object]]:
+        return [{"base": base, "address": "0x" + self.addresses[i], "decimals0": BASE_DECIMALS if i % 2 == 0 else STABLE_DECIMALS,
+                 "decimals1": STABLE_DECIMALS if i % 2 == 0 else BASE_DECIMALS, "base_is_token0": i % 2 == 0, "fee": self.fee}
+                for i, base in enumerate(self.market.bases)]
+
+    def header(self) -> Dict[str, str]:
+        return {"number": hex(self.number), "timestamp": hex(self.timestamp), "hash": "0x" + _word(self.number)}
+
+    def call(self, tx: Dict[str, str]) -> str:
+        # aggregate3((address,bool,bytes)[]) over slot0() / liquidity() of the simulated pools
+        data = bytes.fromhex(tx.get("data", "0x")[2:])
+        if tx.get("to", "").lower()[2:] != MULTICALL3 or data[:4].hex() != "82ad56cb":
+            raise ValueError("execution reverted")
+        body = data[4:]
+        word = lambda at: int.from_bytes(body[at:at + 32], "big")  # noqa: E731
+        array = word(0)
+        n = word(array)
+        start = array + 32
+        results: List[str] = []
+        for k in range(n):
+            at = start + word(start + 32 * k)
+            target = body[at + 12:at + 32].hex()
+            selector = body[at + word(at + 64) + 32:at + word(at + 64) + 36].hex()
+            i = self.index.get(target)
+            if i is None or selector not in (SLOT0, LIQUIDITY):
+                results.append(_word(0) + _word(0x40) + _word(0))
+            elif selector == SLOT0:
+                tick = int(math.log((self.sqrt_price[i] / 2 ** 96) ** 2, 1.0001))
+                ret = _word(self.sqrt_price[i]) + _word(tick % (1 << 256)) + _word(0) * 3 + _word(0) + _word(1)
+                results.append(_word(1) + _word(0x40) + _word(len(ret) // 2) + ret)
+            else:
+                results.append(_word(1) + _word(0x40) + _word(32) + _word(10 ** 21))
+        self.calls += 1
+        offsets, at = [], 32 * n
+        for r in results:
+            offsets.append(_word(at))
+            at += len(r) // 2
+        return "0x" + _word(0x20) + _word(n) + "".join(offsets) + "".join(results)
+
+
+class Limits:
+    """Fixed-window request weight per venue, reported in the venues' usage headers."""
+
+    def __init__(self) -> None:
+        self.slot: Dict[str, int] = {v: -1 for v in LIMITS}
+        self.used: Dict[str, float] = {v: 0.0 for v in LIMITS}
+
+    def charge(self, venue: str, weight: float) -> Tuple[float, float]:
+        # -> (weight used in the current window, seconds until it resets)
+        limit, window = LIMITS[venue]
+        now = time.time()
+        slot = int(now // window)
+        if slot != self.slot[venue]:
+            self.slot[venue] = slot
+            self.used[venue] = 0.0
+        self.used[venue] += weight
+        return self.used[venue], (slot + 1) * window - now
+
+    def headers(self, venue: str, used: float) -> List[bytes]:
+        limit, _ = LIMITS[venue]
+        if venue == "binance":
+            return [f"X-MBX-USED-WEIGHT-1M: {int(used)}\r\n".encode()]
+        return [f"X-Bapi-Limit: {int(limit)}\r\n".encode(),
+                f"X-Bapi-Limit-Status: {max(int(limit - used), 0)}\r\n".encode()]
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.messages: Dict[str, int] = {}
+        self.connections: Dict[str, int] = {}
+        self.lag = 0.0
+
+    def report(self, elapsed: float) -> str:
+        rest = sum(self.requests.values())
+        by_status: Dict[int, int] = {}
+        for (_, status), n in self.requests.items():
+            by_status[status] = by_status.get(status, 0) + n
+        ws = sum(self.messages.values())
+        out = (f"[Sim] REST {rest / elapsed:,.0f} req/s {dict(sorted(by_status.items()))}, "
+               f"WS {ws / elapsed:,.0f} msg/s over {sum(self.connections.values())} connections, "
+               f"max tick lag {self.lag * 1000:.1f} ms")
+        self.requests, self.messages, self.lag = {}, {}, 0.0
+        return out
+
+
+def _error_body(venue: str, status: int) -> bytes:
+    if status == 429:
+        if venue == "bybit":
+            return b'{"retCode":10006,"retMsg":"Too many visits!","result":{}}'
+        return b'{"code":-1003,"msg":"Too many requests; current limit is 2400 request weight per 1 MINUTE."}'
+    if venue == "bybit":
+        return b'{"retCode":10016,"retMsg":"Server error.","result":{}}'
+    return b'{"code":-1001,"msg":"Internal error; unable to process your request. Please try again."}'
+
+
+async def handle_rest(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, market: Market, orders: Orders,
+                      limits: Limits, stats: Stats, args: argparse.Namespace, latency: Latency,
+                      latencies: Dict[str, Latency]) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            parts = lines[0].split(" ")
+            headers: Dict[str, str] = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            length = int(headers.get("content-length", "0") or 0)
+            content = await reader.readexactly(length) if length else b""
+
+            extra: List[bytes] = []
+            venue, status, body = "", 400, b"{}"
+            if len(parts) >= 2 and (parts[0] == "POST" or parts[1].startswith(ORDER_PATHS)):
+                venue, weight, status, body = orders.route(parts[0], parts[1], headers, content)
+            elif len(parts) >= 2:
+                venue, weight, status, body = market.route(parts[1])
+            if venue:
+                used, reset = limits.charge(venue, weight)
+                extra = limits.headers(venue, used)
+                if args.enforce_limits and used > LIMITS[venue][0]:
+                    status, body = 429, _error_body(venue, 429)
+                    extra.append(f"Retry-After: {max(int(math.ceil(reset)), 1)}\r\n".encode())
+                elif random.random() < args.throttle_rate:
+                    status, body = 429, _error_body(venue, 429)
+                    extra.append(b"Retry-After: 1\r\n")
+                elif random.random() < args.error_rate:
+                    status, body = 500, _error_body(venue, 500)
+            stats.requests[(venue, status)] = stats.requests.get((venue, status), 0) + 1
+
+            delay = latencies.get(venue, latency).sample()
+            if delay:
+                await asyncio.sleep(delay)
+            if parts[0] == "POST" and random.random() < args.order_drop_rate:
+                # The order is in, but its response is lost with the connection
+                break
+            close = headers.get("connection", "").lower() == "close"
+            writer.writelines([
+                f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n".encode(),
+                b"Content-Type: application/json\r\n",
+                f"Content-Length: {len(body)}\r\n".encode(),
+                *extra,
+                b"Connection: close\r\n" if close else b"Connection: keep-alive\r\n",
+                b"\r\n",
+                body,
+            ])
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def handle_rpc(ws, chain: Chain, blocks: asyncio.Condition, stats: Stats) -> None:
+    # JSON-RPC subset the DEX source uses: eth_subscribe newHeads, eth_call, eth_blockNumber, eth_chainId
+    stats.connections["rpc"] = stats.connections.get("rpc", 0) + 1
+    subscription = "0x1"
+    pusher = None
+
+    async def heads() -> None:
+        seen = chain.number
+        while True:
+            async with blocks:
+                await blocks.wait_for(lambda: chain.number != seen)
+            seen = chain.number
+            await ws.send(json.dumps({"jsonrpc": "2.0", "method": "eth_subscription",
+                                      "params": {"subscription": subscription, "result": chain.header()}}))
+            stats.messages["rpc"] = stats.messages.get("rpc", 0) + 1
+
+    try:
+        async for raw in ws:
+            msg = json.loads(raw)
+            method, params = msg.get("method"), msg.get("params") or []
+            reply: Dict[str, object] = {"jsonrpc": "2.0", "id": msg.get("id")}
+            try:
+                if method == "eth_subscribe" and params[:1] == ["newHeads"]:
+                    reply["result"] = subscription
+                    if pusher is None:
+                        pusher = asyncio.create_task(heads())
+                elif method == "eth_call":
+                    reply["result"] = chain.call(params[0])
+                elif method == "eth_blockNumber":
+                    reply["result"] = hex(chain.number)
+                elif method == "eth_chainId":
+                    reply["result"] = hex(31337)
+                else:
+                    reply["error"] = {"code": -32601, "message": f"the method {method} does not exist"}
+            except (ValueError, KeyError, IndexError) as exc:
+                reply["error"] = {"code": 3, "message": str(exc)}
+            await ws.send(json.dumps(reply))
+            stats.messages["rpc"] = stats.messages.get("rpc", 0) + 1
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        if pusher is not None:
+            pusher.cancel()
+        stats.connections["rpc"] -= 1
+
+
+async def handle_ws(ws, market: Market, ticks: asyncio.Condition, stats: Stats, args: argparse.Namespace,
+                    chain: Optional[Chain] = None, blocks: Optional[asyncio.Condition] = None) -> None:
+    path = getattr(ws, "path", None) or ws.request.path
+    if path.startswith("/rpc"):
+        if chain is None or blocks is None:
+            await ws.close(code=1008, reason="no chain, start with --block-time")
+        else:
+            await handle_rpc(ws, chain, blocks, stats)
+        return
+    venue = "binance" if path.startswith("/ws") else "bybit"
+    tickers: Set[str] = set()
+    depth: Set[str] = set()
+    opened = time.monotonic()
+    stats.connections[venue] = stats.connections.get(venue, 0) + 1
+
+    async def reader() -> None:
+        async for raw in ws:
+            msg = json.loads(raw)
+            if venue == "binance" and msg.get("method") in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                for p in msg.get("params", []):
+                    name, stream = p.split("@")[0].upper(), p.split("@")[1]
+                    target = depth if stream.startswith("depth") else tickers
+                    if name not in market.index:
+                        continue
+                    if msg["method"] == "SUBSCRIBE":
+                        target.add(name)
+                        if target is depth:
+                            market.book(venue, name)
+                    else:
+                        target.discard(name)
+                await ws.send(json.dumps({"result": None, "id": msg.get("id")}))
+            elif venue == "bybit" and msg.get("op") in ("subscribe", "unsubscribe"):
+                for a in msg.get("args", []):
+                    name = a.split(".")[-1]
+                    target = depth if a.startswith("orderbook.50.") else tickers
+                    if name not in market.index:
+                        continue
+                    if msg["op"] == "subscribe":
+                        target.add(name)
+                        if target is depth:
+                            await ws.send(market.bybit_snapshot(name))
+                    else:
+                        target.discard(name)
+                await ws.send(json.dumps({"success": True, "op": msg["op"]}))
+            elif venue == "bybit" and msg.get("op") == "ping":
+                await ws.send(json.dumps({"success": True, "op": "pong"}))
+            if len(tickers) + len(depth) > args.max_streams:
+                await ws.close(code=1008, reason="too many streams")
+
+    read_task = asyncio.create_task(reader())
+    seen = market.generation
+    try:
+        while not read_task.done():
+            async with ticks:
+                await ticks.wait_for(lambda: market.generation != seen)
+            # A connection that fell behind skips ticks: depth streams then see a gap and resync
+            seen = market.generation
+            if args.drop_after and time.monotonic() - opened > args.drop_after:
+                await ws.close()
+                break
+            ts = int(time.time() * 1000)
+            moved = market.moved
+            sent = 0
+            for name in (tickers & moved if len(tickers) < len(moved) else [s for s in moved if s in tickers]):
+                await ws.send(market.ticker_message(venue, name, ts))
+                sent += 1
+            for name in [s for s in depth if s in moved]:
+                msg = market.depth_message(venue, name, ts)
+                if random.random() < args.gap_rate:
+                    continue  # a lost message, the client has to notice and resync
+                await ws.send(msg)
+                sent += 1
+            stats.messages[venue] = stats.messages.get(venue, 0) + sent
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        read_task.cancel()
+        stats.connections[venue] -= 1
+
+
+async def serve(args: argparse.Namespace) -> None:
+    market = Market(args.symbols, args.divergence_bps, args.divergence_noise_bps, args.seed)
+    market.skew_ms = args.clock_skew_ms
+    orders = Orders(market, args.api_key, args.api_secret)
+    limits = Limits()
+    stats = Stats()
+    latency = Latency(args.latency)
+    latencies = {venue: Latency(spec) for venue, spec in (v.split("=", 1) for v in args.venue_latency)}
+    ticks = asyncio.Condition()
+    blocks = asyncio.Condition()
+    chain = Chain(market, args.dex_divergence_bps, args.dex_divergence_noise_bps, args.dex_fee) if args.block_time > 0 else None
+    if chain is not None and args.pools_out:
+        with open(args.pools_out, "w") as f:
+            json.dump(chain.pools(), f)
+    rest = await asyncio.start_server(
+        lambda r, w: handle_rest(r, w, market, orders, limits, stats, args, latency, latencies), args.host, args.port,
+        backlog=4096)
+    port = rest.sockets[0].getsockname()[1]
+    async with rest, websockets.serve(lambda ws, *_: handle_ws(ws, market, ticks, stats, args, chain, blocks), args.host,
+                                      args.ws_port, max_queue=None) as streams:
+        ws_port = next(iter(streams.sockets)).getsockname()[1]
+        # The first stdout line carries both ports for scripts that start the simulator with --port 0
+        print(f"[Sim] Listening on http://{args.host}:{port} and ws://{args.host}:{ws_port} "
+              f"({len(market.bases)} symbols, {args.rate:g} ticks/s, {args.share:.0%} moving per tick)", flush=True)
+        if chain is not None:
+            print(f"[Sim] JSON-RPC on ws://{args.host}:{ws_port}/rpc, {len(chain.addresses)} pools, "
+                  f"a block every {args.block_time:g}s", flush=True)
+        interval = 1.0 / args.rate
+        started = last_report = last_block = time.monotonic()
+        n = 0
+        while True:
+            n += 1
+            due = started + n * interval
+            await asyncio.sleep(max(due - time.monotonic(), 0.0))
+            stats.lag = max(stats.lag, time.monotonic() - due)
+            market.step(args.share)
+            async with ticks:
+                ticks.notify_all()
+            if chain is not None and time.monotonic() - last_block >= args.block_time:
+                # Blocks are mined on the tick clock, so pools reprice from the latest walk
+                last_block = time.monotonic()
+                chain.mine()
+                async with blocks:
+                    blocks.notify_all()
+            now = time.monotonic()
+            if args.stats and now - last_report >= args.stats:
+                print(stats.report(now - last_report), flush=True)
+                last_report = now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Binance USD-M / Bybit v5 linear market data simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790, help="REST port, 0 picks a free one")
+    parser.add_argument("--ws-port", type=int, default=8765, help="WebSocket port, 0 picks a free one")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=5.0, help="Market ticks per second")
+    parser.add_argument("--share", type=float, default=1.0, help="Share of symbols that move on each tick")
+    parser.add_argument("--latency", default="none",
+                        help="REST delay in ms: none, fixed:MS, uniform:LO:HI or lognormal:P50:P99")
+    parser.add_argument("--venue-latency", action="append", default=[], metavar="VENUE=SPEC",
+                        help="--latency for one venue only, e.g. bybit=fixed:3000; repeatable")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of REST requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of REST requests answered with 429")
+    parser.add_argument("--enforce-limits", action="store_true",
+                        help="Answer 429 with Retry-After once a venue's request weight window is used up")
+    parser.add_argument("--divergence-bps", type=float, default=15.0, help="Mean Bybit price offset vs Binance")
+    parser.add_argument("--divergence-noise-bps", type=float, default=10.0, help="Per-symbol spread around it")
+    parser.add_argument("--max-streams", type=int, default=200, help="Close connections subscribing to more")
+    parser.add_argument("--drop-after", type=float, default=0.0, help="Drop each connection after N seconds")
+    parser.add_argument("--gap-rate", type=float, default=0.0, help="Share of depth updates silently dropped")
+    parser.add_argument("--block-time", type=float, default=0.0,
+                        help="Seconds per block of the simulated chain on /rpc, 0 = no chain")
+    parser.add_argument("--dex-divergence-bps", type=float, default=-10.0, help="Mean pool price offset vs Binance")
+    parser.add_argument("--dex-divergence-noise-bps", type=float, default=20.0, help="Per-pool spread around it")
+    parser.add_argument("--dex-fee", type=int, default=500, help="Pool fee in hundredths of a bip")
+    parser.add_argument("--pools-out", default="", help="Write the pool list for SPREADS_DEX_POOLS here")
+    parser.add_argument("--api-key", default="sim-key", help="API key the order endpoints accept")
+    parser.add_argument("--api-secret", default="sim-secret", help="HMAC secret the order endpoints verify")
+    parser.add_argument("--order-drop-rate", type=float, default=0.0,
+                        help="Share of order requests processed but answered by dropping the connection")
+    parser.add_argument("--clock-skew-ms", type=int, default=0, help="Server clock minus the local clock")
+    parser.add_argument("--stats", type=float, default=10.0, help="Seconds between throughput reports, 0 = off")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
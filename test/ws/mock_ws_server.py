@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from http import HTTPStatus
+from typing import Dict, List, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+
+# Local stand-in for the Binance futures bookTicker/depth and Bybit v5 orderbook.1/orderbook.50 streams,
+# plus the Binance REST depth snapshot. Point the spread loop at it with:
+#   SPREADS_MODE=stream SPREADS_BINANCE_WS=ws://127.0.0.1:8765/ws SPREADS_BYBIT_WS=ws://127.0.0.1:8765/v5/public/linear
+# and for SPREADS_MODE=book also SPREADS_BINANCE_REST=http://127.0.0.1:8765
+
+BOOK_LEVELS = 20
+
+
+class Walk:
+    def __init__(self) -> None:
+        self.prices: Dict[str, float] = {}
+
+    def step(self, symbol: str) -> float:
+        p = self.prices.get(symbol, random.uniform(0.1, 100.0))
+        p *= 1.0 + random.gauss(0.0, 0.0005)
+        self.prices[symbol] = p
+        return p
+
+
+class Book:
+    """Levels on a fixed tick grid around the walk price; `step` returns the diff to the previous state."""
+
+    def __init__(self) -> None:
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.update_id = 0
+
+    def step(self, mid: float) -> Tuple[List[List[str]], List[List[str]], int, int]:
+        tick = 10 ** (math.floor(math.log10(mid)) - 4)
+        best_bid = math.floor(mid / tick) * tick
+        bids = {round(best_bid - i * tick, 10): round(random.uniform(1, 50), 3) for i in range(BOOK_LEVELS)}
+        asks = {round(best_bid + (i + 1) * tick, 10): round(random.uniform(1, 50), 3) for i in range(BOOK_LEVELS)}
+        # Only part of the book changes per update, like a real diff stream
+        for new, old in ((bids, self.bids), (asks, self.asks)):
+            for price in new:
+                if price in old and random.random() < 0.7:
+                    new[price] = old[price]
+        diff_b = _diff(self.bids, bids)
+        diff_a = _diff(self.asks, asks)
+        first = self.update_id + 1
+        self.update_id += random.randint(1, 3)
+        self.bids, self.asks = bids, asks
+        return diff_b, diff_a, first, self.update_id
+
+    def levels(self) -> Tuple[List[List[str]], List[List[str]]]:
+        bids = [[_fmt(p), _fmt(s)] for p, s in sorted(self.bids.items(), reverse=True)]
+        asks = [[_fmt(p), _fmt(s)] for p, s in sorted(self.asks.items())]
+        return bids, asks
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.10g}"
+
+
+def _diff(old: Dict[float, float], new: Dict[float, float]) -> List[List[str]]:
+    out = [[_fmt(p), "0"] for p in old if p not in new]
+    out += [[_fmt(p), _fmt(s)] for p, s in new.items() if old.get(p) != s]
+    return out
+
+
+class Market:
+    def __init__(self, divergence_bps: float) -> None:
+        self.walk = Walk()
+        self.divergence = divergence_bps / 10_000.0
+        self.books: Dict[Tuple[str, str], Book] = {}
+
+    def price(self, venue: str, symbol: str) -> float:
+        return self.walk.step(symbol) * (1.0 + (self.divergence if venue == "bybit" else 0.0))
+
+    def book(self, venue: str, symbol: str) -> Book:
+        book = self.books.get((venue, symbol))
+        if book is None:
+            book = self.books[(venue, symbol)] = Book()
+            book.step(self.price(venue, symbol))
+        return book
+
+
+async def handler(ws, args: argparse.Namespace, market: Market) -> None:
+    path = getattr(ws, "path", None) or ws.request.path
+    venue = "binance" if path.startswith("/ws") else "bybit"
+    tickers: Set[str] = set()
+    depth: Set[str] = set()
+    opened = time.monotonic()
+
+    async def send_bybit_snapshot(symbol: str) -> None:
+        book = market.book("bybit", symbol)
+        bids, asks = book.levels()
+        await ws.send(json.dumps({"topic": f"orderbook.50.{symbol}", "type": "snapshot", "ts": int(time.time() * 1000),
+                                  "data": {"s": symbol, "b": bids, "a": asks, "u": book.update_id, "seq": book.update_id}}))
+
+    async def reader() -> None:
+        async for raw in ws:
+            msg = json.loads(raw)
+            if venue == "binance" and msg.get("method") == "SUBSCRIBE":
+                for p in msg.get("params", []):
+                    symbol, stream = p.split("@")[0].upper(), p.split("@")[1]
+                    (depth if stream == "depth" else tickers).add(symbol)
+                await ws.send(json.dumps({"result": None, "id": msg.get("id")}))
+            elif venue == "bybit" and msg.get("op") in ("subscribe", "unsubscribe"):
+                for a in msg.get("args", []):
+                    symbol = a.split(".")[-1]
+                    target = depth if a.startswith("orderbook.50.") else tickers
+                    if msg["op"] == "subscribe":
+                        target.add(symbol)
+                        if target is depth:
+                            await send_bybit_snapshot(symbol)
+                    else:
+                        target.discard(symbol)
+                await ws.send(json.dumps({"success": True, "op": msg["op"]}))
+            elif venue == "bybit" and msg.get("op") == "ping":
+                await ws.send(json.dumps({"success": True, "op": "pong"}))
+            if len(tickers) + len(depth) > args.max_streams:
+                await ws.close(code=1008, reason="too many streams")
+
+    read_task = asyncio.create_task(reader())
+    try:
+        while not read_task.done():
+            await asyncio.sleep(1.0 / args.rate)
+            if args.drop_after and time.monotonic() - opened > args.drop_after:
+                await ws.close()
+                break
+            ts = int(time.time() * 1000)
+            for symbol in list(tickers):
+                p = market.price(venue, symbol)
+                bid, ask = p * 0.9999, p * 1.0001
+                if venue == "binance":
+                    msg = {"e": "bookTicker", "u": ts, "s": symbol, "b": f"{bid:.6f}", "B": "1",
+                           "a": f"{ask:.6f}", "A": "1", "T": ts, "E": ts}
+                else:
+                    msg = {"topic": f"orderbook.1.{symbol}", "type": "snapshot", "ts": ts,
+                           "data": {"s": symbol, "b": [[f"{bid:.6f}", "1"]], "a": [[f"{ask:.6f}", "1"]]}}
+                await ws.send(json.dumps(msg))
+            for symbol in list(depth):
+                book = market.book(venue, symbol)
+                prev = book.update_id
+                b, a, first, last = book.step(market.price(venue, symbol))
+                if venue == "bybit":
+                    # Bybit update ids are consecutive per topic
+                    book.update_id = last = prev + 1
+                if random.random() < args.gap_rate:
+                    continue  # a lost message, the client has to notice and resync
+                if venue == "binance":
+                    msg = {"e": "depthUpdate", "E": ts, "T": ts, "s": symbol, "U": first, "u": last, "pu": prev,
+                           "b": b, "a": a}
+                else:
+                    msg = {"topic": f"orderbook.50.{symbol}", "type": "delta", "ts": ts,
+                           "data": {"s": symbol, "b": b, "a": a, "u": last, "seq": last}}
+                await ws.send(json.dumps(msg))
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        read_task.cancel()
+
+
+def rest(path: str, market: Market):
+    # Binance REST depth snapshot, served from the same books the depth streams diff against
+    url = urlparse(path)
+    if url.path != "/fapi/v1/depth":
+        return None
+    symbol = parse_qs(url.query).get("symbol", [""])[0]
+    book = market.book("binance", symbol)
+    bids, asks = book.levels()
+    # Like USD-M futures, the snapshot already counts the first update of the next 100 ms event, so its
+    # id falls inside that event's [U, u] range (each step advances the id by at least one)
+    body = json.dumps({"lastUpdateId": book.update_id + 1, "E": int(time.time() * 1000), "bids": bids, "asks": asks})
+    return HTTPStatus.OK, [("Content-Type", "application/json")], body.encode()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    market = Market(args.divergence_bps)
+    async with websockets.serve(lambda ws, *_: handler(ws, args, market), args.host, args.port,
+                                process_request=lambda path, _headers: rest(path, market)):
+        print(f"[MockWS] Listening on ws://{args.host}:{args.port} (/ws, /v5/public/linear, GET /fapi/v1/depth)")
+        await asyncio.Future()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=5.0, help="Updates per symbol per second")
+    parser.add_argument("--max-streams", type=int, default=200, help="Close connections subscribing to more")
+    parser.add_argument("--drop-after", type=float, default=0.0, help="Drop each connection after N seconds")
+    parser.add_argument("--divergence-bps", type=float, default=15.0, help="Bybit price offset vs Binance")
+    parser.add_argument("--gap-rate", type=float, default=0.0, help="Share of depth updates silently dropped")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()